@@ -8,8 +8,8 @@ from .models import (
     CustomClassSchedule, AttendedClass,
     TaskTimeLog,
     Goals, GoalSchedule, GoalProgress,
-    SleepLog, ScheduleEntry,
-    FCMToken,
+    SleepLog, ScheduleEntry, ScheduleEntryException,
+    FCMToken, ReminderSchedule,
 )
 
 # Custom User Change Form
@@ -58,5 +58,7 @@ admin.site.register(TaskTimeLog)
 admin.site.register(GoalSchedule)
 admin.site.register(GoalProgress)
 admin.site.register(ScheduleEntry)
+admin.site.register(ScheduleEntryException)
 admin.site.register(Goals)
-admin.site.register(SleepLog)
\ No newline at end of file
+admin.site.register(SleepLog)
+admin.site.register(ReminderSchedule)
\ No newline at end of file
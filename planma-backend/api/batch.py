@@ -0,0 +1,401 @@
+from collections import defaultdict
+from datetime import datetime
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from .dashboard import invalidate_dashboard
+from .models import CustomActivity, CustomEvents, CustomSubject, CustomTask, Goals, GoalSchedule, ScheduleEntry
+from .reminders import schedule_reminder, schedule_reminders
+from .scheduling import _as_slot, find_conflicts, overlaps_within
+from .serializers import (
+    CustomActivitySerializer, CustomEventSerializer, CustomTaskSerializer, GoalScheduleSerializer
+)
+from .sync import SYNC_COLLECTION_NAMES
+from .versions import bump_versions
+
+# Largest number of operations accepted in one batch
+MAX_BATCH_OPERATIONS = 500
+
+OPERATIONS = ('create', 'update', 'delete')
+
+OVERLAP_MESSAGE = 'This time slot is already occupied. Please choose another time.'
+
+SLOT_FIELDS = ('scheduled_date', 'scheduled_start_time', 'scheduled_end_time')
+
+# What each batch `type` writes. `fields` may be sent in `data`; `required`
+# must be set once an update is merged over the stored row; `unique` is the
+# duplicate check the single-item endpoints run.
+BATCH_TYPES = {
+    'task': {
+        'model': CustomTask, 'serializer': CustomTaskSerializer, 'category': 'Task',
+        'student': 'student_id',
+        'fields': ('task_name', 'task_desc', *SLOT_FIELDS, 'deadline', 'subject_id', 'status'),
+        'required': ('task_name', *SLOT_FIELDS, 'deadline', 'subject_id'),
+        'unique': SLOT_FIELDS,
+        'duplicate': 'Conflicting task schedule detected.',
+    },
+    'activity': {
+        'model': CustomActivity, 'serializer': CustomActivitySerializer, 'category': 'Activity',
+        'student': 'student_id',
+        'fields': ('activity_name', 'activity_desc', *SLOT_FIELDS, 'status'),
+        'required': ('activity_name', *SLOT_FIELDS),
+        'unique': SLOT_FIELDS,
+        'duplicate': 'Conflicting activity schedule detected.',
+    },
+    'event': {
+        'model': CustomEvents, 'serializer': CustomEventSerializer, 'category': 'Event',
+        'student': 'student_id',
+        'fields': ('event_name', 'event_desc', 'location', *SLOT_FIELDS, 'event_type'),
+        'required': ('event_name', 'location', *SLOT_FIELDS, 'event_type'),
+        'unique': SLOT_FIELDS,
+        'duplicate': 'Conflicting event schedule detected.',
+    },
+    'goal_schedule': {
+        'model': GoalSchedule, 'serializer': GoalScheduleSerializer, 'category': 'Goal',
+        'student': 'goal_id__student_id',
+        'fields': ('goal_id', *SLOT_FIELDS, 'status'),
+        'required': ('goal_id', *SLOT_FIELDS),
+        'unique': ('goal_id', *SLOT_FIELDS),
+        'duplicate': 'Duplicate goal instance detected.',
+    },
+}
+
+# Foreign keys a batch may point at, limited to the student's own rows
+PARENTS = {'subject_id': CustomSubject, 'goal_id': Goals}
+
+
+class OperationError(Exception):
+    def __init__(self, message, error_type=None):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+def _id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _deadline(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return timezone.make_aware(datetime.strptime(value, "%Y-%m-%dT%H:%M"))
+    except (TypeError, ValueError):
+        raise OperationError('Invalid deadline format. Use "YYYY-MM-DDTHH:MM".')
+
+
+class Operation:
+    def __init__(self, index, payload):
+        self.index = index
+        self.payload = payload if isinstance(payload, dict) else {}
+        self.op = self.payload.get('op')
+        self.type = self.payload.get('type')
+        self.spec = BATCH_TYPES.get(self.type)
+        self.id = _id(self.payload.get('id'))
+        self.data = self.payload.get('data') or {}
+        self.instance = None
+        self.values = None
+        self.error = None
+
+    @property
+    def writes_slot(self):
+        return self.error is None and self.op in ('create', 'update')
+
+    def fail(self, error):
+        self.error = error
+
+    def result(self, applied, context):
+        result = {'index': self.index, 'op': self.op, 'type': self.type}
+        if 'ref' in self.payload:
+            result['ref'] = self.payload['ref']
+        if self.error is not None:
+            result.update(status='error', error=str(self.error))
+            if self.error.error_type:
+                result['error_type'] = self.error.error_type
+        elif not applied:
+            result['status'] = 'not_applied'
+        elif self.op == 'delete':
+            result.update(status='deleted', id=self.id)
+        else:
+            result.update(
+                status='created' if self.op == 'create' else 'updated',
+                id=self.instance.pk,
+                data=self.spec['serializer'](self.instance, context=context).data,
+            )
+        return result
+
+
+class WriteBatch:
+    """
+    Mixed create/update/delete operations on tasks, activities, events and
+    goal schedules for one student. Duplicates and overlaps of the whole
+    batch are checked with one query per type plus one conflict query, and
+    the writes go out with bulk_create/bulk_update, so the query count does
+    not grow with the batch size (deletes still run their per-row signals).
+    """
+
+    def __init__(self, student, operations):
+        self.student = student
+        self.operations = [Operation(index, payload) for index, payload in enumerate(operations)]
+        # Goals a goal session was moved away from by an update
+        self.left_goals = set()
+
+    @property
+    def errors(self):
+        return [operation for operation in self.operations if operation.error is not None]
+
+    def of(self, op, type_name):
+        return [
+            operation for operation in self.operations
+            if operation.error is None and operation.op == op and operation.type == type_name
+        ]
+
+    # ---------------------------
+    #   VALIDATION
+    # ---------------------------
+    def validate(self):
+        for operation in self.operations:
+            if operation.op not in OPERATIONS or operation.spec is None:
+                operation.fail(OperationError(
+                    f"op must be one of {', '.join(OPERATIONS)} and type one of {', '.join(BATCH_TYPES)}."
+                ))
+            elif operation.op != 'create' and operation.id is None:
+                operation.fail(OperationError('id is required to update or delete.'))
+            elif operation.op != 'delete' and not isinstance(operation.data, dict):
+                operation.fail(OperationError('data must be an object.'))
+
+        self._load_targets()
+        parents = self._load_parents()
+        for operation in self.operations:
+            if operation.writes_slot:
+                try:
+                    operation.values = self._clean(operation, parents)
+                except OperationError as error:
+                    operation.fail(error)
+        # A failed update keeps its row in the old slot, which can clash with
+        # operations that passed, so check again until nothing new fails
+        while True:
+            failed = len(self.errors)
+            self._check_duplicates()
+            self._check_overlaps()
+            if len(self.errors) == failed:
+                return not self.errors
+
+    def _leaving(self, type_name=None):
+        # Rows this batch moves or deletes no longer hold their old slot
+        return [
+            operation for operation in self.operations
+            if operation.error is None and operation.op in ('update', 'delete')
+            and (type_name is None or operation.type == type_name)
+        ]
+
+    def _load_targets(self):
+        # The rows updated or deleted, one query per type, limited to the student's own
+        for type_name, spec in BATCH_TYPES.items():
+            operations = self.of('update', type_name) + self.of('delete', type_name)
+            if not operations:
+                continue
+            rows = spec['model'].objects.filter(
+                pk__in={operation.id for operation in operations}, **{spec['student']: self.student}
+            ).in_bulk()
+            for operation in operations:
+                operation.instance = rows.get(operation.id)
+                if operation.instance is None:
+                    operation.fail(OperationError('Not found.'))
+
+    def _load_parents(self):
+        wanted = defaultdict(set)
+        for operation in self.operations:
+            if not operation.writes_slot:
+                continue
+            for field in PARENTS:
+                if field not in operation.spec['fields']:
+                    continue
+                value = operation.data.get(field)
+                if value is None and operation.instance is not None:
+                    value = getattr(operation.instance, f'{field}_id')
+                if _id(value) is not None:
+                    wanted[field].add(_id(value))
+        return {
+            field: PARENTS[field].objects.filter(pk__in=ids, student_id=self.student).in_bulk()
+            for field, ids in wanted.items()
+        }
+
+    def _clean(self, operation, parents):
+        """Merge the sent data over the stored row and parse it into model values"""
+        spec = operation.spec
+        values = {}
+        if operation.instance is not None:
+            values = {
+                field: getattr(operation.instance, f'{field}_id' if field in PARENTS else field)
+                for field in spec['fields']
+            }
+        values.update({field: value for field, value in operation.data.items() if field in spec['fields']})
+
+        missing = [field for field in spec['required'] if values.get(field) in (None, '')]
+        if missing:
+            raise OperationError(f"Missing required fields: {', '.join(missing)}.")
+
+        try:
+            values.update(zip(SLOT_FIELDS, _as_slot(*(values[field] for field in SLOT_FIELDS))))
+        except ValidationError:
+            raise OperationError('Invalid date or time format.')
+
+        for field, model in PARENTS.items():
+            if field in values and not isinstance(values[field], model):
+                values[field] = parents.get(field, {}).get(_id(values[field]))
+                if values[field] is None:
+                    raise OperationError(f'{field} not found.')
+
+        for field in ('task_desc', 'activity_desc', 'event_desc'):
+            # Blank descriptions are stored as NULL, like the single-item endpoints do
+            if isinstance(values.get(field), str) and values[field].strip() == '':
+                values[field] = None
+
+        if 'deadline' in values:
+            values['deadline'] = _deadline(values['deadline'])
+
+        if 'status' in spec['fields']:
+            values['status'] = values.get('status') or 'Pending'
+            choices = dict(spec['model']._meta.get_field('status').choices)
+            if values['status'] not in choices:
+                raise OperationError(f"status must be one of {', '.join(choices)}.")
+        return values
+
+    def _unique_key(self, spec, values):
+        return tuple(values[field].pk if field in PARENTS else values[field] for field in spec['unique'])
+
+    def _check_duplicates(self):
+        for type_name, spec in BATCH_TYPES.items():
+            operations = self.of('create', type_name) + self.of('update', type_name)
+            if not operations:
+                continue
+            existing = spec['model'].objects.filter(
+                scheduled_date__in={operation.values['scheduled_date'] for operation in operations},
+                **{spec['student']: self.student}
+            ).exclude(pk__in=[operation.id for operation in self._leaving(type_name)])
+            taken = set(existing.values_list(*spec['unique']))
+            for operation in operations:
+                key = self._unique_key(spec, operation.values)
+                if key in taken:
+                    operation.fail(OperationError(spec['duplicate']))
+                taken.add(key)
+
+    def _check_overlaps(self):
+        operations = [operation for operation in self.operations if operation.writes_slot]
+        if not operations:
+            return
+        slots = [tuple(operation.values[field] for field in SLOT_FIELDS) for operation in operations]
+        ignore = {(operation.spec['category'], operation.id) for operation in self._leaving()}
+        clashing = set(find_conflicts(self.student.student_id, slots, ignore=ignore)) | overlaps_within(slots)
+        for index in clashing:
+            operations[index].fail(OperationError(OVERLAP_MESSAGE, error_type='overlap'))
+
+    # ---------------------------
+    #   WRITES
+    # ---------------------------
+    def apply(self):
+        now = timezone.now()
+        with transaction.atomic():
+            for type_name, spec in BATCH_TYPES.items():
+                deletes = self.of('delete', type_name)
+                if deletes:
+                    # Cascades to the schedule entries; signals drop reminders and record tombstones
+                    spec['model'].objects.filter(pk__in=[operation.id for operation in deletes]).delete()
+
+            entries = []
+            touched_goals = {}
+            for type_name, spec in BATCH_TYPES.items():
+                updated = self._apply_updates(spec, self.of('update', type_name), now)
+                created = self._apply_creates(spec, self.of('create', type_name))
+                entries += [
+                    ScheduleEntry(
+                        category_type=spec['category'],
+                        reference_id=instance.pk,
+                        student_id=self.student,
+                        scheduled_date=instance.scheduled_date,
+                        scheduled_start_time=instance.scheduled_start_time,
+                        scheduled_end_time=instance.scheduled_end_time,
+                    ).link_reference()
+                    for instance in created
+                ]
+                if spec['category'] == 'Goal':
+                    touched_goals.update((instance.goal_id_id, instance.goal_id) for instance in updated + created)
+                elif updated + created:
+                    schedule_reminders(spec['category'], updated + created, now=now)
+            ScheduleEntry.objects.bulk_create(entries)
+
+            # A new or moved goal session can make the goal's reminder due
+            # again, and the goal a session left is rescheduled without it
+            left_goals = Goals.objects.filter(pk__in=self.left_goals - set(touched_goals))
+            for goal in [*touched_goals.values(), *left_goals]:
+                schedule_reminder('Goal', goal, now=now)
+
+            # Bulk writes skip post_save, so the collection versions and the
+            # dashboard cache are refreshed here
+            written = {operation.type for operation in self.operations if operation.writes_slot}
+            if written:
+                bump_versions(self.student.student_id, 'schedule', *(
+                    SYNC_COLLECTION_NAMES[BATCH_TYPES[type_name]['model']] for type_name in written
+                ))
+                invalidate_dashboard(self.student.student_id)
+
+    def _apply_updates(self, spec, operations, now):
+        if not operations:
+            return []
+        instances = []
+        for operation in operations:
+            instance = operation.instance
+            moved_later = (operation.values['scheduled_date'], operation.values['scheduled_start_time']) > (
+                instance.scheduled_date, instance.scheduled_start_time
+            )
+            if 'goal_id' in operation.values and operation.values['goal_id'].pk != instance.goal_id_id:
+                self.left_goals.add(instance.goal_id_id)
+            for field, value in operation.values.items():
+                setattr(instance, field, value)
+            # Moved to a later time: its reminder is due again
+            if getattr(instance, 'reminder_sent', False) and moved_later:
+                instance.reminder_sent = False
+            # bulk_update does not run auto_now
+            instance.updated_at = now
+            instances.append(instance)
+
+        fields = list(spec['fields']) + ['updated_at']
+        if hasattr(spec['model'], 'reminder_sent'):
+            fields.append('reminder_sent')
+        spec['model'].objects.bulk_update(instances, fields)
+
+        # Move the schedule entries along with their items, relinked to them
+        # and their owner in case the item moved to another parent
+        by_id = {instance.pk: instance for instance in instances}
+        schedule_entries = list(ScheduleEntry.objects.filter(category_type=spec['category'], reference_id__in=by_id))
+        for entry in schedule_entries:
+            for field in SLOT_FIELDS:
+                setattr(entry, field, getattr(by_id[entry.reference_id], field))
+            entry.student_id = self.student
+            entry.link_reference()
+            entry.updated_at = now
+        ScheduleEntry.objects.bulk_update(schedule_entries, [
+            *SLOT_FIELDS, 'student_id', *ScheduleEntry.REFERENCE_FIELDS.values(), 'updated_at'
+        ])
+        return instances
+
+    def _apply_creates(self, spec, operations):
+        if not operations:
+            return []
+        owner = {} if spec['student'] != 'student_id' else {'student_id': self.student}
+        instances = [spec['model'](**operation.values, **owner) for operation in operations]
+        spec['model'].objects.bulk_create(instances)
+        for operation, instance in zip(operations, instances):
+            operation.instance = instance
+        return instances
+
+    def run(self, atomic=True, context=None):
+        """Validate and apply; with atomic=False the valid operations are applied even if others fail"""
+        valid = self.validate()
+        applied = valid or (not atomic and len(self.errors) < len(self.operations))
+        if applied:
+            self.apply()
+        return applied, [operation.result(applied, context) for operation in self.operations]
@@ -0,0 +1,260 @@
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import (
+    Aggregate, Case, CharField, Count, DateField, F, FloatField, Func, JSONField, OuterRef, Subquery, Sum, Value,
+    When,
+)
+from django.db.models.functions import Coalesce, JSONObject
+from django.utils import timezone
+from .models import (
+    CustomActivity, CustomClassSchedule, CustomEvents, CustomSemester, CustomTask, CustomUser, DailyTimeRollup,
+    Goals, ScheduleEntry,
+)
+
+# Cached dashboards are dropped by signals as soon as a counted row changes;
+# the timeout only bounds the damage of an invalidation that never arrives
+DASHBOARD_CACHE_SECONDS = 60 * 10
+
+DASHBOARD_METRICS = {'hits': 'metrics:dashboard:hits', 'misses': 'metrics:dashboard:misses'}
+
+
+def _data_key(student_id, variant=''):
+    return f'dashboard:{student_id}:{variant}' if variant else f'dashboard:{student_id}'
+
+
+def _generation_key(student_id):
+    # Changes on every invalidation. A dashboard is only served if it was
+    # built under the current generation, so a rebuild that raced a write
+    # cannot put stale counts back into the cache.
+    return f'dashboard-generation:{student_id}'
+
+
+def _record(metric):
+    key = DASHBOARD_METRICS[metric]
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr
+        cache.set(key, 1, timeout=None)
+
+
+def get_cached_dashboard(student_id, variant=''):
+    """
+    (payload, generation): today's cached dashboard or None on a miss, plus
+    the generation to pass to cache_dashboard() after rebuilding it.
+    `variant` names the widget set the payload was built with.
+    """
+    cached = cache.get_many([_data_key(student_id, variant), _generation_key(student_id)])
+    generation = cached.get(_generation_key(student_id))
+    if generation is None:
+        generation = time.time_ns()
+        cache.add(_generation_key(student_id), generation, timeout=None)
+    entry = cached.get(_data_key(student_id, variant))
+    if entry and entry['generation'] == generation and entry['date'] == timezone.localdate().isoformat():
+        _record('hits')
+        return entry['data'], generation
+    _record('misses')
+    return None, generation
+
+
+def cache_dashboard(student_id, generation, data, variant=''):
+    cache.set(_data_key(student_id, variant), {
+        'generation': generation,
+        'date': timezone.localdate().isoformat(),
+        'data': data,
+    }, DASHBOARD_CACHE_SECONDS)
+
+
+def invalidate_dashboard(student_id):
+    """Drop a student's cached dashboard once the current transaction commits"""
+    # The new generation retires every widget variant; the plain dashboard
+    # is also deleted outright since it is the one almost always cached
+    def invalidate():
+        cache.set(_generation_key(student_id), time.time_ns(), timeout=None)
+        cache.delete(_data_key(student_id))
+
+    transaction.on_commit(invalidate)
+
+
+def dashboard_cache_stats():
+    counts = cache.get_many(DASHBOARD_METRICS.values())
+    hits = counts.get(DASHBOARD_METRICS['hits'], 0)
+    misses = counts.get(DASHBOARD_METRICS['misses'], 0)
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 3) if hits + misses else None,
+    }
+
+
+# ---------------------------
+#   AGGREGATION
+# ---------------------------
+# The whole dashboard is one SELECT on the student's row: every count and
+# widget is a correlated subquery annotated onto it, so adding a widget adds
+# a subquery rather than a round trip.
+class JSONArrayAgg(Aggregate):
+    """The aggregated values as one JSON array"""
+    function = 'JSONB_AGG'
+    output_field = JSONField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, function='JSON_GROUP_ARRAY', **extra_context)
+
+
+class DurationSeconds(Func):
+    """A DurationField value as a number of seconds (it is microseconds on SQLite)"""
+    template = 'EXTRACT(EPOCH FROM %(expressions)s)'
+    output_field = FloatField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(compiler, connection, template='(%(expressions)s / 1000000.0)', **extra_context)
+
+
+def _per_student(queryset, **aggregate):
+    """Correlated subquery aggregating the outer student's rows of `queryset`"""
+    (name, expression), = aggregate.items()
+    return Subquery(
+        queryset.filter(student_id=OuterRef('pk')).order_by()
+        .values('student_id').annotate(**{name: expression}).values(name)
+    )
+
+
+def _count(queryset):
+    return Coalesce(_per_student(queryset, count=Count('pk')), 0)
+
+
+def _logged_seconds(rollups):
+    return Coalesce(DurationSeconds(_per_student(rollups, total=Sum('total_duration'))), 0.0)
+
+
+def _hours(seconds):
+    return round(seconds / 3600, 2)
+
+
+def _recent_semester(today):
+    # The latest semester that has already started, else the latest one
+    return Subquery(
+        CustomSemester.objects.filter(student_id=OuterRef('pk')).order_by(
+            Case(When(sem_start_date__lte=today, then=Value(0)), default=Value(1)), '-sem_start_date'
+        ).values('semester_id')[:1]
+    )
+
+
+def _today_schedule(today):
+    entries = ScheduleEntry.objects.on_date(today)
+    return _per_student(entries, schedule=JSONArrayAgg(JSONObject(
+        category_type=F('category_type'),
+        reference_id=F('reference_id'),
+        name=Coalesce(
+            'task_id__task_name', 'event_id__event_name', 'activity_id__activity_name',
+            'goalschedule_id__goal_id__goal_name', 'classsched_id__subject__subject_code',
+            output_field=CharField(),
+        ),
+        status=Coalesce(
+            'task_id__status', 'activity_id__status', 'goalschedule_id__status', output_field=CharField()
+        ),
+        scheduled_start_time=F('scheduled_start_time'),
+        scheduled_end_time=F('scheduled_end_time'),
+    )))
+
+
+def _hours_this_week(today):
+    week_start = today - timedelta(days=today.weekday())
+    rollups = DailyTimeRollup.objects.filter(
+        category__in=['Task', 'Activity', 'Goal'], date__range=(week_start, today)
+    )
+    return _logged_seconds(rollups)
+
+
+def _goal_progress(today):
+    # Time logged towards each goal in its current day / week / month
+    goals = Goals.objects.annotate(period_start=Case(
+        When(timeframe='Daily', then=Value(today)),
+        When(timeframe='Weekly', then=Value(today - timedelta(days=today.weekday()))),
+        default=Value(today.replace(day=1)),
+        output_field=DateField(),
+    ), logged=Subquery(
+        DailyTimeRollup.objects.filter(
+            goal_id=OuterRef('pk'), category='Goal', date__gte=OuterRef('period_start'), date__lte=today
+        ).order_by().values('goal_id').annotate(total=Sum('total_duration')).values('total')
+    ))
+    return _per_student(goals, progress=JSONArrayAgg(JSONObject(
+        goal_id=F('goal_id'),
+        goal_name=F('goal_name'),
+        timeframe=F('timeframe'),
+        target_hours=F('target_hours'),
+        logged_seconds=Coalesce(DurationSeconds('logged'), 0.0),
+    )))
+
+
+# A student with no rows gets NULL rather than an empty array
+def _load_schedule(entries):
+    return sorted(entries or [], key=lambda entry: (entry['scheduled_start_time'], entry['scheduled_end_time']))
+
+
+def _load_goal_progress(goals):
+    progress = []
+    for goal in sorted(goals or [], key=lambda goal: goal['goal_id']):
+        logged_hours = _hours(goal.pop('logged_seconds'))
+        progress.append({
+            **goal,
+            'logged_hours': logged_hours,
+            'percent': round(100 * logged_hours / goal['target_hours'], 1) if goal['target_hours'] else None,
+        })
+    return progress
+
+
+# Optional blocks requested with ?widgets=. `annotate` builds the subquery
+# for a given day, `load` shapes its value, and `collections` (see
+# sync.SYNC_COLLECTIONS) are the rows it is computed from.
+DASHBOARD_WIDGETS = {
+    'today_schedule': {
+        'annotate': _today_schedule, 'load': _load_schedule,
+        'collections': ('schedule', 'tasks', 'events', 'activities', 'goals', 'goal-schedules', 'subjects'),
+    },
+    'hours_this_week': {
+        'annotate': _hours_this_week, 'load': _hours,
+        'collections': ('task-logs', 'activity-logs', 'goal-progress'),
+    },
+    'goal_progress': {
+        'annotate': _goal_progress, 'load': _load_goal_progress,
+        'collections': ('goals', 'goal-progress'),
+    },
+}
+
+DASHBOARD_COLLECTIONS = ('class-schedules', 'subjects', 'semesters', 'tasks', 'events', 'activities', 'goals')
+
+
+def dashboard_collections(widgets=()):
+    """Sync collections a dashboard with these widgets is computed from"""
+    collections = dict.fromkeys(DASHBOARD_COLLECTIONS)
+    for widget in widgets:
+        collections.update(dict.fromkeys(DASHBOARD_WIDGETS[widget]['collections']))
+    return tuple(collections)
+
+
+def build_dashboard(student_id, widgets=(), today=None):
+    """The dashboard counts plus the requested widgets, in a single query"""
+    today = today or timezone.localdate()
+    row = CustomUser.objects.filter(pk=student_id).annotate(
+        selected_semester_id=_recent_semester(today),
+    ).annotate(
+        class_schedule_count=_count(CustomClassSchedule.objects.filter(
+            subject__semester_id=OuterRef('selected_semester_id')
+        )),
+        pending_tasks_count=_count(CustomTask.objects.filter(status='Pending')),
+        upcoming_events_count=_count(CustomEvents.objects.filter(scheduled_date__gte=today)),
+        pending_activities_count=_count(CustomActivity.objects.filter(status='Pending')),
+        goals_count=_count(Goals.objects.all()),
+        **{widget: DASHBOARD_WIDGETS[widget]['annotate'](today) for widget in widgets},
+    ).values(
+        'selected_semester_id', 'class_schedule_count', 'pending_tasks_count', 'upcoming_events_count',
+        'pending_activities_count', 'goals_count', *widgets,
+    ).get()
+    for widget in widgets:
+        row[widget] = DASHBOARD_WIDGETS[widget]['load'](row[widget])
+    return row
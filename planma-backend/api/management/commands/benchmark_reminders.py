@@ -0,0 +1,160 @@
+import random
+import time
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from api.managers import DEFAULT_REMINDER_OFFSET
+from api.models import (
+    CustomUser, UserPref, CustomSemester, CustomSubject, CustomTask, CustomEvents,
+    CustomActivity, CustomClassSchedule
+)
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+OFFSETS = [timedelta(minutes=m) for m in (10, 15, 30, 60)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway dataset and compare the Python reminder loops with the "
+        "SQL due_reminders() querysets (rows fetched and wall time). Everything "
+        "is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Planner rows to seed (split over 4 categories)')
+        parser.add_argument('--rows-per-user', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        now = timezone.now()
+
+        with transaction.atomic():
+            self.seed(options['rows'], options['rows_per_user'], now)
+            self.stdout.write(f"{'category':<10} {'loop rows':>10} {'loop ms':>9} {'sql rows':>9} {'sql ms':>8}  match")
+            for category, loop, sql in [
+                ('Task', self.loop_tasks, CustomTask.objects.due_reminders),
+                ('Event', self.loop_events, CustomEvents.objects.due_reminders),
+                ('Activity', self.loop_activities, CustomActivity.objects.due_reminders),
+                ('Class', self.loop_classes, CustomClassSchedule.objects.due_reminders),
+            ]:
+                loop_ms, (loop_rows, loop_due) = self.timed(loop, now)
+
+                def run_sql():
+                    rows = list(sql(now))
+                    return len(rows), {row.pk for row in rows}
+                sql_ms, (sql_rows, sql_due) = self.timed(run_sql)
+
+                self.stdout.write(
+                    f"{category:<10} {loop_rows:>10} {loop_ms:>9.1f} {sql_rows:>9} {sql_ms:>8.1f}  {loop_due == sql_due}"
+                )
+            transaction.set_rollback(True)
+
+    def timed(self, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        return (time.perf_counter() - start) * 1000, result
+
+    def seed(self, rows, rows_per_user, now):
+        today = timezone.localdate(now)
+        user_count = max(1, rows // rows_per_user)
+        self.stdout.write(f"Seeding {rows} rows for {user_count} users...")
+
+        users = CustomUser.objects.bulk_create([
+            CustomUser(firstname='Bench', lastname=str(i), email=f'bench{i}@planma.test', username=f'bench{i}', password='!')
+            for i in range(user_count)
+        ])
+        UserPref.objects.bulk_create([
+            UserPref(student_id=user, reminder_offset_time=random.choice(OFFSETS)) for user in users
+        ])
+        semesters = CustomSemester.objects.bulk_create([
+            CustomSemester(
+                acad_year_start=today.year, acad_year_end=today.year + 1, year_level='1st Year',
+                semester='1st Semester', sem_start_date=today, sem_end_date=today + timedelta(days=120),
+                student_id=user
+            ) for user in users
+        ])
+        subjects = CustomSubject.objects.bulk_create([
+            CustomSubject(subject_code='BENCH', subject_title='Benchmark', student_id=user, semester_id=semester)
+            for user, semester in zip(users, semesters)
+        ])
+
+        def start():
+            # Spread start times over three days so only a small slice is due now
+            return timezone.localtime(now + timedelta(minutes=random.randint(-60, 3 * 24 * 60)))
+
+        per_category = rows // 4
+        tasks, events, activities, classes = [], [], [], []
+        for i in range(per_category):
+            index = i % user_count
+            user, subject = users[index], subjects[index]
+            task_start, event_start, activity_start = start(), start(), start()
+            tasks.append(CustomTask(
+                task_name=f'Task {i}', scheduled_date=task_start.date(), scheduled_start_time=task_start.time(),
+                scheduled_end_time=task_start.time(), deadline=task_start, subject_id=subject, student_id=user
+            ))
+            events.append(CustomEvents(
+                event_name=f'Event {i}', location='Bench', scheduled_date=event_start.date(),
+                scheduled_start_time=event_start.time(), scheduled_end_time=event_start.time(),
+                event_type='Academic', student_id=user
+            ))
+            activities.append(CustomActivity(
+                activity_name=f'Activity {i}', scheduled_date=activity_start.date(),
+                scheduled_start_time=activity_start.time(), scheduled_end_time=activity_start.time(),
+                status='Pending', student_id=user
+            ))
+            class_start = start()
+            classes.append(CustomClassSchedule(
+                subject=subject, day_of_week=random.choice(DAYS), scheduled_start_time=class_start.time(),
+                scheduled_end_time=class_start.time(), room=f'R{i}', student_id=user
+            ))
+
+        # bulk_create skips the post_save signals, so the reminder schedule is left alone
+        for model, objs in [(CustomTask, tasks), (CustomEvents, events), (CustomActivity, activities), (CustomClassSchedule, classes)]:
+            model.objects.bulk_create(objs, batch_size=2000)
+
+    # The Python loops the reminder functions used before due_reminders()
+    def offsets(self):
+        return {
+            student_id: offset or DEFAULT_REMINDER_OFFSET
+            for student_id, offset in UserPref.objects.values_list('student_id', 'reminder_offset_time')
+        }
+
+    def loop_tasks(self, now):
+        offsets = self.offsets()
+        rows = list(CustomTask.objects.filter(
+            reminder_sent=False, status__in=['Pending', 'In Progress'], scheduled_date__gte=timezone.localdate(now)
+        ))
+        due = {
+            task.pk for task in rows
+            if now >= task.deadline - offsets.get(task.student_id_id, DEFAULT_REMINDER_OFFSET)
+        }
+        return len(rows), due
+
+    def _loop_starting(self, queryset, now, day=None):
+        offsets = self.offsets()
+        rows = list(queryset)
+        due = set()
+        for row in rows:
+            starts_at = timezone.make_aware(datetime.combine(day or row.scheduled_date, row.scheduled_start_time))
+            reminder_time = starts_at - offsets.get(row.student_id_id, DEFAULT_REMINDER_OFFSET)
+            if now >= reminder_time and now < starts_at:
+                due.add(row.pk)
+        return len(rows), due
+
+    def loop_events(self, now):
+        return self._loop_starting(CustomEvents.objects.filter(
+            reminder_sent=False, scheduled_date__gte=timezone.localdate(now)
+        ), now)
+
+    def loop_activities(self, now):
+        return self._loop_starting(CustomActivity.objects.filter(
+            reminder_sent=False, status__in=['Pending', 'In Progress'], scheduled_date__gte=timezone.localdate(now)
+        ), now)
+
+    def loop_classes(self, now):
+        today = timezone.localdate(now)
+        return self._loop_starting(CustomClassSchedule.objects.filter(
+            day_of_week=today.strftime("%A")
+        ).exclude(last_reminder_date=today), now, day=today)
@@ -0,0 +1,144 @@
+from datetime import date, timedelta
+from django.apps import apps
+from django.conf import settings
+from django.db import models
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, Func, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# Used when a student has not saved a reminder offset yet
+DEFAULT_REMINDER_OFFSET = timedelta(minutes=30)
+
+
+class LocalDateTime(Func):
+    """
+    Combine a date and a time (both local to settings.TIME_ZONE) into an aware
+    timestamp, so "scheduled_date + scheduled_start_time" can be compared to
+    timezone.now() inside the database.
+    """
+    arity = 2
+    output_field = DateTimeField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # PostgreSQL: date + time gives a local timestamp, AT TIME ZONE makes it aware
+        sql, params = super().as_sql(
+            compiler, connection, template='(%(expressions)s)', arg_joiner=' + ', **extra_context
+        )
+        return f'({sql} AT TIME ZONE %s)', (*params, settings.TIME_ZONE)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # SQLite: Django sets the process TZ to TIME_ZONE, so 'utc' converts from it
+        return super().as_sql(
+            compiler, connection, template="datetime(%(expressions)s, 'utc')",
+            arg_joiner=" || ' ' || ", **extra_context
+        )
+
+
+class ReminderQuerySet(models.QuerySet):
+    """Shared helpers for the planner rows that send reminders"""
+
+    def with_reminder_offset(self):
+        """Annotate each row with its owner's reminder offset (default if unset)"""
+        UserPref = apps.get_model('api', 'UserPref')
+        offset = UserPref.objects.filter(
+            student_id=OuterRef('student_id')
+        ).values('reminder_offset_time')[:1]
+        return self.annotate(reminder_offset=Coalesce(
+            Subquery(offset, output_field=DurationField()),
+            Value(DEFAULT_REMINDER_OFFSET, output_field=DurationField())
+        ))
+
+    def _with_remind_at(self, starts_at):
+        return self.with_reminder_offset().annotate(
+            starts_at=starts_at,
+            remind_at=ExpressionWrapper(F('starts_at') - F('reminder_offset'), output_field=DateTimeField()),
+        )
+
+
+class TaskQuerySet(ReminderQuerySet):
+    def due_reminders(self, now=None):
+        """Pending tasks whose deadline minus the offset has passed"""
+        now = now or timezone.now()
+        return self._with_remind_at(F('deadline')).filter(
+            reminder_sent=False,
+            status__in=['Pending', 'In Progress'],
+            scheduled_date__gte=timezone.localdate(now),
+            remind_at__lte=now,
+        )
+
+
+class EventQuerySet(ReminderQuerySet):
+    def due_reminders(self, now=None):
+        """Events inside their reminder window that have not started yet"""
+        now = now or timezone.now()
+        return self._with_remind_at(
+            LocalDateTime(F('scheduled_date'), F('scheduled_start_time'))
+        ).filter(
+            reminder_sent=False,
+            scheduled_date__gte=timezone.localdate(now),
+            remind_at__lte=now,
+            starts_at__gt=now,
+        )
+
+
+class ActivityQuerySet(ReminderQuerySet):
+    def due_reminders(self, now=None):
+        """Pending activities inside their reminder window that have not started yet"""
+        now = now or timezone.now()
+        return self._with_remind_at(
+            LocalDateTime(F('scheduled_date'), F('scheduled_start_time'))
+        ).filter(
+            reminder_sent=False,
+            status__in=['Pending', 'In Progress'],
+            scheduled_date__gte=timezone.localdate(now),
+            remind_at__lte=now,
+            starts_at__gt=now,
+        )
+
+
+class ClassScheduleQuerySet(ReminderQuerySet):
+    def due_reminders(self, now=None):
+        """Today's classes inside their reminder window that were not reminded today"""
+        now = now or timezone.now()
+        today = timezone.localdate(now)
+        return self._with_remind_at(
+            LocalDateTime(Value(today, output_field=models.DateField()), F('scheduled_start_time'))
+        ).filter(
+            day_of_week=today.strftime("%A"),
+            remind_at__lte=now,
+            starts_at__gt=now,
+        ).exclude(
+            last_reminder_date=today
+        )
+
+
+def _as_date(value):
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def django_week_day(day):
+    """Django's __week_day number (Sunday=1 ... Saturday=7) for a date"""
+    return day.isoweekday() % 7 + 1
+
+
+class ScheduleEntryQuerySet(models.QuerySet):
+    def between(self, start, end):
+        """Entries that may occur in [start, end]; expand them with entry.occurrences()"""
+        start, end = _as_date(start), _as_date(end)
+        return self.filter(
+            Q(recurrence='Once', scheduled_date__range=(start, end)) |
+            Q(recurrence='Weekly', scheduled_date__lte=end, recurrence_end__gte=start)
+        )
+
+    def on_date(self, day):
+        """Entries occurring on `day`: one-off entries plus weekly rules matching its weekday"""
+        day = _as_date(day)
+        return self.filter(
+            Q(recurrence='Once', scheduled_date=day) |
+            Q(
+                recurrence='Weekly',
+                scheduled_date__lte=day,
+                recurrence_end__gte=day,
+                scheduled_date__week_day=django_week_day(day)
+            )
+        ).exclude(exceptions__exception_date=day)
@@ -0,0 +1,143 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:03
+
+import django.db.models.deletion
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# Frozen copy of the reminder rules as of this migration (api/reminders.py
+# may change later; this backfill must keep working on the fields it saw)
+DEFAULT_REMINDER_OFFSET = timedelta(minutes=30)
+WAKE_REMINDER_LEAD = timedelta(minutes=5)
+
+
+def _local_datetime(day, time_of_day):
+    return timezone.make_aware(datetime.combine(day, time_of_day))
+
+
+def _task_remind_at(task, offset, now):
+    if task.reminder_sent or task.status not in ('Pending', 'In Progress'):
+        return None
+    if task.scheduled_date < timezone.localdate(now):
+        return None
+    return task.deadline - offset
+
+
+def _event_remind_at(event, offset, now):
+    event_datetime = _local_datetime(event.scheduled_date, event.scheduled_start_time)
+    if event.reminder_sent or event_datetime <= now:
+        return None
+    return event_datetime - offset
+
+
+def _activity_remind_at(activity, offset, now):
+    if activity.reminder_sent or activity.status not in ('Pending', 'In Progress'):
+        return None
+    activity_datetime = _local_datetime(activity.scheduled_date, activity.scheduled_start_time)
+    if activity_datetime <= now:
+        return None
+    return activity_datetime - offset
+
+
+def _class_remind_at(class_schedule, offset, now):
+    today = timezone.localdate(now)
+    for days_ahead in range(8):
+        day = today + timedelta(days=days_ahead)
+        if day.strftime("%A") != class_schedule.day_of_week:
+            continue
+        class_datetime = _local_datetime(day, class_schedule.scheduled_start_time)
+        if day == today and (class_schedule.last_reminder_date == today or class_datetime <= now):
+            continue
+        return class_datetime - offset
+    return None
+
+
+def _goal_remind_at(goal, offset, now):
+    today = timezone.localdate(now)
+    for days_ahead in range(32):
+        day = today + timedelta(days=days_ahead)
+        if day == goal.last_reminder_date:
+            continue
+        if (goal.timeframe == 'Daily'
+                or (goal.timeframe == 'Weekly' and day.weekday() == 0)
+                or (goal.timeframe == 'Monthly' and day.day == 1)):
+            return _local_datetime(day, datetime.min.time())
+    return None
+
+
+def _sleep_remind_at(pref, offset, now):
+    today = timezone.localdate(now)
+    sleep_datetime = _local_datetime(today, pref.usual_sleep_time)
+    if pref.last_sleep_reminder_date == today or sleep_datetime <= now:
+        sleep_datetime = _local_datetime(today + timedelta(days=1), pref.usual_sleep_time)
+    return sleep_datetime - (pref.reminder_offset_time or offset)
+
+
+def _wake_remind_at(pref, offset, now):
+    today = timezone.localdate(now)
+    remind_at = _local_datetime(today, pref.usual_wake_time) - WAKE_REMINDER_LEAD
+    if remind_at <= now:
+        remind_at = _local_datetime(today + timedelta(days=1), pref.usual_wake_time) - WAKE_REMINDER_LEAD
+    return remind_at
+
+
+# Category -> (model its reminder entries point at, next reminder time)
+REMINDER_RULES = {
+    'Task': ('CustomTask', _task_remind_at),
+    'Event': ('CustomEvents', _event_remind_at),
+    'Activity': ('CustomActivity', _activity_remind_at),
+    'Class': ('CustomClassSchedule', _class_remind_at),
+    'Goal': ('Goals', _goal_remind_at),
+    'Sleep': ('UserPref', _sleep_remind_at),
+    'Wake': ('UserPref', _wake_remind_at),
+}
+
+
+def backfill_reminders(apps, schema_editor):
+    """Schedule the next reminder of every existing row, as rebuild_reminder_schedule does"""
+    ReminderSchedule = apps.get_model('api', 'ReminderSchedule')
+    now = timezone.now()
+    offsets = {
+        student_id: offset or DEFAULT_REMINDER_OFFSET
+        for student_id, offset in apps.get_model('api', 'UserPref').objects.values_list(
+            'student_id', 'reminder_offset_time'
+        )
+    }
+
+    entries = []
+    for category_type, (model_name, remind_at_for) in REMINDER_RULES.items():
+        for instance in apps.get_model('api', model_name).objects.iterator():
+            remind_at = remind_at_for(instance, offsets.get(instance.student_id_id, DEFAULT_REMINDER_OFFSET), now)
+            if remind_at is not None:
+                entries.append(ReminderSchedule(
+                    category_type=category_type,
+                    reference_id=instance.pk,
+                    student_id_id=instance.student_id_id,
+                    remind_at=remind_at,
+                ))
+    ReminderSchedule.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0049_remove_customtask_api_customt_student_bb34ed_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderSchedule',
+            fields=[
+                ('reminder_id', models.AutoField(primary_key=True, serialize=False)),
+                ('category_type', models.CharField(choices=[('Task', 'Task'), ('Class', 'Class'), ('Event', 'Event'), ('Activity', 'Activity'), ('Goal', 'Goal'), ('Sleep', 'Sleep'), ('Wake', 'Wake')], max_length=50)),
+                ('reference_id', models.IntegerField()),
+                ('remind_at', models.DateTimeField(db_index=True)),
+                ('student_id', models.ForeignKey(db_column='student_id', on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('category_type', 'reference_id')},
+            },
+        ),
+        migrations.RunPython(backfill_reminders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:17
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def collapse_weekly_class_entries(apps, schema_editor):
+    """Fold the per-week Class rows into one weekly entry (missing weeks become exceptions)"""
+    ScheduleEntry = apps.get_model('api', 'ScheduleEntry')
+    ScheduleEntryException = apps.get_model('api', 'ScheduleEntryException')
+
+    runs = {}
+    for entry in ScheduleEntry.objects.filter(category_type='Class').order_by('scheduled_date'):
+        key = (entry.reference_id, entry.student_id_id, entry.scheduled_start_time,
+               entry.scheduled_end_time, entry.scheduled_date.weekday())
+        runs.setdefault(key, []).append(entry)
+
+    for entries in runs.values():
+        first, last = entries[0], entries[-1]
+        present = {entry.scheduled_date for entry in entries}
+        day = first.scheduled_date
+        skipped = []
+        while day <= last.scheduled_date:
+            if day not in present:
+                skipped.append(ScheduleEntryException(entry=first, exception_date=day))
+            day += timedelta(weeks=1)
+
+        ScheduleEntry.objects.filter(pk__in=[entry.pk for entry in entries[1:]]).delete()
+        first.recurrence = 'Weekly'
+        first.recurrence_end = last.scheduled_date
+        first.save(update_fields=['recurrence', 'recurrence_end'])
+        ScheduleEntryException.objects.bulk_create(skipped)
+
+
+def expand_weekly_class_entries(apps, schema_editor):
+    ScheduleEntry = apps.get_model('api', 'ScheduleEntry')
+    ScheduleEntryException = apps.get_model('api', 'ScheduleEntryException')
+
+    for entry in ScheduleEntry.objects.filter(recurrence='Weekly'):
+        skipped = set(ScheduleEntryException.objects.filter(entry=entry).values_list('exception_date', flat=True))
+        day = entry.scheduled_date + timedelta(weeks=1)
+        copies = []
+        while day <= entry.recurrence_end:
+            if day not in skipped:
+                copies.append(ScheduleEntry(
+                    category_type=entry.category_type, reference_id=entry.reference_id,
+                    student_id_id=entry.student_id_id, scheduled_date=day,
+                    scheduled_start_time=entry.scheduled_start_time,
+                    scheduled_end_time=entry.scheduled_end_time
+                ))
+            day += timedelta(weeks=1)
+        ScheduleEntry.objects.bulk_create(copies)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0050_reminderschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='recurrence',
+            field=models.CharField(choices=[('Once', 'Once'), ('Weekly', 'Weekly')], default='Once', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='recurrence_end',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ScheduleEntryException',
+            fields=[
+                ('exception_id', models.AutoField(primary_key=True, serialize=False)),
+                ('exception_date', models.DateField()),
+                ('entry', models.ForeignKey(db_column='entry_id', on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='api.scheduleentry')),
+            ],
+            options={
+                'unique_together': {('entry', 'exception_date')},
+            },
+        ),
+        migrations.RunPython(collapse_weekly_class_entries, expand_weekly_class_entries),
+    ]
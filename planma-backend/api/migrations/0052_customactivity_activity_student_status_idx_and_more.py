@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0051_scheduleentry_recurrence_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customactivity',
+            index=models.Index(fields=['student_id', 'status'], name='activity_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customactivity',
+            index=models.Index(fields=['student_id', 'scheduled_date'], name='activity_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customactivity',
+            index=models.Index(condition=models.Q(('reminder_sent', False)), fields=['scheduled_date'], name='activity_reminder_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customevents',
+            index=models.Index(fields=['student_id', 'scheduled_date'], name='event_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customevents',
+            index=models.Index(condition=models.Q(('reminder_sent', False)), fields=['scheduled_date'], name='event_reminder_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customtask',
+            index=models.Index(fields=['student_id', 'status'], name='task_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customtask',
+            index=models.Index(fields=['student_id', 'scheduled_date'], name='task_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customtask',
+            index=models.Index(condition=models.Q(('reminder_sent', False)), fields=['scheduled_date'], name='task_reminder_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goalschedule',
+            index=models.Index(fields=['goal_id', 'status'], name='goalsched_goal_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleentry',
+            index=models.Index(fields=['category_type', 'reference_id'], name='entry_category_ref_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# category_type -> (model, typed foreign key on ScheduleEntry)
+REFERENCES = {
+    'Task': ('CustomTask', 'task_id'),
+    'Event': ('CustomEvents', 'event_id'),
+    'Activity': ('CustomActivity', 'activity_id'),
+    'Goal': ('GoalSchedule', 'goalschedule_id'),
+    'Class': ('CustomClassSchedule', 'classsched_id'),
+}
+
+
+def link_entries(apps, schema_editor):
+    """Point existing entries at their items; drop entries whose item is already gone"""
+    ScheduleEntry = apps.get_model('api', 'ScheduleEntry')
+    for category_type, (model_name, field) in REFERENCES.items():
+        Model = apps.get_model('api', model_name)
+        entries = ScheduleEntry.objects.filter(category_type=category_type)
+        existing = Model.objects.values('pk')
+        entries.filter(reference_id__in=existing).update(**{f'{field}_id': models.F('reference_id')})
+        orphans, _ = entries.exclude(reference_id__in=existing).delete()
+        if orphans:
+            print(f"Removed {orphans} {category_type} schedule entries without an item")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0052_customactivity_activity_student_status_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='activity_id',
+            field=models.ForeignKey(blank=True, db_column='activity_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule_entries', to='api.customactivity'),
+        ),
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='classsched_id',
+            field=models.ForeignKey(blank=True, db_column='classsched_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule_entries', to='api.customclassschedule'),
+        ),
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='event_id',
+            field=models.ForeignKey(blank=True, db_column='event_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule_entries', to='api.customevents'),
+        ),
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='goalschedule_id',
+            field=models.ForeignKey(blank=True, db_column='goalschedule_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule_entries', to='api.goalschedule'),
+        ),
+        migrations.AddField(
+            model_name='scheduleentry',
+            name='task_id',
+            field=models.ForeignKey(blank=True, db_column='task_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule_entries', to='api.customtask'),
+        ),
+        migrations.RunPython(link_entries, migrations.RunPython.noop),
+    ]
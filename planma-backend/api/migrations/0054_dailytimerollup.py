@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# category -> (log model, item the time is rolled up per, student path, date field, duration field)
+SOURCES = {
+    'Task': ('TaskTimeLog', 'task_id', 'task_id__student_id', 'date_logged', 'duration'),
+    'Activity': ('ActivityTimeLog', 'activity_id', 'activity_id__student_id', 'date_logged', 'duration'),
+    'Goal': ('GoalProgress', 'goal_id', 'goal_id__student_id', 'session_date', 'session_duration'),
+    'Sleep': ('SleepLog', 'student_id', 'student_id', 'date_logged', 'duration'),
+}
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll the existing logs up per student, day and item"""
+    DailyTimeRollup = apps.get_model('api', 'DailyTimeRollup')
+    for category, (model_name, parent, student, date_field, duration) in SOURCES.items():
+        rows = apps.get_model('api', model_name).objects.values(
+            day=models.F(date_field), parent=models.F(parent), student=models.F(student)
+        ).annotate(total=models.Sum(duration), count=models.Count('pk')).order_by()
+        DailyTimeRollup.objects.bulk_create((
+            DailyTimeRollup(**{
+                'student_id_id': row['student'],
+                f'{parent}_id': row['parent'],
+                'category': category,
+                'date': row['day'],
+                'total_duration': row['total'],
+                'log_count': row['count'],
+            }) for row in rows.iterator()
+        ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0053_scheduleentry_activity_id_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTimeRollup',
+            fields=[
+                ('rollup_id', models.AutoField(primary_key=True, serialize=False)),
+                ('category', models.CharField(choices=[('Task', 'Task'), ('Activity', 'Activity'), ('Goal', 'Goal'), ('Sleep', 'Sleep')], max_length=10)),
+                ('date', models.DateField()),
+                ('total_duration', models.DurationField()),
+                ('log_count', models.PositiveIntegerField()),
+                ('activity_id', models.ForeignKey(blank=True, db_column='activity_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to='api.customactivity')),
+                ('goal_id', models.ForeignKey(blank=True, db_column='goal_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to='api.goals')),
+                ('student_id', models.ForeignKey(db_column='student_id', on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to=settings.AUTH_USER_MODEL)),
+                ('task_id', models.ForeignKey(blank=True, db_column='task_id', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='time_rollups', to='api.customtask')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student_id', 'category', 'date'], name='rollup_student_cat_date_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
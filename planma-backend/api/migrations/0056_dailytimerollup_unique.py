@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+# category -> column of the item its rows are rolled up per
+PARENTS = {'Task': 'task_id', 'Activity': 'activity_id', 'Goal': 'goal_id', 'Sleep': 'student_id'}
+
+
+def drop_duplicate_rollups(apps, schema_editor):
+    """Concurrent refreshes could insert the same row twice; keep the first copy"""
+    DailyTimeRollup = apps.get_model('api', 'DailyTimeRollup')
+    for category, parent in PARENTS.items():
+        duplicates = DailyTimeRollup.objects.filter(category=category).values(parent, 'date').annotate(
+            keep=models.Min('rollup_id'), rows=models.Count('rollup_id')
+        ).filter(rows__gt=1).order_by()
+        for row in duplicates:
+            DailyTimeRollup.objects.filter(
+                category=category, date=row['date'], **{parent: row[parent]}
+            ).exclude(rollup_id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0055_activitytimelog_updated_at_attendedclass_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailytimerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category', 'Task')), fields=('task_id', 'date'), name='rollup_task_date_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytimerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category', 'Activity')), fields=('activity_id', 'date'), name='rollup_activity_date_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytimerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category', 'Goal')), fields=('goal_id', 'date'), name='rollup_goal_date_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytimerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('category', 'Sleep')), fields=('student_id', 'date'), name='rollup_sleep_date_uniq'),
+        ),
+    ]
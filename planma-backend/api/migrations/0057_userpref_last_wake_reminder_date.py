@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0056_dailytimerollup_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userpref',
+            name='last_wake_reminder_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
@@ -7,6 +7,9 @@ from django.contrib.auth.base_user import BaseUserManager
 import uuid
 from django.conf import settings
 from django_enumfield import enum
+from .managers import (
+    TaskQuerySet, EventQuerySet, ActivityQuerySet, ClassScheduleQuerySet, ScheduleEntryQuerySet
+)
 
 def user_directory_path(instance, filename):
     # file will be uploaded to MEDIA_ROOT/profile_pictures/<student_id>/<filename>
@@ -83,10 +86,16 @@ class CustomEvents(models.Model):
     # New attribute for tracking reminder
     reminder_sent = models.BooleanField(default=False)
 
-    def delete(self, *args, **kwargs):
-        # Manually delete related ScheduleEntry before deleting this task
-        ScheduleEntry.objects.filter(category_type='Event', reference_id=self.event_id).delete()
-        super().delete(*args, **kwargs)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = EventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student_id', 'scheduled_date'], name='event_student_date_idx'),
+            # The reminder tick only ever scans unsent rows
+            models.Index(fields=['scheduled_date'], condition=models.Q(reminder_sent=False), name='event_reminder_due_idx'),
+        ]
 
     def __str__(self):
         return self.event_name
@@ -105,6 +114,8 @@ class AttendedEvents(models.Model):
     date = models.DateField()
     has_attended = models.BooleanField()
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
 
 class CustomActivity(models.Model):
     STATUS_CHOICES = [
@@ -132,10 +143,17 @@ class CustomActivity(models.Model):
     # New attribute for tracking reminder
     reminder_sent = models.BooleanField(default=False)
 
-    def delete(self, *args, **kwargs):
-        # Manually delete related ScheduleEntry before deleting this task
-        ScheduleEntry.objects.filter(category_type='Activity', reference_id=self.activity_id).delete()
-        super().delete(*args, **kwargs)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ActivityQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student_id', 'status'], name='activity_student_status_idx'),
+            models.Index(fields=['student_id', 'scheduled_date'], name='activity_student_date_idx'),
+            # The reminder tick only ever scans unsent rows
+            models.Index(fields=['scheduled_date'], condition=models.Q(reminder_sent=False), name='activity_reminder_due_idx'),
+        ]
 
     def __str__(self):
         return self.activity_name
@@ -156,6 +174,8 @@ class ActivityTimeLog(models.Model):
     duration = models.DurationField()
     date_logged = models.DateField()
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
 
 class UserPref(models.Model):
     # Primary Key
@@ -176,6 +196,10 @@ class UserPref(models.Model):
 
     # New field to track the last sleep reminder date
     last_sleep_reminder_date = models.DateField(null=True, blank=True)
+    # Day the wake-up reminder last went out
+    last_wake_reminder_date = models.DateField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"User Preferences for {self.student_id.username} | Student ID: {self.student_id.student_id}"
@@ -224,6 +248,8 @@ class CustomSemester(models.Model):
         related_name='semesters', db_column='student_id'
     )
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     def __str__(self):
         return f"{self.acad_year_start}-{self.acad_year_end} {self.semester}"
 
@@ -248,6 +274,8 @@ class CustomSubject(models.Model):
         related_name='subsems', db_column='semester_id'
     )
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     class Meta:
         unique_together = ('subject_code', 'student_id', 'semester_id')
 
@@ -280,6 +308,10 @@ class CustomClassSchedule(models.Model):
     # Added this field to track send reminders for class schedules.
     last_reminder_date = models.DateField(null=True, blank=True)
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = ClassScheduleQuerySet.as_manager()
+
     class Meta:
         unique_together = ('subject', 'day_of_week', 'scheduled_start_time', 'scheduled_end_time', 'room', 'student_id')
 
@@ -308,6 +340,8 @@ class AttendedClass(models.Model):
     attendance_date = models.DateField(default=timezone.now)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     class Meta:
         unique_together = ('classsched_id', 'attendance_date')
 
@@ -345,10 +379,17 @@ class CustomTask(models.Model):
 
     reminder_sent = models.BooleanField(default=False)
 
-    def delete(self, *args, **kwargs):
-        # Manually delete related ScheduleEntry before deleting this task
-        ScheduleEntry.objects.filter(category_type='Task', reference_id=self.task_id).delete()
-        super().delete(*args, **kwargs)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = TaskQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student_id', 'status'], name='task_student_status_idx'),
+            models.Index(fields=['student_id', 'scheduled_date'], name='task_student_date_idx'),
+            # The reminder tick only ever scans unsent rows
+            models.Index(fields=['scheduled_date'], condition=models.Q(reminder_sent=False), name='task_reminder_due_idx'),
+        ]
 
     def __str__(self):
         return self.task_name
@@ -370,6 +411,8 @@ class TaskTimeLog(models.Model):
     duration = models.DurationField()
     date_logged = models.DateField()
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
 
 class Goals(models.Model):
     TYPE_CHOICES = [
@@ -408,6 +451,8 @@ class Goals(models.Model):
     # New field for tracking reminders
     last_reminder_date = models.DateField(null=True, blank=True)
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     def __str__(self):
         return self.goal_name
 
@@ -432,6 +477,13 @@ class GoalSchedule(models.Model):
     scheduled_end_time = models.TimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['goal_id', 'status'], name='goalsched_goal_status_idx'),
+        ]
+
 
 class GoalProgress(models.Model):
     # Primary Key
@@ -454,6 +506,8 @@ class GoalProgress(models.Model):
     session_end_time = models.TimeField()
     session_duration = models.DurationField() 
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
 
 class SleepLog(models.Model):
     # Primary Key
@@ -471,6 +525,67 @@ class SleepLog(models.Model):
     duration = models.DurationField()
     date_logged = models.DateField()
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+
+class DailyTimeRollup(models.Model):
+    CATEGORY_CHOICES = [
+        ('Task', 'Task'),
+        ('Activity', 'Activity'),
+        ('Goal', 'Goal'),
+        ('Sleep', 'Sleep'),
+    ]
+    # Primary Key
+    rollup_id = models.AutoField(primary_key=True)
+
+    # Time logged by a student on one day, per task / activity / goal (or sleep).
+    # Reports sum these rows instead of the raw logs.
+    student_id = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='time_rollups', db_column='student_id'
+    )
+    category = models.CharField(max_length=10, choices=CATEGORY_CHOICES)
+    date = models.DateField()
+    task_id = models.ForeignKey(
+        CustomTask,
+        on_delete=models.CASCADE, null=True, blank=True,
+        related_name='time_rollups', db_column='task_id'
+    )
+    activity_id = models.ForeignKey(
+        CustomActivity,
+        on_delete=models.CASCADE, null=True, blank=True,
+        related_name='time_rollups', db_column='activity_id'
+    )
+    goal_id = models.ForeignKey(
+        Goals,
+        on_delete=models.CASCADE, null=True, blank=True,
+        related_name='time_rollups', db_column='goal_id'
+    )
+    total_duration = models.DurationField()
+    log_count = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student_id', 'category', 'date'], name='rollup_student_cat_date_idx'),
+        ]
+        # One row per item and day; the item's column depends on the category
+        constraints = [
+            models.UniqueConstraint(
+                fields=['task_id', 'date'], condition=models.Q(category='Task'), name='rollup_task_date_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['activity_id', 'date'], condition=models.Q(category='Activity'),
+                name='rollup_activity_date_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['goal_id', 'date'], condition=models.Q(category='Goal'), name='rollup_goal_date_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['student_id', 'date'], condition=models.Q(category='Sleep'), name='rollup_sleep_date_uniq'
+            ),
+        ]
+
 
 class ScheduleEntry(models.Model):
     CATEGORY_CHOICES = [
@@ -480,6 +595,10 @@ class ScheduleEntry(models.Model):
         ('Activity', 'Activity'),
         ('Goal', 'Goal'),
     ]
+    RECURRENCE_CHOICES = [
+        ('Once', 'Once'),
+        ('Weekly', 'Weekly'),
+    ]
     # Primary Key
     entry_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     category_type = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
@@ -494,10 +613,171 @@ class ScheduleEntry(models.Model):
     scheduled_start_time = models.TimeField()
     scheduled_end_time = models.TimeField()
 
+    # Typed link to the item behind category_type/reference_id (only the one
+    # matching category_type is set), so the item can be joined with
+    # select_related and deleting it deletes its entries
+    task_id = models.ForeignKey(
+        CustomTask,
+        on_delete=models.CASCADE, null=True, blank=True,
+        related_name='schedule_entries', db_column='task_id'
+    )
+    event_id = models.ForeignKey(
+        CustomEvents,
+        on_delete=models.CASCADE, null=True, blank=True,
+        related_name='schedule_entries', db_column='event_id'
+    )
+    activity_id = models.ForeignKey(
+        CustomActivity,
+        on_delete=models.CASCADE, null=True, blank=True,
+        related_name='schedule_entries', db_column='activity_id'
+    )
+    goalschedule_id = models.ForeignKey(
+        GoalSchedule,
+        on_delete=models.CASCADE, null=True, blank=True,
+        related_name='schedule_entries', db_column='goalschedule_id'
+    )
+    classsched_id = models.ForeignKey(
+        CustomClassSchedule,
+        on_delete=models.CASCADE, null=True, blank=True,
+        related_name='schedule_entries', db_column='classsched_id'
+    )
+
+    # Recurrence: a 'Weekly' entry repeats on scheduled_date's weekday until
+    # recurrence_end (inclusive), minus its exception dates
+    recurrence = models.CharField(max_length=10, choices=RECURRENCE_CHOICES, default='Once')
+    recurrence_end = models.DateField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Typed foreign key field for each category_type
+    REFERENCE_FIELDS = {
+        'Task': 'task_id',
+        'Event': 'event_id',
+        'Activity': 'activity_id',
+        'Goal': 'goalschedule_id',
+        'Class': 'classsched_id',
+    }
+
+    objects = ScheduleEntryQuerySet.as_manager()
+
     class Meta:
         unique_together = ('student_id', 'scheduled_date', 'scheduled_start_time', 'scheduled_end_time', 'category_type', 'reference_id')
+        indexes = [
+            # Lookups from an item back to its entries (update/delete, reminders)
+            models.Index(fields=['category_type', 'reference_id'], name='entry_category_ref_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.link_reference()
+        super().save(*args, **kwargs)
+
+    def link_reference(self):
+        """Point the typed foreign keys at category_type/reference_id (bulk_create skips save())"""
+        for category, field in self.REFERENCE_FIELDS.items():
+            attname = self._meta.get_field(field).attname
+            setattr(self, attname, self.reference_id if category == self.category_type else None)
+        return self
+
+    def related_info(self):
+        """Name and status of the linked item (select_related it to avoid a query per entry)"""
+        if self.category_type == 'Task' and self.task_id:
+            return {"name": self.task_id.task_name, "status": self.task_id.status}
+        if self.category_type == 'Event' and self.event_id:
+            return {"name": self.event_id.event_name, "status": None}
+        if self.category_type == 'Activity' and self.activity_id:
+            return {"name": self.activity_id.activity_name, "status": self.activity_id.status}
+        if self.category_type == 'Goal' and self.goalschedule_id:
+            return {"name": self.goalschedule_id.goal_id.goal_name, "status": self.goalschedule_id.status}
+        if self.category_type == 'Class' and self.classsched_id:
+            return {"name": self.classsched_id.subject.subject_code, "status": None}
+        return {"name": "Unknown", "status": None}
+
+    def occurrences(self, start=None, end=None):
+        """Dates this entry occurs on, limited to [start, end] when given"""
+        if self.recurrence != 'Weekly':
+            if (start and self.scheduled_date < start) or (end and self.scheduled_date > end):
+                return []
+            return [self.scheduled_date]
+
+        first, last = self.scheduled_date, self.recurrence_end or self.scheduled_date
+        if start and start > first:
+            # Jump to the first occurrence on or after start
+            first += timedelta(weeks=-(-(start - first).days // 7))
+        if end and end < last:
+            last = end
+        skipped = {exception.exception_date for exception in self.exceptions.all()}
+
+        dates = []
+        while first <= last:
+            if first not in skipped:
+                dates.append(first)
+            first += timedelta(weeks=1)
+        return dates
+
+
+class ScheduleEntryException(models.Model):
+    # A single date skipped by a recurring ScheduleEntry
+    exception_id = models.AutoField(primary_key=True)
+    entry = models.ForeignKey(
+        ScheduleEntry,
+        on_delete=models.CASCADE,
+        related_name='exceptions', db_column='entry_id'
+    )
+    exception_date = models.DateField()
+
+    class Meta:
+        unique_together = ('entry', 'exception_date')
 
 
+class SyncTombstone(models.Model):
+    # A deleted planner row, kept so /api/sync/ can tell clients to drop it
+    tombstone_id = models.AutoField(primary_key=True)
+    # Plain id rather than a foreign key: tombstones are written while a
+    # student's rows are being cascade-deleted and must not block that delete
+    student_id = models.UUIDField()
+    # Sync collection the row belonged to, e.g. 'tasks'
+    collection = models.CharField(max_length=30)
+    object_id = models.CharField(max_length=64)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['student_id', 'deleted_at'], name='tombstone_student_deleted_idx'),
+        ]
+
+
+class ReminderSchedule(models.Model):
+    CATEGORY_CHOICES = [
+        ('Task', 'Task'),
+        ('Class', 'Class'),
+        ('Event', 'Event'),
+        ('Activity', 'Activity'),
+        ('Goal', 'Goal'),
+        ('Sleep', 'Sleep'),
+        ('Wake', 'Wake'),
+    ]
+    # Primary Key
+    reminder_id = models.AutoField(primary_key=True)
+
+    # Reminder Details
+    category_type = models.CharField(max_length=50, choices=CATEGORY_CHOICES)
+    # Primary key of the row the reminder belongs to (pref_id for Sleep/Wake)
+    reference_id = models.IntegerField()
+    # Foreign Key to CustomUser model
+    student_id = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='reminders', db_column='student_id'
+    )
+    # When the next reminder for this row is due
+    remind_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('category_type', 'reference_id')
+
+    def __str__(self):
+        return f"{self.category_type} #{self.reference_id} at {self.remind_at}"
+
 class FCMToken(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     token = models.TextField()
@@ -0,0 +1,104 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+# Separates the values of the ordering fields inside a cursor position
+POSITION_SEPARATOR = '|'
+
+
+class PlannerCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (date, pk) for the planner and log lists. It is
+    opt-in: only requests that send ?page_size= or ?cursor= get pages
+    ({"next", "previous", "results"}), everyone else keeps the plain list
+    the app already parses. Views with a different date column set
+    `cursor_ordering`.
+
+    The cursor holds every ordering field, not only the date, so rows that
+    share a date are neither skipped nor repeated across pages. Views whose
+    rows expand into several results (weekly schedule entries) define
+    `cursor_weight(row)`; a page then ends before its results would pass
+    the page size, keeping whole rows together.
+    """
+    ordering = ('scheduled_date', 'pk')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not {self.cursor_query_param, self.page_size_query_param} & set(request.query_params):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self._beyond(current_position, reverse))
+            except (ValidationError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = self._fill_page(results, getattr(view, 'cursor_weight', None))
+
+        # Position of the first row past the page, as the links expect
+        has_following_position = len(results) > len(self.page)
+        following_position = (
+            self._get_position_from_instance(results[len(self.page)], self.ordering)
+            if has_following_position else None
+        )
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _fill_page(self, results, weight):
+        if weight is None:
+            return results[:self.page_size]
+        # At least one row per page, however much it expands
+        page, filled = [], 0
+        for row in results[:self.page_size]:
+            filled += weight(row)
+            if page and filled > self.page_size:
+                break
+            page.append(row)
+        return page
+
+    def _beyond(self, position, reverse):
+        """Rows strictly after (before, for a reverse cursor) a position in the ordering"""
+        values = position.split(POSITION_SEPARATOR)
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        lookup = 'lt' if reverse else 'gt'
+        beyond, ties = Q(), Q()
+        for field, value in zip(self.ordering, values):
+            beyond |= ties & Q(**{f'{field}__{lookup}': value})
+            ties &= Q(**{field: value})
+        return beyond
+
+    def _get_position_from_instance(self, instance, ordering):
+        return POSITION_SEPARATOR.join(
+            str(instance[field] if isinstance(instance, dict) else getattr(instance, field)) for field in ordering
+        )
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', self.ordering)
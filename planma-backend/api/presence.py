@@ -0,0 +1,80 @@
+import asyncio
+import json
+import weakref
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.utils.timezone import now
+
+# Presence keys expire unless the app keeps refreshing them: connected
+# clients send a 'heartbeat' frame every 2 minutes
+PRESENCE_TTL = 300
+
+# Connection pool shared by the whole process (created on first use), and
+# one asyncio pool per event loop: asyncio connections are bound to the loop
+# that opened them, and each async_to_sync call or test may run its own loop
+_pool = None
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def presence_key(user_id):
+    return f"user_online:{user_id}"
+
+
+def _pool_kwargs():
+    # TLS Redis (rediss://) is used without certificate checks, like the Celery broker
+    if settings.REDIS_URL.startswith('rediss://'):
+        return {'ssl_cert_reqs': None}
+    return {}
+
+
+def get_redis():
+    """Redis client backed by the module-level connection pool"""
+    global _pool
+    if _pool is None:
+        _pool = redis.ConnectionPool.from_url(settings.REDIS_URL, **_pool_kwargs())
+    return redis.Redis(connection_pool=_pool)
+
+
+def get_async_redis():
+    """redis.asyncio client for the websocket consumers, so heartbeats never block the event loop"""
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        pool = _async_pools[loop] = aioredis.ConnectionPool.from_url(settings.REDIS_URL, **_pool_kwargs())
+    return aioredis.Redis(connection_pool=pool)
+
+
+def _is_foreground(value):
+    if value is None:
+        return False
+    try:
+        return bool(json.loads(value).get("foreground", False))
+    except (ValueError, AttributeError):
+        return False
+
+
+def foreground_status(user_ids):
+    """Map each user id to whether the app is open in the foreground, in one MGET"""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    values = get_redis().mget([presence_key(user_id) for user_id in user_ids])
+    return {user_id: _is_foreground(value) for user_id, value in zip(user_ids, values)}
+
+
+def is_user_in_foreground(user_id):
+    return foreground_status([user_id])[user_id]
+
+
+async def set_foreground_status(user_id, foreground):
+    """Refresh (or clear) a user's presence key from the websocket consumer"""
+    r = get_async_redis()
+    key = presence_key(user_id)
+    if foreground:
+        await r.set(key, json.dumps({
+            "last_seen": now().isoformat(),
+            "foreground": True
+        }), ex=PRESENCE_TTL)
+    else:
+        await r.delete(key)
@@ -0,0 +1,99 @@
+from firebase_admin import messaging
+from .models import FCMToken
+
+# firebase_admin accepts at most 500 messages per send_each() call
+FCM_BATCH_SIZE = 500
+
+# Errors meaning the token itself is dead; the token row is removed
+INVALID_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+
+
+class PushDispatcher:
+    """
+    Collects push notifications and sends them in batches. Tokens for every
+    queued user are resolved in one query, messages go out through
+    send_each() in chunks of FCM_BATCH_SIZE, and tokens FCM reports as
+    invalid are pruned. `client` is anything with a firebase_admin-style
+    send_each(messages), so tests can pass a fake.
+    """
+
+    def __init__(self, client=None, batch_size=FCM_BATCH_SIZE):
+        self.client = client or messaging
+        self.batch_size = batch_size
+        self.pending = []
+        # (category_type, reference_id) keys of the notifications the last
+        # flush could not deliver for a reason that may pass (FCM down, quota)
+        self.failed = set()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, user_id, title, body, key=None):
+        """Queue a notification; `key` identifies it in `failed` if FCM does not take it"""
+        self.pending.append((str(user_id), title, body, key))
+
+    def _build_messages(self):
+        tokens = {
+            str(user_id): token
+            for user_id, token in FCMToken.objects.filter(
+                user_id__in={user_id for user_id, _, _, _ in self.pending}
+            ).values_list('user_id', 'token')
+        }
+
+        messages, seen = [], {}
+        for user_id, title, body, key in self.pending:
+            keys = [key] if key else []
+            token = tokens.get(user_id)
+            if not token:
+                print(f"No FCM token found for user {user_id}")
+                continue
+            # Users sharing a device token only get the notification once
+            if (token, title, body) in seen:
+                seen[(token, title, body)].extend(keys)
+                continue
+            seen[(token, title, body)] = keys
+            messages.append((user_id, messaging.Message(
+                notification=messaging.Notification(title=title, body=body),
+                token=token
+            ), keys))
+        return messages
+
+    def flush(self):
+        """
+        Send everything queued and return how many messages FCM accepted.
+        Notifications that may go through on a later try are left in `failed`.
+        """
+        self.failed = set()
+        if not self.pending:
+            return 0
+        messages = self._build_messages()
+        self.pending = []
+
+        sent = 0
+        invalid_tokens = set()
+        for start in range(0, len(messages), self.batch_size):
+            chunk = messages[start:start + self.batch_size]
+            try:
+                batch = self.client.send_each([message for _, message, _ in chunk])
+            except Exception as e:
+                print(f"[PUSH] Error sending batch of {len(chunk)} notifications: {str(e)}")
+                self.failed.update(key for _, _, keys in chunk for key in keys)
+                continue
+
+            for (user_id, message, keys), response in zip(chunk, batch.responses):
+                if response.success:
+                    sent += 1
+                    continue
+                print(f"Error sending notification to user {user_id}: {str(response.exception)}")
+                if isinstance(response.exception, INVALID_TOKEN_ERRORS):
+                    # A dead token will not work on a retry either
+                    invalid_tokens.add(message.token)
+                else:
+                    self.failed.update(keys)
+
+        if invalid_tokens:
+            FCMToken.objects.filter(token__in=invalid_tokens).delete()
+            print(f"[PUSH] Pruned {len(invalid_tokens)} invalid FCM tokens")
+
+        print(f"[PUSH] {sent}/{len(messages)} push notifications sent")
+        return sent
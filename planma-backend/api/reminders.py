@@ -0,0 +1,432 @@
+import zlib
+from datetime import datetime, timedelta
+from django.db import models, transaction
+from django.utils import timezone
+from .models import (
+    ReminderSchedule, UserPref, CustomTask, CustomEvents, CustomActivity,
+    CustomClassSchedule, Goals
+)
+from .managers import DEFAULT_REMINDER_OFFSET
+from .presence import foreground_status
+from .sync import SYNC_COLLECTION_NAMES
+from .versions import bump_versions
+
+# Wake-up reminders go out a fixed 5 minutes before the wake time
+WAKE_REMINDER_LEAD = timedelta(minutes=5)
+
+# Categories that come back after they fire (next class, next day, next period)
+RECURRING_CATEGORIES = ('Class', 'Goal', 'Sleep', 'Wake')
+
+# Model holding the rows each reminder category points at
+REMINDER_MODELS = {
+    'Task': CustomTask,
+    'Event': CustomEvents,
+    'Activity': CustomActivity,
+    'Class': CustomClassSchedule,
+    'Goal': Goals,
+    'Sleep': UserPref,
+    'Wake': UserPref,
+}
+
+
+def _local_datetime(day, time_of_day):
+    return timezone.make_aware(datetime.combine(day, time_of_day))
+
+
+def get_reminder_offset(student_id):
+    """Return the student's reminder offset, falling back to the default"""
+    offset = UserPref.objects.filter(student_id=student_id).values_list(
+        'reminder_offset_time', flat=True
+    ).first()
+    return offset or DEFAULT_REMINDER_OFFSET
+
+
+def load_reminder_offsets(student_ids=None):
+    """Map student_id -> reminder offset in a single query (all students if None)"""
+    prefs = UserPref.objects.all()
+    if student_ids is not None:
+        prefs = prefs.filter(student_id__in=student_ids)
+    return {
+        student_id: offset or DEFAULT_REMINDER_OFFSET
+        for student_id, offset in prefs.values_list('student_id', 'reminder_offset_time')
+    }
+
+
+# Next reminder time per category (None means nothing left to remind about)
+def _task_remind_at(task, offset, now):
+    today = timezone.localdate(now)
+    if task.reminder_sent or task.status not in ('Pending', 'In Progress'):
+        return None
+    if task.scheduled_date < today:
+        return None
+    return task.deadline - offset
+
+
+def _event_remind_at(event, offset, now):
+    if event.reminder_sent:
+        return None
+    event_datetime = _local_datetime(event.scheduled_date, event.scheduled_start_time)
+    if event_datetime <= now:
+        return None
+    return event_datetime - offset
+
+
+def _activity_remind_at(activity, offset, now):
+    if activity.reminder_sent or activity.status not in ('Pending', 'In Progress'):
+        return None
+    activity_datetime = _local_datetime(activity.scheduled_date, activity.scheduled_start_time)
+    if activity_datetime <= now:
+        return None
+    return activity_datetime - offset
+
+
+def _class_remind_at(class_schedule, offset, now):
+    today = timezone.localdate(now)
+    # Look at most one week ahead for the next day this class meets
+    for days_ahead in range(8):
+        day = today + timedelta(days=days_ahead)
+        if day.strftime("%A") != class_schedule.day_of_week:
+            continue
+        class_datetime = _local_datetime(day, class_schedule.scheduled_start_time)
+        if day == today and (class_schedule.last_reminder_date == today or class_datetime <= now):
+            continue
+        return class_datetime - offset
+    return None
+
+
+def _goal_remind_at(goal, offset, now):
+    today = timezone.localdate(now)
+    # Goal reminders go out at the start of each day the timeframe is due:
+    # every day for Daily, Mondays for Weekly, the 1st for Monthly
+    for days_ahead in range(32):
+        day = today + timedelta(days=days_ahead)
+        if day == goal.last_reminder_date:
+            continue
+        if (goal.timeframe == 'Daily'
+                or (goal.timeframe == 'Weekly' and day.weekday() == 0)
+                or (goal.timeframe == 'Monthly' and day.day == 1)):
+            return _local_datetime(day, datetime.min.time())
+    return None
+
+
+def _sleep_remind_at(pref, offset, now):
+    today = timezone.localdate(now)
+    sleep_datetime = _local_datetime(today, pref.usual_sleep_time)
+    if pref.last_sleep_reminder_date == today or sleep_datetime <= now:
+        sleep_datetime = _local_datetime(today + timedelta(days=1), pref.usual_sleep_time)
+    return sleep_datetime - (pref.reminder_offset_time or offset)
+
+
+def _wake_remind_at(pref, offset, now):
+    today = timezone.localdate(now)
+    wake_datetime = _local_datetime(today, pref.usual_wake_time)
+    if pref.last_wake_reminder_date == today or wake_datetime <= now:
+        wake_datetime = _local_datetime(today + timedelta(days=1), pref.usual_wake_time)
+    return wake_datetime - WAKE_REMINDER_LEAD
+
+
+REMINDER_TIMES = {
+    'Task': _task_remind_at,
+    'Event': _event_remind_at,
+    'Activity': _activity_remind_at,
+    'Class': _class_remind_at,
+    'Goal': _goal_remind_at,
+    'Sleep': _sleep_remind_at,
+    'Wake': _wake_remind_at,
+}
+
+
+def _has_raw_temporal_values(instance):
+    # Rows created straight from request data still hold their dates/times as strings
+    return any(
+        isinstance(getattr(instance, field.attname), str)
+        for field in instance._meta.concrete_fields
+        if isinstance(field, (models.DateField, models.TimeField))
+    )
+
+
+def schedule_reminder(category_type, instance, offset=None, now=None):
+    """Insert, move or drop the reminder entry for a single planner row"""
+    now = now or timezone.now()
+    if _has_raw_temporal_values(instance):
+        instance.refresh_from_db()
+    student_id = instance.student_id_id
+    if offset is None:
+        offset = get_reminder_offset(student_id)
+
+    remind_at = REMINDER_TIMES[category_type](instance, offset, now)
+    if remind_at is None:
+        unschedule_reminder(category_type, instance.pk)
+        return None
+
+    ReminderSchedule.objects.update_or_create(
+        category_type=category_type,
+        reference_id=instance.pk,
+        defaults={'student_id_id': student_id, 'remind_at': remind_at}
+    )
+    return remind_at
+
+
+def schedule_reminders(category_type, instances, now=None):
+    """schedule_reminder for many rows of one category (e.g. bulk-created ones) in three queries"""
+    now = now or timezone.now()
+    offsets = load_reminder_offsets({instance.student_id_id for instance in instances})
+    entries, dropped = [], []
+    for instance in instances:
+        offset = offsets.get(instance.student_id_id, DEFAULT_REMINDER_OFFSET)
+        remind_at = REMINDER_TIMES[category_type](instance, offset, now)
+        if remind_at is None:
+            dropped.append(instance.pk)
+        else:
+            entries.append(ReminderSchedule(
+                category_type=category_type,
+                reference_id=instance.pk,
+                student_id_id=instance.student_id_id,
+                remind_at=remind_at,
+            ))
+
+    if dropped:
+        ReminderSchedule.objects.filter(category_type=category_type, reference_id__in=dropped).delete()
+    ReminderSchedule.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['category_type', 'reference_id'],
+        update_fields=['student_id', 'remind_at'],
+    )
+
+
+def unschedule_reminder(category_type, reference_id):
+    ReminderSchedule.objects.filter(category_type=category_type, reference_id=reference_id).delete()
+
+
+def _student_rows(category_type, student_id):
+    return REMINDER_MODELS[category_type].objects.filter(student_id=student_id)
+
+
+def reschedule_student(student_id, now=None):
+    """Recompute every reminder of a student, e.g. after their preferences change"""
+    now = now or timezone.now()
+    offset = get_reminder_offset(student_id)
+    for category_type in REMINDER_TIMES:
+        for instance in _student_rows(category_type, student_id):
+            schedule_reminder(category_type, instance, offset=offset, now=now)
+
+
+def pop_due_reminders(now=None):
+    """
+    Remove every reminder that is due and return them as
+    (category_type, reference_id, student_id) tuples. Only due rows are read,
+    so a tick costs O(due reminders).
+    """
+    now = now or timezone.now()
+
+    with transaction.atomic():
+        entries = list(
+            ReminderSchedule.objects.select_for_update(skip_locked=True)
+            .filter(remind_at__lte=now)
+            .values_list('reminder_id', 'category_type', 'reference_id', 'student_id')
+        )
+        ReminderSchedule.objects.filter(
+            reminder_id__in=[entry[0] for entry in entries]
+        ).delete()
+
+    return [entry[1:] for entry in entries]
+
+
+def restore_reminders(entries, remind_at):
+    """
+    Put popped (category_type, reference_id, student_id) entries back in the
+    schedule, due at `remind_at`, when the tick that was to send them failed.
+    Rows rescheduled since (by a signal or the tick itself) keep their time.
+    """
+    ReminderSchedule.objects.bulk_create([
+        ReminderSchedule(
+            category_type=category_type,
+            reference_id=reference_id,
+            student_id_id=student_id,
+            remind_at=remind_at,
+        ) for category_type, reference_id, student_id in entries
+    ], ignore_conflicts=True)
+
+
+def reminder_shard(student_id, shards):
+    """Shard a student's reminders are sent from (stable across processes, unlike hash())"""
+    return zlib.crc32(str(student_id).encode()) % shards
+
+
+def partition_reminders(entries, shards):
+    """Split popped (category_type, reference_id, student_id) entries into {shard: entries}"""
+    partitions = {}
+    for entry in entries:
+        partitions.setdefault(reminder_shard(entry[2], shards), []).append(entry)
+    return partitions
+
+
+class ReminderTick:
+    """
+    Everything the reminder passes of one tick share: the clock, the popped
+    reminder ids, their owners' offsets and app presence. Offsets are loaded
+    once (the passes read them through due_reminders(), rescheduling reads
+    this map), presence is one Redis MGET, and the "reminder sent" markers are
+    written in bulk at the end, so the cost of a tick in queries and round
+    trips does not grow with the number of due rows.
+    """
+
+    def __init__(self, entries, now=None):
+        self.now = now or timezone.now()
+        self.today = timezone.localdate(self.now)
+        self.due = {}
+        self.sent = {}
+        self.foreground = None
+        # Students the in-app send failed for, and reminders a send failed for
+        self.unreachable = set()
+        self.undelivered = set()
+
+        self.student_ids = set()
+        for category_type, reference_id, student_id in entries:
+            self.due.setdefault(category_type, []).append(reference_id)
+            self.student_ids.add(student_id)
+        self.offsets = load_reminder_offsets(self.student_ids) if self.student_ids else {}
+
+    def __len__(self):
+        return sum(len(reference_ids) for reference_ids in self.due.values())
+
+    def ids(self, category_type):
+        return self.due.get(category_type, [])
+
+    def offset_for(self, student_id):
+        return self.offsets.get(student_id, DEFAULT_REMINDER_OFFSET)
+
+    def in_foreground(self, student_id):
+        # Presence of every owner in the tick is read with one MGET on first use
+        if str(student_id) in self.unreachable:
+            return False
+        if self.foreground is None:
+            self.foreground = foreground_status(self.student_ids)
+        return self.foreground.get(student_id, False)
+
+    def mark_unreachable(self, student_id):
+        """The in-app send failed: treat the student as backgrounded so push takes over"""
+        self.unreachable.add(str(student_id))
+
+    def mark_sent(self, category_type, reference_id):
+        self.sent.setdefault(category_type, set()).add(reference_id)
+
+    def mark_undelivered(self, keys):
+        """Take back the sent marker of reminders whose send failed"""
+        for category_type, reference_id in keys:
+            self.sent.get(category_type, set()).discard(reference_id)
+            self.undelivered.add((category_type, reference_id))
+
+    def undelivered_keys(self):
+        """Failed reminders no later pass (e.g. the push fallback) delivered"""
+        return {key for key in self.undelivered if not self.was_sent(*key)}
+
+    def was_sent(self, category_type, reference_id):
+        return reference_id in self.sent.get(category_type, ())
+
+    def save_sent(self):
+        """
+        Persist the reminder-sent markers with one UPDATE per category. Bulk
+        updates skip auto_now and post_save, so updated_at is set here and the
+        owners' collection versions are bumped like a batch write does.
+        """
+        now = timezone.now()
+        markers = {
+            'Task': {'reminder_sent': True},
+            'Event': {'reminder_sent': True},
+            'Activity': {'reminder_sent': True},
+            'Class': {'last_reminder_date': self.today},
+            'Goal': {'last_reminder_date': self.today},
+            'Sleep': {'last_sleep_reminder_date': self.today},
+            'Wake': {'last_wake_reminder_date': self.today},
+        }
+        changed = {}
+        for category_type, fields in markers.items():
+            if not self.sent.get(category_type):
+                continue
+            model = REMINDER_MODELS[category_type]
+            rows = model.objects.filter(pk__in=self.sent[category_type])
+            for student_id in rows.values_list('student_id', flat=True).distinct():
+                changed.setdefault(student_id, set()).add(SYNC_COLLECTION_NAMES[model])
+            rows.update(updated_at=now, **fields)
+
+        for student_id, collections in changed.items():
+            bump_versions(student_id, *collections)
+
+    def reschedule_recurring(self):
+        """Queue the next occurrence of the recurring reminders that were popped"""
+        entries = []
+        for category_type in RECURRING_CATEGORIES:
+            reference_ids = self.ids(category_type)
+            if not reference_ids:
+                continue
+            for instance in REMINDER_MODELS[category_type].objects.filter(pk__in=reference_ids):
+                offset = self.offset_for(instance.student_id_id)
+                now = self.now
+                if (category_type == 'Goal' and not self.was_sent('Goal', instance.pk)
+                        and ('Goal', instance.pk) not in self.undelivered):
+                    # Nothing pending today, so today 00:00 would pop again every
+                    # tick; wait for the next due day (adding a session today
+                    # reschedules the goal through its signal). A failed send
+                    # stays due today.
+                    now = _local_datetime(self.today + timedelta(days=1), datetime.min.time())
+                remind_at = REMINDER_TIMES[category_type](instance, offset, now)
+                if remind_at is not None:
+                    entries.append(ReminderSchedule(
+                        category_type=category_type,
+                        reference_id=instance.pk,
+                        student_id_id=instance.student_id_id,
+                        remind_at=remind_at,
+                    ))
+
+        ReminderSchedule.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['category_type', 'reference_id'],
+            update_fields=['student_id', 'remind_at'],
+        )
+
+
+def rebuild_reminder_schedule(now=None):
+    """
+    Recompute the whole reminder schedule from the planner tables (backfill /
+    nightly repair). Each category is rebuilt in one transaction holding its
+    rows locked, so a save racing the rebuild waits and then writes its own
+    entry. Entries are upserted; only those of rows with nothing left to
+    remind about, or rows that no longer exist, are removed.
+    """
+    now = now or timezone.now()
+    offsets = load_reminder_offsets()
+
+    scheduled = 0
+    for category_type, remind_at_for in REMINDER_TIMES.items():
+        model = REMINDER_MODELS[category_type]
+        with transaction.atomic():
+            entries, dropped = [], []
+            for instance in model.objects.select_for_update().iterator():
+                offset = offsets.get(instance.student_id_id, DEFAULT_REMINDER_OFFSET)
+                remind_at = remind_at_for(instance, offset, now)
+                if remind_at is None:
+                    dropped.append(instance.pk)
+                    continue
+                entries.append(ReminderSchedule(
+                    category_type=category_type,
+                    reference_id=instance.pk,
+                    student_id_id=instance.student_id_id,
+                    remind_at=remind_at,
+                ))
+
+            ReminderSchedule.objects.bulk_create(
+                entries,
+                batch_size=1000,
+                update_conflicts=True,
+                unique_fields=['category_type', 'reference_id'],
+                update_fields=['student_id', 'remind_at'],
+            )
+            stale = ReminderSchedule.objects.filter(category_type=category_type)
+            stale.filter(reference_id__in=dropped).delete()
+            # Rows created after the snapshot exist by now, so their entries stay
+            stale.exclude(reference_id__in=model.objects.values('pk')).delete()
+        scheduled += len(entries)
+    return scheduled
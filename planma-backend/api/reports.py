@@ -0,0 +1,225 @@
+from collections import defaultdict
+from datetime import timedelta
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from .models import AttendedClass, AttendedEvents, CustomActivity, CustomTask, DailyTimeRollup
+
+REPORT_CATEGORIES = ('tasks', 'events', 'classes', 'activities', 'goals', 'sleep')
+
+# Chart buckets: one point per logged day or per month
+GROUPINGS = ('day', 'month')
+
+
+def previous_range(start, end):
+    """The period of the same length that ends the day before `start`"""
+    length = end - start + timedelta(days=1)
+    return start - length, start - timedelta(days=1)
+
+
+def _minutes(duration):
+    return round(duration.total_seconds() / 60, 1) if duration else 0.0
+
+
+def _period(field, group_by):
+    return F(field) if group_by == 'day' else TruncMonth(field)
+
+
+def _series(queryset, date_field, duration_field, group_by):
+    """Minutes per day/month, summed in the database"""
+    rows = queryset.annotate(period=_period(date_field, group_by)).values('period').annotate(
+        total=Sum(duration_field)
+    ).order_by('period')
+    return [{'period': row['period'], 'minutes': _minutes(row['total'])} for row in rows]
+
+
+def _total(queryset, duration_field):
+    return _minutes(queryset.aggregate(total=Sum(duration_field))['total'])
+
+
+def _minutes_by(queryset, key, duration_field):
+    rows = queryset.values(name=F(key)).annotate(total=Sum(duration_field)).order_by('name')
+    return [{'name': row['name'], 'minutes': _minutes(row['total'])} for row in rows]
+
+
+def _counts_by(queryset, key, statuses, status_field):
+    rows = queryset.values(name=F(key)).annotate(**{
+        status: Count('pk', filter=Q(**{status_field: value})) for status, value in statuses.items()
+    }).order_by('name')
+    return list(rows)
+
+
+# ---------------------------
+#   PER-CATEGORY REPORTS
+# ---------------------------
+# Time spent is read from the daily rollups (one row per student, day and
+# item), so a semester report sums O(days) rows rather than every log.
+def time_rollups(student_id, category, start, end):
+    return DailyTimeRollup.objects.filter(student_id=student_id, category=category, date__range=(start, end))
+
+
+def task_report(student_id, start, end, group_by):
+    rollups = time_rollups(student_id, 'Task', start, end)
+    return {
+        'total_minutes': _total(rollups, 'total_duration'),
+        'time_spent': _series(rollups, 'date', 'total_duration', group_by),
+        'by_subject': _minutes_by(rollups, 'task_id__subject_id__subject_code', 'total_duration'),
+        'finished_by_subject': list(
+            rollups.filter(task_id__status='Completed')
+            .values(name=F('task_id__subject_id__subject_code'))
+            .annotate(count=Count('task_id', distinct=True))
+            .order_by('name')
+        ),
+        'task_count': CustomTask.objects.filter(
+            student_id=student_id, scheduled_date__range=(start, end)
+        ).count(),
+    }
+
+
+def event_logs(student_id, start, end):
+    return AttendedEvents.objects.filter(event_id__student_id=student_id, date__range=(start, end))
+
+
+def event_report(student_id, start, end, group_by):
+    logs = event_logs(student_id, start, end)
+    totals = logs.aggregate(attended=Count('pk', filter=Q(has_attended=True)), total=Count('pk'))
+    return {
+        'attended': totals['attended'],
+        'did_not_attend': totals['total'] - totals['attended'],
+        'by_type': _counts_by(
+            logs, 'event_id__event_type', {'attended': True, 'did_not_attend': False}, 'has_attended'
+        ),
+    }
+
+
+def class_logs(student_id, start, end):
+    return AttendedClass.objects.filter(classsched_id__student_id=student_id, attendance_date__range=(start, end))
+
+
+def class_report(student_id, start, end, group_by):
+    logs = class_logs(student_id, start, end)
+    statuses = {'attended': 'Attended', 'excused': 'Excused', 'did_not_attend': 'Did Not Attend'}
+    return {
+        **logs.aggregate(**{
+            status: Count('pk', filter=Q(status=value)) for status, value in statuses.items()
+        }),
+        'by_subject': _counts_by(logs, 'classsched_id__subject__subject_code', statuses, 'status'),
+    }
+
+
+def activity_report(student_id, start, end, group_by):
+    rollups = time_rollups(student_id, 'Activity', start, end)
+    done = rollups.filter(activity_id__status='Completed').annotate(
+        period=_period('date', group_by)
+    ).values('period').annotate(count=Count('activity_id', distinct=True)).order_by('period')
+    return {
+        'total_minutes': _total(rollups, 'total_duration'),
+        'time_spent': _series(rollups, 'date', 'total_duration', group_by),
+        'done': list(done),
+        'activity_count': CustomActivity.objects.filter(
+            student_id=student_id, scheduled_date__range=(start, end)
+        ).count(),
+    }
+
+
+def _goal_period(goal_timeframe, day):
+    if goal_timeframe == 'Weekly':
+        return day - timedelta(days=day.weekday())
+    if goal_timeframe == 'Monthly':
+        return day.replace(day=1)
+    return day
+
+
+def goal_completion(rollups):
+    """Per goal, how many of its daily/weekly/monthly periods reached target_hours"""
+    daily = rollups.values(
+        'goal_id', 'date', 'total_duration',
+        name=F('goal_id__goal_name'),
+        timeframe=F('goal_id__timeframe'),
+        target_hours=F('goal_id__target_hours'),
+    ).order_by('goal_id', 'date')
+
+    # Rollup rows are per goal and day; days are folded into the goal's timeframe here
+    goals = {}
+    periods = defaultdict(lambda: defaultdict(timedelta))
+    for row in daily:
+        goals[row['goal_id']] = row
+        periods[row['goal_id']][_goal_period(row['timeframe'], row['date'])] += row['total_duration']
+
+    completion = []
+    for goal_id, totals in periods.items():
+        target = timedelta(hours=goals[goal_id]['target_hours'])
+        completed = sum(1 for total in totals.values() if total >= target)
+        completion.append({
+            'name': goals[goal_id]['name'],
+            'completed': completed,
+            'failed': len(totals) - completed,
+        })
+    return completion
+
+
+def goal_report(student_id, start, end, group_by):
+    rollups = time_rollups(student_id, 'Goal', start, end)
+    return {
+        'total_minutes': _total(rollups, 'total_duration'),
+        'time_spent': _series(rollups, 'date', 'total_duration', group_by),
+        'by_type': _minutes_by(rollups, 'goal_id__goal_type', 'total_duration'),
+        'completion': goal_completion(rollups),
+    }
+
+
+def sleep_report(student_id, start, end, group_by):
+    rollups = time_rollups(student_id, 'Sleep', start, end)
+    totals = rollups.aggregate(total=Sum('total_duration'), nights=Sum('log_count'))
+    minutes = _minutes(totals['total'])
+    return {
+        'total_minutes': minutes,
+        'average_hours': round(minutes / 60 / totals['nights'], 1) if totals['nights'] else 0.0,
+        'time_spent': _series(rollups, 'date', 'total_duration', group_by),
+    }
+
+
+# Rollup category behind each time-based report section
+TIME_CATEGORIES = {'tasks': 'Task', 'activities': 'Activity', 'goals': 'Goal', 'sleep': 'Sleep'}
+
+
+# What each category is compared against in the previous period
+def _previous_total(category, student_id, start, end):
+    if category in TIME_CATEGORIES:
+        rollups = time_rollups(student_id, TIME_CATEGORIES[category], start, end)
+        return {'total_minutes': _total(rollups, 'total_duration')}
+    if category == 'events':
+        return event_logs(student_id, start, end).aggregate(
+            attended=Count('pk', filter=Q(has_attended=True)), total=Count('pk')
+        )
+    return class_logs(student_id, start, end).aggregate(
+        attended=Count('pk', filter=Q(status='Attended')), total=Count('pk')
+    )
+
+
+REPORTS = {
+    'tasks': task_report,
+    'events': event_report,
+    'classes': class_report,
+    'activities': activity_report,
+    'goals': goal_report,
+    'sleep': sleep_report,
+}
+
+
+def build_report(student_id, start, end, previous_start, previous_end, group_by='day', categories=REPORT_CATEGORIES):
+    """
+    Aggregated report for [start, end] plus the previous-period totals the
+    feedback messages compare against. Every number is computed with
+    GROUP BY / SUM / COUNT in the database; no log rows are sent back.
+    """
+    report = {
+        'start': start,
+        'end': end,
+        'previous_start': previous_start,
+        'previous_end': previous_end,
+        'group_by': group_by,
+    }
+    for category in categories:
+        report[category] = REPORTS[category](student_id, start, end, group_by)
+        report[category]['previous'] = _previous_total(category, student_id, previous_start, previous_end)
+    return report
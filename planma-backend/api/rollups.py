@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils.dateparse import parse_date
+from .models import ActivityTimeLog, DailyTimeRollup, GoalProgress, SleepLog, TaskTimeLog
+
+# Where each rollup category reads its logs from. `parent` is the item the
+# time is rolled up per; it is also the field name on DailyTimeRollup.
+ROLLUP_SOURCES = {
+    'Task': {
+        'model': TaskTimeLog, 'parent': 'task_id', 'student': 'task_id__student_id',
+        'date': 'date_logged', 'duration': 'duration',
+    },
+    'Activity': {
+        'model': ActivityTimeLog, 'parent': 'activity_id', 'student': 'activity_id__student_id',
+        'date': 'date_logged', 'duration': 'duration',
+    },
+    'Goal': {
+        'model': GoalProgress, 'parent': 'goal_id', 'student': 'goal_id__student_id',
+        'date': 'session_date', 'duration': 'session_duration',
+    },
+    'Sleep': {
+        'model': SleepLog, 'parent': 'student_id', 'student': 'student_id',
+        'date': 'date_logged', 'duration': 'duration',
+    },
+}
+
+ROLLUP_CATEGORIES = {source['model']: category for category, source in ROLLUP_SOURCES.items()}
+
+
+def rollup_key(log):
+    """(category, date, parent id) of the rollup row a log is counted in"""
+    category = ROLLUP_CATEGORIES[type(log)]
+    source = ROLLUP_SOURCES[category]
+    day = getattr(log, source['date'])
+    # Logs created from request data still hold the raw date string
+    if isinstance(day, str):
+        day = parse_date(day)
+    return category, day, getattr(log, f"{source['parent']}_id")
+
+
+def _group(logs, source):
+    return logs.values(
+        day=F(source['date']), parent=F(source['parent']), student=F(source['student'])
+    ).annotate(total=Sum(source['duration']), count=Count('pk')).order_by()
+
+
+def _rollup(category, row):
+    source = ROLLUP_SOURCES[category]
+    return DailyTimeRollup(**{
+        'student_id_id': row['student'],
+        f"{source['parent']}_id": row['parent'],
+        'category': category,
+        'date': row['day'],
+        'total_duration': row['total'],
+        'log_count': row['count'],
+    })
+
+
+def refresh_rollups(keys):
+    """Recompute the rollup rows for (category, date, parent id) keys whose logs changed"""
+    for category, day, parent_id in set(keys):
+        if day is None or parent_id is None:
+            continue
+        source = ROLLUP_SOURCES[category]
+        parent = {source['parent']: parent_id}
+        parent_model = DailyTimeRollup._meta.get_field(source['parent']).related_model
+        with transaction.atomic():
+            # Refreshes of the same item run one after another: the second
+            # waits here, then reads every log the first one committed
+            list(parent_model.objects.select_for_update().filter(pk=parent_id).values_list('pk'))
+            logs = source['model'].objects.filter(**{source['date']: day}, **parent)
+            DailyTimeRollup.objects.filter(category=category, date=day, **parent).delete()
+            DailyTimeRollup.objects.bulk_create(_rollup(category, row) for row in _group(logs, source))
+
+
+def rebuild_rollups(student_id=None):
+    """Rebuild every rollup row (or one student's) from the raw logs; returns the row count"""
+    created = 0
+    with transaction.atomic():
+        rollups = DailyTimeRollup.objects.all()
+        if student_id:
+            rollups = rollups.filter(student_id=student_id)
+        rollups.delete()
+
+        for category, source in ROLLUP_SOURCES.items():
+            logs = source['model'].objects.all()
+            if student_id:
+                logs = logs.filter(**{source['student']: student_id})
+            created += len(DailyTimeRollup.objects.bulk_create(
+                (_rollup(category, row) for row in _group(logs, source).iterator()), batch_size=1000
+            ))
+    return created
@@ -0,0 +1,167 @@
+from collections import defaultdict
+from copy import copy
+from datetime import date, timedelta
+from django.core.exceptions import ValidationError
+from django.utils.dateparse import parse_time
+from .models import ScheduleEntry
+
+# Python weekday numbers (Monday=0) by day name
+WEEKDAYS = {
+    'Monday': 0,
+    'Tuesday': 1,
+    'Wednesday': 2,
+    'Thursday': 3,
+    'Friday': 4,
+    'Saturday': 5,
+    'Sunday': 6
+}
+
+
+def weekly_dates(start_date, end_date, weekday):
+    """Every date from start_date to end_date (inclusive) that falls on `weekday`"""
+    first = start_date + timedelta(days=(weekday - start_date.weekday()) % 7)
+    if first > end_date:
+        return []
+    return [first + timedelta(weeks=week) for week in range((end_date - first).days // 7 + 1)]
+
+
+def _as_slot(scheduled_date, start_time, end_time):
+    # Request data arrives as strings; compare real dates/times
+    try:
+        if isinstance(scheduled_date, str):
+            scheduled_date = date.fromisoformat(scheduled_date)
+        if isinstance(start_time, str):
+            start_time = parse_time(start_time)
+        if isinstance(end_time, str):
+            end_time = parse_time(end_time)
+    except ValueError:
+        start_time = None
+    if not start_time or not end_time:
+        raise ValidationError('Invalid date or time format.')
+    return scheduled_date, start_time, end_time
+
+
+def find_conflicts(student_id, slots, exclude=None, ignore=()):
+    """
+    Check any number of candidate (scheduled_date, start_time, end_time) slots
+    against the student's schedule at once. Returns {slot index: [overlapping
+    ScheduleEntry, ...]} for the slots that clash. The whole batch costs one
+    range query on (student_id, scheduled_date, start, end), plus one for the
+    exception dates of weekly entries. `exclude` is a (category_type,
+    reference_id) pair to ignore, e.g. the item being updated; `ignore` is a
+    set of such pairs, e.g. every item a batch moves or deletes.
+    """
+    slots = [_as_slot(*slot) for slot in slots]
+    if not slots:
+        return {}
+
+    first = min(day for day, _, _ in slots)
+    last = max(day for day, _, _ in slots)
+    entries = ScheduleEntry.objects.between(first, last).filter(
+        student_id=student_id,
+        scheduled_start_time__lt=max(end for _, _, end in slots),
+        scheduled_end_time__gt=min(start for _, start, _ in slots)
+    )
+    if exclude:
+        entries = entries.exclude(category_type=exclude[0], reference_id=exclude[1])
+
+    # Expand weekly entries to the days actually being checked
+    days = {day for day, _, _ in slots}
+    entries_by_day = defaultdict(list)
+    for entry in entries.prefetch_related('exceptions'):
+        if (entry.category_type, entry.reference_id) in ignore:
+            continue
+        for day in entry.occurrences(first, last):
+            if day in days:
+                entries_by_day[day].append(entry)
+
+    conflicts = {}
+    for index, (day, start, end) in enumerate(slots):
+        overlapping = [
+            entry for entry in entries_by_day[day]
+            if entry.scheduled_start_time < end and entry.scheduled_end_time > start
+        ]
+        if overlapping:
+            conflicts[index] = overlapping
+    return conflicts
+
+
+def overlaps_within(slots):
+    """Indexes of candidate slots that overlap another slot of the same batch"""
+    slots = sorted((_as_slot(*slot), index) for index, slot in enumerate(slots))
+    clashing = set()
+    current_day = reach = reach_index = None
+    for (day, start, end), index in slots:
+        # Sweep each day keeping the slot that reaches furthest so far
+        if day == current_day and start < reach:
+            clashing.update((index, reach_index))
+        if day != current_day or end > reach:
+            current_day, reach, reach_index = day, end, index
+    return clashing
+
+
+def has_overlap(student_id, scheduled_date, start_time, end_time, exclude=None):
+    return bool(find_conflicts(student_id, [(scheduled_date, start_time, end_time)], exclude=exclude))
+
+
+def first_overlap(student_id, dates, start_time, end_time):
+    """Earliest of `dates` on which one of the student's entries overlaps start_time-end_time"""
+    conflicts = find_conflicts(student_id, [(day, start_time, end_time) for day in dates])
+    return min((dates[index] for index in conflicts), default=None)
+
+
+def create_weekly_entry(category_type, reference_id, student_id, dates, start_time, end_time):
+    """Store a run of weekly dates as a single recurring ScheduleEntry"""
+    if not dates:
+        return None
+    return ScheduleEntry.objects.create(
+        category_type=category_type,
+        reference_id=reference_id,
+        student_id_id=student_id,
+        scheduled_date=dates[0],
+        scheduled_start_time=start_time,
+        scheduled_end_time=end_time,
+        recurrence='Weekly',
+        recurrence_end=dates[-1]
+    )
+
+
+def expand_entries(entries, start=None, end=None):
+    """
+    One dated copy per occurrence, so recurring entries serialize like plain
+    rows. Copies keep the series' entry_id; occurrence_date marks them, and
+    a single occurrence is removed with DELETE ?date= (i.e. skip_date).
+    """
+    expanded = []
+    for entry in entries:
+        for day in entry.occurrences(start, end):
+            occurrence = copy(entry)
+            occurrence.scheduled_date = day
+            occurrence.occurrence_date = day if entry.recurrence == 'Weekly' else None
+            expanded.append(occurrence)
+    return expanded
+
+
+def sync_class_entry(class_schedule):
+    """Point a class's weekly ScheduleEntry at its current day, times and semester dates"""
+    semester = class_schedule.subject.semester_id
+    dates = weekly_dates(semester.sem_start_date, semester.sem_end_date, WEEKDAYS[class_schedule.day_of_week])
+    entries = ScheduleEntry.objects.filter(category_type='Class', reference_id=class_schedule.classsched_id)
+    entry = entries.first()
+
+    if entry is None or not dates:
+        entries.delete()
+        return create_weekly_entry(
+            'Class', class_schedule.classsched_id, class_schedule.student_id_id, dates,
+            class_schedule.scheduled_start_time, class_schedule.scheduled_end_time
+        )
+
+    # One row to rewrite no matter how many weeks the semester has
+    entries.exclude(pk=entry.pk).delete()
+    entry.scheduled_date = dates[0]
+    entry.recurrence_end = dates[-1]
+    entry.recurrence = 'Weekly'
+    entry.scheduled_start_time = class_schedule.scheduled_start_time
+    entry.scheduled_end_time = class_schedule.scheduled_end_time
+    entry.save()
+    return entry
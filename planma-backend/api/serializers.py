@@ -7,6 +7,68 @@ from django.db import transaction
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+def expanded_paths(request):
+    """
+    Relations requested with ?expand=a,b.c (plus their parents), or None when
+    the parameter is absent and serializers keep their full nested shape.
+    """
+    if request is None or 'expand' not in request.query_params:
+        return None
+    paths = set()
+    for path in request.query_params['expand'].split(','):
+        parts = [part for part in path.strip().split('.') if part]
+        paths.update('.'.join(parts[:depth]) for depth in range(1, len(parts) + 1))
+    return paths
+
+
+class ExpandableFieldsMixin:
+    """
+    With ?expand=, nested relations that are not listed are serialized as
+    their id (e.g. ?expand=task_id.subject_id keeps the task and its subject
+    but not the semester). Without ?expand nothing changes. Views can force
+    a set of paths with context['expand'].
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if 'expand' in self.context:
+            paths = self.context['expand']
+        else:
+            paths = expanded_paths(self.context.get('request'))
+        if paths is None:
+            return fields
+        prefix = self._expand_prefix()
+        for name, field in fields.items():
+            if isinstance(field, serializers.BaseSerializer) and prefix + name not in paths:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        return fields
+
+    def _expand_prefix(self):
+        # Dotted path of this serializer inside the response, e.g. "task_id.subject_id."
+        names, node = [], self
+        while node.parent is not None:
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        return ''.join(f'{name}.' for name in reversed(names))
+
+
+class SparseFieldsMixin:
+    """?fields=a,b limits a GET response to those top-level fields"""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method != 'GET' or not request.query_params.get('fields'):
+            return fields
+        # Only the outermost serializer (or each row of a list) is trimmed
+        parent = self.parent
+        if parent is not None and not (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            return fields
+        wanted = {name.strip() for name in request.query_params['fields'].split(',')}
+        return {name: field for name, field in fields.items() if name in wanted}
+
+
 # Overriding the serializers
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
@@ -30,7 +92,7 @@ class CustomUserSerializer(UserSerializer):
         fields = ('student_id', 'username', 'email', 'firstname', 'lastname', 'profile_picture')
 
 
-class CustomEventSerializer(serializers.ModelSerializer):
+class CustomEventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_id = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
 
     class Meta: 
@@ -43,14 +105,14 @@ class CustomEventSerializer(serializers.ModelSerializer):
         }
         read_only_fields = ['student_id']
         
-class AttendedEventSerializer(serializers.ModelSerializer):
+class AttendedEventSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     event_id = CustomEventSerializer()
 
     class Meta: 
         model = AttendedEvents
         fields = ['att_events_id','event_id', 'date', 'has_attended']
 
-class CustomActivitySerializer(serializers.ModelSerializer):
+class CustomActivitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_id = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
 
     class Meta: 
@@ -63,7 +125,7 @@ class CustomActivitySerializer(serializers.ModelSerializer):
         }
         read_only_fields = ['student_id']
         
-class ActivityLogSerializer(serializers.ModelSerializer):
+class ActivityLogSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     activity_id = CustomActivitySerializer()
 
     class Meta: 
@@ -94,7 +156,7 @@ class CustomSemesterSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Start date must be before end date.")
         return data
 
-class CustomSubjectSerializer(serializers.ModelSerializer):
+class CustomSubjectSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     semester_id = CustomSemesterSerializer()
 
     class Meta:
@@ -102,7 +164,7 @@ class CustomSubjectSerializer(serializers.ModelSerializer):
         fields = ['subject_id', 'subject_code', 'subject_title',
                   'student_id', 'semester_id']
 
-class CustomClassScheduleSerializer(serializers.ModelSerializer):
+class CustomClassScheduleSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     subject = CustomSubjectSerializer()
 
     class Meta: 
@@ -112,7 +174,7 @@ class CustomClassScheduleSerializer(serializers.ModelSerializer):
                   'room', 'student_id']
         read_only_fields = ['classsched_id']
 
-class AttendedClassSerializer(serializers.ModelSerializer):
+class AttendedClassSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     classsched_id = CustomClassScheduleSerializer()
 
     class Meta: 
@@ -121,7 +183,7 @@ class AttendedClassSerializer(serializers.ModelSerializer):
                   'status']
         read_only_fields = ['att_class_id']
         
-class CustomTaskSerializer(serializers.ModelSerializer):
+class CustomTaskSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     subject_id = CustomSubjectSerializer()
     student_id = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
     class Meta:
@@ -135,7 +197,7 @@ class CustomTaskSerializer(serializers.ModelSerializer):
         read_only_fields = ['student_id']
 
 
-class TaskLogSerializer(serializers.ModelSerializer):
+class TaskLogSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     task_id = CustomTaskSerializer()
 
     class Meta:
@@ -145,7 +207,7 @@ class TaskLogSerializer(serializers.ModelSerializer):
             'end_time', 'duration', 'date_logged'
         ]
                 
-class GoalsSerializer(serializers.ModelSerializer):
+class GoalsSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     semester_id = CustomSemesterSerializer()
     student_id = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
 
@@ -156,7 +218,7 @@ class GoalsSerializer(serializers.ModelSerializer):
                   'student_id', 'semester_id']
         read_only_fields = ['student_id']
 
-class GoalScheduleSerializer(serializers.ModelSerializer):
+class GoalScheduleSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     goal_id = GoalsSerializer()
 
     class Meta:
@@ -165,7 +227,7 @@ class GoalScheduleSerializer(serializers.ModelSerializer):
                   'scheduled_end_time', 'status']
         read_only_fields = ['goal_id']
         
-class GoalProgressSerializer(serializers.ModelSerializer):
+class GoalProgressSerializer(SparseFieldsMixin, ExpandableFieldsMixin, serializers.ModelSerializer):
     goal_id = GoalsSerializer()
     goalschedule_id = GoalScheduleSerializer()
 
@@ -175,7 +237,7 @@ class GoalProgressSerializer(serializers.ModelSerializer):
                   'session_date', 'session_start_time', 'session_end_time', 
                   'session_duration']
 
-class SleepLogSerializer(serializers.ModelSerializer):
+class SleepLogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_id = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
 
     class Meta:
@@ -183,13 +245,24 @@ class SleepLogSerializer(serializers.ModelSerializer):
         fields = ['sleep_log_id', 'student_id', 'start_time',
                   'end_time', 'duration', 'date_logged']
         
-class ScheduleEntrySerializer(serializers.ModelSerializer):
+class ScheduleEntrySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     student_id = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
+    # Set on the expanded occurrences of a weekly entry; entry_id is then the series'
+    occurrence_date = serializers.SerializerMethodField()
+    is_recurring = serializers.SerializerMethodField()
 
     class Meta:
         model = ScheduleEntry
         fields = ['entry_id', 'category_type', 'reference_id', 'student_id',
-                  'scheduled_date', 'scheduled_start_time', 'scheduled_end_time']
+                  'scheduled_date', 'scheduled_start_time', 'scheduled_end_time',
+                  'recurrence', 'recurrence_end', 'occurrence_date', 'is_recurring']
+
+    def get_occurrence_date(self, obj):
+        day = getattr(obj, 'occurrence_date', None)
+        return day.isoformat() if day else None
+
+    def get_is_recurring(self, obj):
+        return obj.recurrence == 'Weekly'
         
     def get_reference(self, obj):
         CATEGORY_MODELS = {
@@ -218,6 +291,14 @@ class ScheduleEntrySerializer(serializers.ModelSerializer):
         }
         return CATEGORY_SERIALIZERS.get(category_type)
     
+class ScheduleEntrySyncSerializer(ScheduleEntrySerializer):
+    """The stored entry rule, with the dates a weekly entry skips"""
+    exceptions = serializers.SlugRelatedField(many=True, read_only=True, slug_field='exception_date')
+
+    class Meta(ScheduleEntrySerializer.Meta):
+        fields = ScheduleEntrySerializer.Meta.fields + ['exceptions']
+
+
 class FCMTokenSerializer(serializers.ModelSerializer):
     class Meta:
         model = FCMToken
@@ -1,94 +1,197 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
 from .models import (
     CustomTask, CustomActivity, CustomEvents, Goals, UserPref, 
-    CustomClassSchedule, CustomSemester, ScheduleEntry
+    CustomClassSchedule, CustomSemester, ScheduleEntry, GoalSchedule,
+    TaskTimeLog, ActivityTimeLog, GoalProgress, SleepLog, ScheduleEntryException
 )   
+from .dashboard import DASHBOARD_WIDGETS, dashboard_collections, invalidate_dashboard
+from .reminders import schedule_reminder, unschedule_reminder, reschedule_student
+from .rollups import rollup_key, refresh_rollups
+from .scheduling import sync_class_entry
+from .sync import SYNC_COLLECTIONS, SYNC_COLLECTION_NAMES, owner_id, record_tombstone
+from .versions import bump_versions
+
+# ---------------------------
+#   DASHBOARD CACHE
+# ---------------------------
+# Drop the cached dashboard of the student whose rows changed, for every
+# collection the counts or one of the widgets are computed from
+def invalidate_student_dashboard(sender, instance, **kwargs):
+    student_id = owner_id(instance)
+    if student_id is not None:
+        invalidate_dashboard(student_id)
+
+
+for collection in dashboard_collections(DASHBOARD_WIDGETS):
+    model = SYNC_COLLECTIONS[collection]['model']
+    post_save.connect(invalidate_student_dashboard, sender=model, dispatch_uid=f"dashboard_save_{model.__name__}")
+    post_delete.connect(invalidate_student_dashboard, sender=model, dispatch_uid=f"dashboard_delete_{model.__name__}")
+
+
+# Semester dates moved: stretch/shrink the weekly ScheduleEntry of its classes
+@receiver(post_save, sender=CustomSemester)
+def sync_semester_class_entries(sender, instance, created, **kwargs):
+    if created:
+        return
+    classes = CustomClassSchedule.objects.filter(
+        subject__semester_id=instance
+    ).select_related('subject__semester_id')
+    for class_schedule in classes:
+        sync_class_entry(class_schedule)
+
+
+# ---------------------------
+#   REMINDER SCHEDULE
+# ---------------------------
+# Keep the precomputed reminder timeline in step with the planner rows so the
+# per-minute tick only has to pop what is due.
+@receiver(post_save, sender=CustomTask)
+def schedule_task_reminder(sender, instance, **kwargs):
+    schedule_reminder('Task', instance)
+
+
+@receiver(post_save, sender=CustomEvents)
+def schedule_event_reminder(sender, instance, **kwargs):
+    schedule_reminder('Event', instance)
+
+
+@receiver(post_save, sender=CustomActivity)
+def schedule_activity_reminder(sender, instance, **kwargs):
+    schedule_reminder('Activity', instance)
+
+
+@receiver(post_save, sender=CustomClassSchedule)
+def schedule_class_reminder(sender, instance, **kwargs):
+    schedule_reminder('Class', instance)
+
+
+@receiver(post_save, sender=Goals)
+def schedule_goal_reminder(sender, instance, **kwargs):
+    schedule_reminder('Goal', instance)
+
+
+# A new or moved goal session can make today's goal reminder due again
+@receiver(post_save, sender=GoalSchedule)
+@receiver(post_delete, sender=GoalSchedule)
+def schedule_goal_session_reminder(sender, instance, **kwargs):
+    goal_id = instance.goal_id_id
+
+    def reschedule():
+        # Deferred so a cascading goal/user delete has finished before we look
+        goal = Goals.objects.filter(goal_id=goal_id).first()
+        if goal:
+            schedule_reminder('Goal', goal)
+
+    transaction.on_commit(reschedule)
+
+
+@receiver(post_save, sender=UserPref)
+def schedule_userpref_reminders(sender, instance, update_fields=None, **kwargs):
+    # Marking a sleep or wake-up reminder as sent only moves that reminder
+    if update_fields and set(update_fields) <= {'last_sleep_reminder_date', 'last_wake_reminder_date'}:
+        if 'last_sleep_reminder_date' in update_fields:
+            schedule_reminder('Sleep', instance)
+        if 'last_wake_reminder_date' in update_fields:
+            schedule_reminder('Wake', instance)
+        return
+    # Offset, sleep or wake time changed: every reminder of the student moves
+    reschedule_student(instance.student_id_id)
+
+
+@receiver(post_delete, sender=CustomTask)
+def unschedule_task_reminder(sender, instance, **kwargs):
+    unschedule_reminder('Task', instance.task_id)
+
+
+@receiver(post_delete, sender=CustomEvents)
+def unschedule_event_reminder(sender, instance, **kwargs):
+    unschedule_reminder('Event', instance.event_id)
+
+
+@receiver(post_delete, sender=CustomActivity)
+def unschedule_activity_reminder(sender, instance, **kwargs):
+    unschedule_reminder('Activity', instance.activity_id)
+
 
-# def invalidate_dashboard(student_id):
-#     print("CACHE INVALIDATED FOR:", student_id)
-#     cache.delete(f"dashboard:{student_id}")
-
-
-# # ---------------------------
-# #   CUSTOM TASK
-# # ---------------------------
-# @receiver(post_save, sender=CustomTask)
-# @receiver(post_delete, sender=CustomTask)
-# def invalidate_task(sender, instance, **kwargs):
-#     invalidate_dashboard(instance.student_id)
-
-
-# # ---------------------------
-# #   CUSTOM ACTIVITY
-# # ---------------------------
-# @receiver(post_save, sender=CustomActivity)
-# @receiver(post_delete, sender=CustomActivity)
-# def invalidate_activity(sender, instance, **kwargs):
-#     invalidate_dashboard(instance.student_id)
-
-
-# # ---------------------------
-# #   CUSTOM EVENTS
-# # ---------------------------
-# @receiver(post_save, sender=CustomEvents)
-# @receiver(post_delete, sender=CustomEvents)
-# def invalidate_events(sender, instance, **kwargs):
-#     invalidate_dashboard(instance.student_id)
-
-
-# # ---------------------------
-# #   GOALS
-# # ---------------------------
-# @receiver(post_save, sender=Goals)
-# @receiver(post_delete, sender=Goals)
-# def invalidate_goals(sender, instance, **kwargs):
-#     invalidate_dashboard(instance.student_id)
-
-
-# # ---------------------------
-# #   USER PREF
-# # ---------------------------
-# @receiver(post_save, sender=UserPref)
-# @receiver(post_delete, sender=UserPref)
-# def invalidate_userpref(sender, instance, **kwargs):
-#     invalidate_dashboard(instance.student_id)
-
-
-# # ---------------------------
-# #   CLASS SCHEDULE
-# # ---------------------------
-# @receiver(post_save, sender=CustomClassSchedule)
-# @receiver(post_delete, sender=CustomClassSchedule)
-# def invalidate_classschedule(sender, instance, **kwargs):
-#     invalidate_dashboard(instance.student_id)
-
-
-# # Extra rule: delete related schedule entries on class schedule deletion
-# @receiver(post_delete, sender=CustomClassSchedule)
-# def delete_schedule_entries(sender, instance, **kwargs):
-#     ScheduleEntry.objects.filter(
-#         category_type='Class',
-#         reference_id=instance.classsched_id,
-#         student_id=instance.student_id,
-#     ).delete()
-
-
-# # ---------------------------
-# #   SEMESTER
-# # ---------------------------
-# @receiver(post_save, sender=CustomSemester)
-# @receiver(post_delete, sender=CustomSemester)
-# def invalidate_semester(sender, instance, **kwargs):
-#     invalidate_dashboard(instance.student_id)
-
-
-# Delete Schedule Entry for Custom Class Schedule
 @receiver(post_delete, sender=CustomClassSchedule)
-def delete_schedule_entries(sender, instance, **kwargs):
-    ScheduleEntry.objects.filter(
-        category_type='Class',
-        reference_id=instance.classsched_id,
-        student_id=instance.student_id
-    ).delete()
\ No newline at end of file
+def unschedule_class_reminder(sender, instance, **kwargs):
+    unschedule_reminder('Class', instance.classsched_id)
+
+
+@receiver(post_delete, sender=Goals)
+def unschedule_goal_reminder(sender, instance, **kwargs):
+    unschedule_reminder('Goal', instance.goal_id)
+
+
+@receiver(post_delete, sender=UserPref)
+def unschedule_userpref_reminders(sender, instance, **kwargs):
+    unschedule_reminder('Sleep', instance.pref_id)
+    unschedule_reminder('Wake', instance.pref_id)
+
+
+# ---------------------------
+#   TIME ROLLUPS
+# ---------------------------
+# Keep the daily rollups the reports read in step with the time logs. An edit
+# can move a log to another day or item, so the row it left is refreshed too.
+@receiver(pre_save, sender=TaskTimeLog)
+@receiver(pre_save, sender=ActivityTimeLog)
+@receiver(pre_save, sender=GoalProgress)
+@receiver(pre_save, sender=SleepLog)
+def remember_log_rollup(sender, instance, **kwargs):
+    previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._previous_rollup_key = rollup_key(previous) if previous else None
+
+
+@receiver(post_save, sender=TaskTimeLog)
+@receiver(post_save, sender=ActivityTimeLog)
+@receiver(post_save, sender=GoalProgress)
+@receiver(post_save, sender=SleepLog)
+def refresh_log_rollup(sender, instance, **kwargs):
+    keys = [rollup_key(instance), getattr(instance, '_previous_rollup_key', None)]
+    refresh_rollups(key for key in keys if key)
+
+
+@receiver(post_delete, sender=TaskTimeLog)
+@receiver(post_delete, sender=ActivityTimeLog)
+@receiver(post_delete, sender=GoalProgress)
+@receiver(post_delete, sender=SleepLog)
+def refresh_deleted_log_rollup(sender, instance, **kwargs):
+    refresh_rollups([rollup_key(instance)])
+
+
+# ---------------------------
+#   SYNC CHANGE FEED
+# ---------------------------
+# Deleted rows leave a tombstone so /api/sync/ can report them; updates are
+# picked up from each row's updated_at. Every write also bumps the student's
+# collection version, which the ETags of the list/detail endpoints are built on.
+def record_sync_tombstone(sender, instance, **kwargs):
+    record_tombstone(instance)
+
+
+def bump_collection_version(sender, instance, **kwargs):
+    student_id = owner_id(instance)
+    if student_id is not None:
+        bump_versions(student_id, SYNC_COLLECTION_NAMES[sender])
+
+
+for source in SYNC_COLLECTIONS.values():
+    name = source['model'].__name__
+    post_delete.connect(record_sync_tombstone, sender=source['model'], dispatch_uid=f"sync_tombstone_{name}")
+    post_save.connect(bump_collection_version, sender=source['model'], dispatch_uid=f"version_save_{name}")
+    post_delete.connect(bump_collection_version, sender=source['model'], dispatch_uid=f"version_delete_{name}")
+
+
+# A skipped date changes the entry the client holds
+@receiver(post_save, sender=ScheduleEntryException)
+@receiver(post_delete, sender=ScheduleEntryException)
+def touch_excepted_entry(sender, instance, **kwargs):
+    entries = ScheduleEntry.objects.filter(pk=instance.entry_id)
+    entries.update(updated_at=timezone.now())
+    for student_id in entries.values_list('student_id', flat=True):
+        bump_versions(student_id, 'schedule')
+        invalidate_dashboard(student_id)
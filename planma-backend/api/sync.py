@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils import timezone
+from .models import (
+    ActivityTimeLog, AttendedClass, AttendedEvents, CustomActivity, CustomClassSchedule, CustomEvents,
+    CustomSemester, CustomSubject, CustomTask, GoalProgress, Goals, GoalSchedule, ScheduleEntry,
+    SleepLog, SyncTombstone, TaskTimeLog, UserPref
+)
+from .serializers import (
+    ActivityLogSerializer, AttendedClassSerializer, AttendedEventSerializer, CustomActivitySerializer,
+    CustomClassScheduleSerializer, CustomEventSerializer, CustomSemesterSerializer, CustomSubjectSerializer,
+    CustomTaskSerializer, GoalProgressSerializer, GoalsSerializer, GoalScheduleSerializer,
+    ScheduleEntrySyncSerializer, SleepLogSerializer, TaskLogSerializer, UserPrefSerializer
+)
+
+# Rows stamped this long before a cursor are sent again, so a save that was
+# stamped before a sync read but committed after it is never missed. Clients
+# upsert rows by id, so the repeats are harmless.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+# Tombstones are pruned after this long; an older cursor gets a full snapshot
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+# Collections sent by /api/sync/, named like their REST endpoints. `student`
+# is the lookup from a row to the student who owns it.
+SYNC_COLLECTIONS = {
+    'semesters': {'model': CustomSemester, 'serializer': CustomSemesterSerializer, 'student': 'student_id'},
+    'subjects': {'model': CustomSubject, 'serializer': CustomSubjectSerializer, 'student': 'student_id'},
+    'class-schedules': {
+        'model': CustomClassSchedule, 'serializer': CustomClassScheduleSerializer, 'student': 'student_id',
+    },
+    'tasks': {'model': CustomTask, 'serializer': CustomTaskSerializer, 'student': 'student_id'},
+    'events': {'model': CustomEvents, 'serializer': CustomEventSerializer, 'student': 'student_id'},
+    'activities': {'model': CustomActivity, 'serializer': CustomActivitySerializer, 'student': 'student_id'},
+    'goals': {'model': Goals, 'serializer': GoalsSerializer, 'student': 'student_id'},
+    'goal-schedules': {'model': GoalSchedule, 'serializer': GoalScheduleSerializer, 'student': 'goal_id__student_id'},
+    'schedule': {
+        'model': ScheduleEntry, 'serializer': ScheduleEntrySyncSerializer, 'student': 'student_id',
+        'prefetch': ('exceptions',),
+    },
+    'task-logs': {'model': TaskTimeLog, 'serializer': TaskLogSerializer, 'student': 'task_id__student_id'},
+    'activity-logs': {
+        'model': ActivityTimeLog, 'serializer': ActivityLogSerializer, 'student': 'activity_id__student_id',
+    },
+    'goal-progress': {'model': GoalProgress, 'serializer': GoalProgressSerializer, 'student': 'goal_id__student_id'},
+    'sleep-logs': {'model': SleepLog, 'serializer': SleepLogSerializer, 'student': 'student_id'},
+    'attended-events': {
+        'model': AttendedEvents, 'serializer': AttendedEventSerializer, 'student': 'event_id__student_id',
+    },
+    'attended-classes': {
+        'model': AttendedClass, 'serializer': AttendedClassSerializer, 'student': 'classsched_id__student_id',
+    },
+    'userprefs': {'model': UserPref, 'serializer': UserPrefSerializer, 'student': 'student_id'},
+}
+
+SYNC_COLLECTION_NAMES = {source['model']: name for name, source in SYNC_COLLECTIONS.items()}
+
+
+def owner_id(instance):
+    """Id of the student a synced row belongs to (None if its parent is already gone)"""
+    # Follow e.g. "goal_id__student_id" to the student's id without loading the student
+    *parents, field = SYNC_COLLECTIONS[SYNC_COLLECTION_NAMES[type(instance)]]['student'].split('__')
+    try:
+        for parent in parents:
+            instance = getattr(instance, parent)
+    except ObjectDoesNotExist:
+        return None
+    return getattr(instance, instance._meta.get_field(field).attname)
+
+
+def record_tombstone(instance):
+    """Remember that a synced row was deleted"""
+    student_id = owner_id(instance)
+    if student_id is None:
+        return
+    SyncTombstone.objects.create(
+        student_id=student_id, collection=SYNC_COLLECTION_NAMES[type(instance)], object_id=str(instance.pk)
+    )
+
+
+def encode_cursor(moment):
+    # Microseconds since the epoch: opaque to clients and safe in a query string
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_cursor(cursor):
+    """The timestamp behind a cursor; ValueError if it is not one of ours"""
+    try:
+        return datetime.fromtimestamp(int(cursor) / 1_000_000, tz=dt_timezone.utc)
+    except (OverflowError, OSError) as error:
+        raise ValueError(f'Invalid sync cursor: {cursor}') from error
+
+
+def sync_changes(student_id, since=None, context=None):
+    """
+    Everything that changed for a student since the `since` timestamp:
+    {"cursor", "full", "changes": {collection: [rows]}, "deleted":
+    {collection: [ids]}}. Without a usable `since` every row is sent
+    ("full": true) and the client replaces its copy. Empty collections are
+    left out, so an idle student gets back little more than a new cursor.
+    """
+    cursor = timezone.now()
+    full = since is None or since < cursor - TOMBSTONE_RETENTION
+    changes, deleted = {}, {}
+
+    for name, source in SYNC_COLLECTIONS.items():
+        rows = source['model'].objects.filter(**{source['student']: student_id})
+        if not full:
+            rows = rows.filter(updated_at__gte=since - SYNC_OVERLAP)
+        rows = rows.prefetch_related(*source.get('prefetch', ())).order_by('pk')
+        data = source['serializer'](rows, many=True, context=context).data
+        if data:
+            changes[name] = data
+
+    if not full:
+        tombstones = SyncTombstone.objects.filter(
+            student_id=student_id, deleted_at__gte=since - SYNC_OVERLAP
+        ).values_list('collection', 'object_id').order_by('deleted_at')
+        for collection, object_id in tombstones:
+            object_id = SYNC_COLLECTIONS[collection]['model']._meta.pk.to_python(object_id)
+            deleted.setdefault(collection, []).append(object_id)
+
+    return {'cursor': encode_cursor(cursor), 'full': full, 'changes': changes, 'deleted': deleted}
+
+
+def prune_tombstones():
+    """Drop tombstones older than TOMBSTONE_RETENTION; returns how many"""
+    deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+    return deleted
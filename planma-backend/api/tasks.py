@@ -1,48 +1,47 @@
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from django.utils import timezone
+from django.db.models import Prefetch
 from django.conf import settings
-from datetime import timedelta
-from celery import shared_task
-from firebase_admin import messaging
-import redis
-import os
-import json
+from datetime import datetime, timedelta
+from uuid import UUID
+from celery import group, shared_task
 from .models import (
     CustomEvents, UserPref, CustomTask, CustomClassSchedule, CustomActivity,
-    Goals, GoalSchedule, CustomUser, FCMToken
+    Goals, GoalSchedule
 )
+from .inapp import InAppDispatcher
+from .push import PushDispatcher
+from .reminders import (
+    ReminderTick, DEFAULT_REMINDER_OFFSET, partition_reminders, pop_due_reminders, rebuild_reminder_schedule,
+    restore_reminders
+)
+from .rollups import rebuild_rollups
+from .sync import prune_tombstones
 
-def is_user_in_foreground(user_id):
-    r = redis.Redis.from_url(os.getenv("REDIS_URL"), ssl_cert_reqs=None)
-    key = f"user_online:{user_id}"
-    if not r.exists(key):
-        return False
-    try:
-        data = json.loads(r.get(key))
-        return data.get("foreground", False)
-    except:
-        return False
+# Retries of a failed reminder shard before its reminders go back in the schedule
+REMINDER_SHARD_RETRIES = 3
 
 # In-App Reminders
-def send_sleep_reminders():
+def send_sleep_reminders(tick, inapp):
     """Check for sleep reminders and send notifications"""
+    if not tick.ids('Sleep'):
+        return
 
-    now = timezone.now()
-    today = now.date()
+    now = tick.now
+    today = tick.today
 
-    # Get all user preferences
-    user_prefs = UserPref.objects.filter(student_id=student_id)
+    # Get the user preferences whose sleep reminder is due
+    user_prefs = list(UserPref.objects.filter(
+        pref_id__in=tick.ids('Sleep')
+    ).select_related('student_id'))
 
-    channel_layer = get_channel_layer()
 
-    print(f"[SLEEP IN-APP] Found {user_prefs.count()} upcoming sleep to evaluate at {now}")
+    print(f"[SLEEP IN-APP] Found {len(user_prefs)} upcoming sleep to evaluate at {now}")
 
     for pref in user_prefs:
         print(f"[SLEEP IN-APP] Pref ID={pref.pref_id}, Sleep Time={pref.usual_sleep_time}")
 
         # Skip if reminder was already sent today
-        if pref.last_sleep_reminder_date == today:
+        if pref.last_sleep_reminder_date == today or tick.was_sent('Sleep', pref.pref_id):
             continue
 
         # Create datetime objects for sleep and wake times today
@@ -51,7 +50,7 @@ def send_sleep_reminders():
         )
 
         # Calculate when reminder should be sent (30 minutes before sleep time)
-        reminder_offset = pref.reminder_offset_time or timedelta(minutes=30)
+        reminder_offset = pref.reminder_offset_time or DEFAULT_REMINDER_OFFSET
         reminder_time = sleep_time - reminder_offset
         print(f"[SLEEP IN-APP] Reminder time for 'Sleep': {reminder_time}")
 
@@ -61,324 +60,221 @@ def send_sleep_reminders():
             # Format the sleep time nicely
             formatted_sleep_time = sleep_time.strftime('%I:%M %p')
 
-            # Send to user's channel group
-            if is_user_in_foreground(student_id):
-                async_to_sync(channel_layer.group_send)(
-                    f'user_{pref.student_id.student_id}',
-                    {
-                        'type': 'reminder_notification',
-                        'reminder_type': 'sleep',
-                        'reminder': f"Time to prepare for bed - you should be asleep by {formatted_sleep_time}"
-                    }
-                )
+            # Queue for the user's channel group
+            if tick.in_foreground(student_id):
+                inapp.add(student_id, 'sleep', f"Time to prepare for bed - you should be asleep by {formatted_sleep_time}", key=('Sleep', pref.pref_id))
                 print(f"[SLEEP IN-APP] Sending in-app to {student_id}")
                 # Update last reminder date
-                pref.last_sleep_reminder_date = today
-                pref.save()
+                tick.mark_sent('Sleep', pref.pref_id)
 
-def send_task_reminders():
+def send_task_reminders(tick, inapp):
     """Check for task reminders and send notifications"""
-    now = timezone.now()
-    today = now.date()
+    if not tick.ids('Task'):
+        return
 
-    # Get tasks that are due soon but haven't had reminders sent
-    upcoming_tasks = CustomTask.objects.filter(
-        reminder_sent=False,
-        status__in=['Pending', 'In Progress'],
-        scheduled_date__gte=today,
-    ).select_related('student_id', 'subject_id')
+    now = tick.now
 
-    channel_layer = get_channel_layer()
+    # Get the due tasks whose reminder window is open (evaluated in the database)
+    upcoming_tasks = list(CustomTask.objects.due_reminders(now).filter(
+        task_id__in=tick.ids('Task')
+    ).select_related('student_id', 'subject_id'))
 
-    print(f"[TASK IN-APP] Found {upcoming_tasks.count()} upcoming tasks to evaluate at {now}")
 
-    print('Channel Check')
-    print(now)
+    print(f"[TASK IN-APP] Found {len(upcoming_tasks)} upcoming tasks to evaluate at {now}")
+
     for task in upcoming_tasks:
         print(f"[TASK IN-APP] Task ID={task.task_id}, Name={task.task_name}")
 
-        # Get user preferences for reminder timing
-        try:
-            user_pref = UserPref.objects.get(student_id=task.student_id)
-            reminder_offset = user_pref.reminder_offset_time
-        except UserPref.DoesNotExist:
-            # Default to 30 minutes if no preference set
-            reminder_offset = timedelta(minutes=30)
-
-        # Calculate when reminder should be sent
-        reminder_time = task.deadline - reminder_offset
-        print(f"[TASK IN-APP] Reminder time for '{task.task_name}': {reminder_time}")
-
-        # print('Time Check')
-        # print(now) 
-        # print(reminder_time) 
-        # If it's time to send the reminder
-        if now >= reminder_time:
-            student_id = task.student_id.student_id
-            # Prepare reminder data
-            subject_name = task.subject_id.subject_title if task.subject_id else "No subject"
-            time_remaining = task.deadline - now
-            hours_remaining = round(time_remaining.total_seconds() / 3600, 1)
-
-            reminder_data = {
-                'id': task.task_id,
-                'name': task.task_name,
-                'description': task.task_desc,
-                'deadline': task.deadline.isoformat(),
-                'subject': subject_name,
-                'hours_remaining': hours_remaining
-            }
-
-            # Send to user's channel group
-            if is_user_in_foreground(student_id):
-                async_to_sync(channel_layer.group_send)(
-                    f'user_{task.student_id.student_id}',
-                    {
-                        'type': 'reminder_notification',
-                        'reminder_type': 'task',
-                        'reminder': reminder_data
-                    }
-                )
-                print(f"[TASK IN-APP] Sending in-app ush to {student_id}")
-                # Mark as sent
-                task.reminder_sent = True
-                task.save()
-
-def send_event_reminders():
+        print(f"[TASK IN-APP] Reminder time for '{task.task_name}': {task.remind_at}")
+
+        student_id = task.student_id.student_id
+        # Prepare reminder data
+        subject_name = task.subject_id.subject_title if task.subject_id else "No subject"
+        time_remaining = task.deadline - now
+        hours_remaining = round(time_remaining.total_seconds() / 3600, 1)
+
+        reminder_data = {
+            'id': task.task_id,
+            'name': task.task_name,
+            'description': task.task_desc,
+            'deadline': task.deadline.isoformat(),
+            'subject': subject_name,
+            'hours_remaining': hours_remaining
+        }
+
+        # Queue for the user's channel group
+        if tick.in_foreground(student_id):
+            inapp.add(student_id, 'task', reminder_data, key=('Task', task.task_id))
+            print(f"[TASK IN-APP] Sending in-app ush to {student_id}")
+            # Mark as sent
+            tick.mark_sent('Task', task.task_id)
+
+def send_event_reminders(tick, inapp):
     """Check for event reminders and send notifications"""
-    now = timezone.now()
-    today = now.date()
+    if not tick.ids('Event'):
+        return
+
+    now = tick.now
 
-    # Get events scheduled for today that haven't had reminders sent
-    upcoming_events = CustomEvents.objects.filter(
-        reminder_sent=False,
-        scheduled_date__gte=today,  # Today or in the future
-    ).select_related('student_id')
+    # Get the due events whose reminder window is open (evaluated in the database)
+    upcoming_events = list(CustomEvents.objects.due_reminders(now).filter(
+        event_id__in=tick.ids('Event')
+    ).select_related('student_id'))
 
-    channel_layer = get_channel_layer()
 
-    print(f"[EVENT IN-APP] Found {upcoming_events.count()} upcoming events to evaluate at {now}")
+    print(f"[EVENT IN-APP] Found {len(upcoming_events)} upcoming events to evaluate at {now}")
 
     for event in upcoming_events:
         print(f"[EVENT IN-APP] Event ID={event.event_id}, Name={event.event_name}")
         
-        # Get user preferences for reminder timing
-        try:
-            user_pref = UserPref.objects.get(student_id=event.student_id)
-            reminder_offset = user_pref.reminder_offset_time
-        except UserPref.DoesNotExist:
-            # Default to 30 minutes if no preference set
-            reminder_offset = timedelta(minutes=30)
+        print(f"[EVENT IN-APP] Reminder time for '{event.event_name}': {event.remind_at}")
         
-        # Create a datetime object for the event
-        event_datetime = timezone.make_aware(
-            timezone.datetime.combine(event.scheduled_date, event.scheduled_start_time)
-        )
+        student_id = event.student_id.student_id
+        # Prepare reminder data
+        reminder_data = {
+            'id': event.event_id,
+            'name': event.event_name,
+            'description': event.event_desc,
+            'location': event.location,
+            'scheduled_date': event.scheduled_date.isoformat(),
+            'start_time': event.scheduled_start_time.isoformat(),
+            'end_time': event.scheduled_end_time.isoformat(),
+            'event_type': event.event_type
+        }
         
-        # Calculate when reminder should be sent
-        reminder_time = event_datetime - reminder_offset
-        print(f"[EVENT IN-APP] Reminder time for '{event.event_name}': {reminder_time}")
+        # Queue for the user's channel group
+        if tick.in_foreground(student_id):
+            inapp.add(student_id, 'event', reminder_data, key=('Event', event.event_id))
+            print(f"[EVENT IN-APP] Sending in-app to {student_id}")
+            # Mark as sent
+            tick.mark_sent('Event', event.event_id)
         
-        # If it's time to send the reminder (and event hasn't started yet)
-        if now >= reminder_time and now < event_datetime:
-            student_id = event.student_id.student_id
-            # Prepare reminder data
-            reminder_data = {
-                'id': event.event_id,
-                'name': event.event_name,
-                'description': event.event_desc,
-                'location': event.location,
-                'scheduled_date': event.scheduled_date.isoformat(),
-                'start_time': event.scheduled_start_time.isoformat(),
-                'end_time': event.scheduled_end_time.isoformat(),
-                'event_type': event.event_type
-            }
-            
-            # Send to user's channel group
-            if is_user_in_foreground(student_id):
-                async_to_sync(channel_layer.group_send)(
-                    f'user_{event.student_id.student_id}',
-                    {
-                        'type': 'reminder_notification',
-                        'reminder_type': 'event',
-                        'reminder': reminder_data
-                    }
-                )
-                print(f"[EVENT IN-APP] Sending in-app to {student_id}")
-                # Mark as sent
-                event.reminder_sent = True
-                event.save()
-        
-def send_class_reminders():
+def send_class_reminders(tick, inapp):
     """Check for class reminders and send notifications"""
-    now = timezone.now()
-    today = now.date()
-    current_day = today.strftime("%A")  # Get the day name (e.g., "Monday")
+    if not tick.ids('Class'):
+        return
+
+    now = tick.now
     
-    # Get class schedules for today that haven't had reminders sent today
-    class_schedules = CustomClassSchedule.objects.filter(
-        day_of_week=current_day,
-        last_reminder_date__lt=today  # No reminder sent today
-    ).select_related('student_id', 'subject')
+    # Get today's due classes whose reminder window is open (evaluated in the database)
+    class_schedules = list(CustomClassSchedule.objects.due_reminders(now).filter(
+        classsched_id__in=tick.ids('Class')
+    ).select_related('student_id', 'subject'))
     
-    channel_layer = get_channel_layer()
 
-    print(f"[CLASS IN-APP] Found {class_schedules.count()} upcoming classes to evaluate at {now}")
+    print(f"[CLASS IN-APP] Found {len(class_schedules)} upcoming classes to evaluate at {now}")
     
     for class_schedule in class_schedules:
         print(f"[CLASS IN-APP] Class ID={class_schedule.classsched_id}, Name={class_schedule.subject.subject_code}")
 
-        # Get user preferences for reminder timing
-        try:
-            user_pref = UserPref.objects.get(student_id=class_schedule.student_id)
-            reminder_offset = user_pref.reminder_offset_time
-        except UserPref.DoesNotExist:
-            # Default to 30 minutes if no preference set
-            reminder_offset = timedelta(minutes=30)
-        
-        # Create a datetime object for the class
-        class_datetime = timezone.make_aware(
-            timezone.datetime.combine(today, class_schedule.scheduled_start_time)
-        )
+        print(f"[CLASS IN-APP] Reminder time for '{class_schedule.subject.subject_code}': {class_schedule.remind_at}")
         
-        # Calculate when reminder should be sent
-        reminder_time = class_datetime - reminder_offset
-        print(f"[CLASS IN-APP] Reminder time for '{class_schedule.subject.subject_code}': {reminder_time}")
+        student_id = class_schedule.student_id.student_id
+        # Prepare reminder data
+        reminder_data = {
+            'id': class_schedule.classsched_id,
+            'subject_code': class_schedule.subject.subject_code,
+            'subject_title': class_schedule.subject.subject_title,
+            'room': class_schedule.room,
+            'start_time': class_schedule.scheduled_start_time.isoformat(),
+            'end_time': class_schedule.scheduled_end_time.isoformat()
+        }
         
-        # If it's time to send the reminder (and class hasn't started yet)
-        if now >= reminder_time and now < class_datetime:
-            student_id = class_schedule.student_id.student_id
-            # Prepare reminder data
-            reminder_data = {
-                'id': class_schedule.classsched_id,
-                'subject_code': class_schedule.subject.subject_code,
-                'subject_title': class_schedule.subject.subject_title,
-                'room': class_schedule.room,
-                'start_time': class_schedule.scheduled_start_time.isoformat(),
-                'end_time': class_schedule.scheduled_end_time.isoformat()
-            }
-            
-            # Send to user's channel group
-            if is_user_in_foreground(student_id):
-                async_to_sync(channel_layer.group_send)(
-                    f'user_{class_schedule.student_id.student_id}',
-                    {
-                        'type': 'reminder_notification',
-                        'reminder_type': 'class',
-                        'reminder': reminder_data
-                    }
-                )
-                print(f"[CLASS IN-APP] Sending in-app to {student_id}")
-                # Update last reminder date
-                class_schedule.last_reminder_date = today
-                class_schedule.save()
-
-def send_activity_reminders():
+        # Queue for the user's channel group
+        if tick.in_foreground(student_id):
+            inapp.add(student_id, 'class', reminder_data, key=('Class', class_schedule.classsched_id))
+            print(f"[CLASS IN-APP] Sending in-app to {student_id}")
+            # Update last reminder date
+            tick.mark_sent('Class', class_schedule.classsched_id)
+
+def send_activity_reminders(tick, inapp):
     """Check for activity reminders and send notifications"""
-    now = timezone.now()
-    today = now.date()
+    if not tick.ids('Activity'):
+        return
+
+    now = tick.now
     
-    # Get activities scheduled for today that haven't had reminders sent
-    upcoming_activities = CustomActivity.objects.filter(
-        reminder_sent=False,
-        status__in=['Pending', 'In Progress'],
-        scheduled_date__gte=today,  # Today or in the future
-    ).select_related('student_id')
+    # Get the due activities whose reminder window is open (evaluated in the database)
+    upcoming_activities = list(CustomActivity.objects.due_reminders(now).filter(
+        activity_id__in=tick.ids('Activity')
+    ).select_related('student_id'))
     
-    channel_layer = get_channel_layer()
 
-    print(f"[ACTIVITY IN-APP] Found {upcoming_activities.count()} upcoming activities to evaluate at {now}")
+    print(f"[ACTIVITY IN-APP] Found {len(upcoming_activities)} upcoming activities to evaluate at {now}")
     
     for activity in upcoming_activities:
         print(f"[ACTIVITY IN-APP] Activity ID={activity.activity_id}, Name={activity.activity_name}")
 
-        # Get user preferences for reminder timing
-        try:
-            user_pref = UserPref.objects.get(student_id=activity.student_id)
-            reminder_offset = user_pref.reminder_offset_time
-        except UserPref.DoesNotExist:
-            # Default to 30 minutes if no preference set
-            reminder_offset = timedelta(minutes=30)
-        
-        # Create a datetime object for the activity
-        activity_datetime = timezone.make_aware(
-            timezone.datetime.combine(activity.scheduled_date, activity.scheduled_start_time)
-        )
+        print(f"[ACTIVITY IN-APP] Reminder time for '{activity.activity_name}': {activity.remind_at}")
         
-        # Calculate when reminder should be sent
-        reminder_time = activity_datetime - reminder_offset
-        print(f"[ACTIVITY IN-APP] Reminder time for '{activity.activity_name}': {reminder_time}")
+        student_id = activity.student_id.student_id
+        # Prepare reminder data
+        reminder_data = {
+            'id': activity.activity_id,
+            'name': activity.activity_name,
+            'description': activity.activity_desc,
+            'scheduled_date': activity.scheduled_date.isoformat(),
+            'start_time': activity.scheduled_start_time.isoformat(),
+            'end_time': activity.scheduled_end_time.isoformat(),
+            'status': activity.status
+        }
         
-        # If it's time to send the reminder (and activity hasn't started yet)
-        if now >= reminder_time and now < activity_datetime:
-            student_id = activity.student_id.student_id
-            # Prepare reminder data
-            reminder_data = {
-                'id': activity.activity_id,
-                'name': activity.activity_name,
-                'description': activity.activity_desc,
-                'scheduled_date': activity.scheduled_date.isoformat(),
-                'start_time': activity.scheduled_start_time.isoformat(),
-                'end_time': activity.scheduled_end_time.isoformat(),
-                'status': activity.status
-            }
-            
-            # Send to user's channel group
-            if is_user_in_foreground(student_id):
-                async_to_sync(channel_layer.group_send)(
-                    f'user_{activity.student_id.student_id}',
-                    {
-                        'type': 'reminder_notification',
-                        'reminder_type': 'activity',
-                        'reminder': reminder_data
-                    }
-                )
-                print(f"[ACTIVITY IN-APP] Sending in-app to {student_id}")
-                # Mark as sent
-                activity.reminder_sent = True
-                activity.save()                       
-
-def send_goal_reminders():
+        # Queue for the user's channel group
+        if tick.in_foreground(student_id):
+            inapp.add(student_id, 'activity', reminder_data, key=('Activity', activity.activity_id))
+            print(f"[ACTIVITY IN-APP] Sending in-app to {student_id}")
+            # Mark as sent
+            tick.mark_sent('Activity', activity.activity_id)
+
+def _due_goals(tick):
+    """Due active goals not yet reminded today, with today's pending sessions prefetched"""
+    return list(Goals.objects.filter(
+        goal_id__in=tick.ids('Goal'),
+        student_id__is_active=True
+    ).exclude(
+        last_reminder_date=tick.today  # No reminder sent today
+    ).select_related('student_id').prefetch_related(
+        Prefetch(
+            'goalsched',
+            queryset=GoalSchedule.objects.filter(scheduled_date=tick.today, status='Pending'),
+            to_attr='sessions_today'
+        )
+    ))
+
+def _goal_due_today(goal, today):
+    if goal.timeframe == 'Daily':
+        return True
+    if goal.timeframe == 'Weekly' and today.weekday() == 0:  # Monday
+        return True
+    if goal.timeframe == 'Monthly' and today.day == 1:  # First day of month
+        return True
+    return False
+
+def send_goal_reminders(tick, inapp):
     """Check for goal progress reminders and send notifications"""
-    now = timezone.now()
-    today = now.date()
+    if not tick.ids('Goal'):
+        return
+
+    now = tick.now
+    today = tick.today
     
-    # Get all active goals that haven't had reminders sent today
-    active_goals = Goals.objects.filter(
-        student_id__is_active=True,
-        last_reminder_date__lt=today  # No reminder sent today
-    ).select_related('student_id')
+    # Get the due active goals that haven't had reminders sent today
+    active_goals = _due_goals(tick)
     
-    channel_layer = get_channel_layer()
 
-    print(f"[GOAL IN-APP] Found {active_goals.count()} upcoming goals to evaluate at {now}")
+    print(f"[GOAL IN-APP] Found {len(active_goals)} upcoming goals to evaluate at {now}")
     
     for goal in active_goals:
         print(f"[GOAL IN-APP] Goal ID={goal.goal_id}, Name={goal.goal_name}")
 
         # Check if it's time to send a reminder based on timeframe
-        send_reminder = False
-        
-        if goal.timeframe == 'Daily':
-            # Send daily reminder
-            send_reminder = True
-        elif goal.timeframe == 'Weekly' and today.weekday() == 0:  # Monday
-            # Send weekly reminder on Mondays
-            send_reminder = True
-        elif goal.timeframe == 'Monthly' and today.day == 1:  # First day of month
-            # Send monthly reminder on first day of month
-            send_reminder = True
-            
-        if send_reminder:
-            # Get scheduled goal sessions for today
-            today_goal_schedules = GoalSchedule.objects.filter(
-                goal_id=goal,
-                scheduled_date=today,
-                status='Pending'
-            )
+        # (daily, weekly on Mondays, monthly on the first day of the month)
+        if _goal_due_today(goal, today):
+            # Scheduled goal sessions for today (prefetched for all goals)
+            today_goal_schedules = goal.sessions_today
             
             # If there are scheduled sessions today, remind the user
-            if today_goal_schedules.exists():
+            if today_goal_schedules:
                 student_id = goal.student_id.student_id
                 # Prepare reminder data
                 reminder_data = {
@@ -397,38 +293,37 @@ def send_goal_reminders():
                     ]
                 }
                 
-                # Send to user's channel group
-                if is_user_in_foreground(student_id):
-                    async_to_sync(channel_layer.group_send)(
-                        f'user_{goal.student_id.student_id}',
-                        {
-                            'type': 'reminder_notification',
-                            'reminder_type': 'goal',
-                            'reminder': reminder_data
-                        }
-                    )
+                # Queue for the user's channel group
+                if tick.in_foreground(student_id):
+                    inapp.add(student_id, 'goal', reminder_data, key=('Goal', goal.goal_id))
                     print(f"[GOAL IN-APP] Sending in-app to {student_id}")
                     # Update last reminder date
-                    goal.last_reminder_date = today
-                    goal.save()
+                    tick.mark_sent('Goal', goal.goal_id)
 
-def send_wake_up_reminders():
+def send_wake_up_reminders(tick, inapp):
     """Check and send wake-up reminders"""
-    now = timezone.now()
-    today = now.date()
+    if not tick.ids('Wake'):
+        return
+
+    now = tick.now
+    today = tick.today
     
-    # Get all user preferences
-    user_prefs = UserPref.objects.filter(
+    # Get the user preferences whose wake-up reminder is due
+    user_prefs = list(UserPref.objects.filter(
+        pref_id__in=tick.ids('Wake'),
         student_id__is_active=True
-    ).select_related('student_id')
+    ).select_related('student_id'))
     
-    channel_layer = get_channel_layer()
 
-    print(f"[WAKE IN-APP] Found {user_prefs.count()} upcoming wake to evaluate at {now}")
+    print(f"[WAKE IN-APP] Found {len(user_prefs)} upcoming wake to evaluate at {now}")
     
     for pref in user_prefs:
         print(f"[WAKE IN-APP] Pref ID={pref.pref_id}, Name={pref.usual_wake_time}")
 
+        # Skip if the wake-up reminder already went out today (e.g. a retried shard)
+        if pref.last_wake_reminder_date == today:
+            continue
+
         # Create datetime objects for wake-up time today
         wake_time = timezone.make_aware(
             timezone.datetime.combine(today, pref.usual_wake_time)
@@ -441,31 +336,27 @@ def send_wake_up_reminders():
             # Format the wake time nicely
             formatted_wake_time = wake_time.strftime('%I:%M %p')
             
-            # Send to user's channel group
-            if is_user_in_foreground(student_id):
-                async_to_sync(channel_layer.group_send)(
-                    f'user_{pref.student_id.student_id}',
-                    {
-                        'type': 'reminder_notification',
-                        'reminder_type': 'wake',
-                        'reminder': f"Good morning! It's time to wake up. Your scheduled wake-up time is {formatted_wake_time}."
-                    }
-                )
+            # Queue for the user's channel group
+            if tick.in_foreground(student_id):
+                inapp.add(student_id, 'wake', f"Good morning! It's time to wake up. Your scheduled wake-up time is {formatted_wake_time}.", key=('Wake', pref.pref_id))
                 print(f"[WAKE IN-APP] Sending in-app to {student_id}")
+                tick.mark_sent('Wake', pref.pref_id)
 
 
 # Push Notifications
-def send_sleep_push_reminders():
-    now = timezone.now()
-    today = now.date()
+def send_sleep_push_reminders(tick, push):
+    if not tick.ids('Sleep'):
+        return
 
-    user_prefs = UserPref.objects.filter(
-        student_id__is_active=True
-    ).select_related('student_id')
+    now = tick.now
+    today = tick.today
 
-    print(f"[SLEEP PUSH] Found {user_prefs.count()} upcoming sleep to evaluate at {now}")
+    user_prefs = list(UserPref.objects.filter(
+        pref_id__in=tick.ids('Sleep'),
+        student_id__is_active=True
+    ).select_related('student_id'))
 
-    sent_tokens = set()
+    print(f"[SLEEP PUSH] Found {len(user_prefs)} upcoming sleep to evaluate at {now}")
 
     for pref in user_prefs:
         print(f"[SLEEP PUSH] Pref ID={pref.pref_id}, Time={pref.usual_sleep_time}")
@@ -474,243 +365,207 @@ def send_sleep_push_reminders():
             timezone.datetime.combine(today, pref.usual_sleep_time)
         )
         
-        reminder_offset = pref.reminder_offset_time or timedelta(minutes=30)
+        reminder_offset = pref.reminder_offset_time or DEFAULT_REMINDER_OFFSET
         reminder_time = sleep_time - reminder_offset
         print(f"[SLEEP PUSH] Reminder time for 'Sleep': {reminder_time}")
 
         # Skip if a reminder was already sent one today
-        if pref.last_sleep_reminder_date == today:
+        if pref.last_sleep_reminder_date == today or tick.was_sent('Sleep', pref.pref_id):
             continue
 
         if now >= reminder_time and now <= sleep_time:
             student_id = pref.student_id.student_id
-            if not is_user_in_foreground(student_id):
-                token = getattr(pref.student_id, "fcm_token", None)
-                if token and token not in sent_tokens:
-                    sent_tokens.add(token)
-                    title = "Sleep Reminder"
-                    body = f"You should be asleep by {sleep_time.strftime('%I:%M %p')}."
-                
-                    print(f"[SLEEP PUSH] Sending push to {student_id}: {title} - {body}")
-                    send_push_notification.delay(student_id, title, body)
+            if not tick.in_foreground(student_id):
+                title = "Sleep Reminder"
+                body = f"You should be asleep by {sleep_time.strftime('%I:%M %p')}."
 
-                    pref.last_sleep_reminder_date = today
-                    pref.save()
+                print(f"[SLEEP PUSH] Sending push to {student_id}: {title} - {body}")
+                push.add(student_id, title, body, key=('Sleep', pref.pref_id))
 
-def send_task_push_reminders():
-    now = timezone.now()
-    today = now.date()
+                tick.mark_sent('Sleep', pref.pref_id)
+
+def send_task_push_reminders(tick, push):
+    if not tick.ids('Task'):
+        return
 
-    upcoming_tasks = CustomTask.objects.filter(
-        reminder_sent=False,
-        status__in=['Pending', 'In Progress'],
-        scheduled_date__gte=today,
-    ).select_related('student_id', 'subject_id')
+    now = tick.now
 
-    print(f"[TASK PUSH] Found {upcoming_tasks.count()} upcoming tasks to evaluate at {now}")
+    upcoming_tasks = list(CustomTask.objects.due_reminders(now).filter(
+        task_id__in=tick.ids('Task')
+    ).select_related('student_id', 'subject_id'))
+
+    print(f"[TASK PUSH] Found {len(upcoming_tasks)} upcoming tasks to evaluate at {now}")
 
     for task in upcoming_tasks:
         print(f"[TASK PUSH] Task ID={task.task_id}, Name={task.task_name}")
 
-        try:
-            user_pref = UserPref.objects.get(student_id=task.student_id)
-            reminder_offset = user_pref.reminder_offset_time
-        except UserPref.DoesNotExist:
-            reminder_offset = timedelta(minutes=30)
+        # Skip tasks the in-app pass already reminded about this tick
+        if tick.was_sent('Task', task.task_id):
+            continue
+
+        print(f"[TASK PUSH] Reminder time for '{task.task_name}': {task.remind_at}")
 
-        reminder_time = task.deadline - reminder_offset
-        print(f"[TASK PUSH] Reminder time for '{task.task_name}': {reminder_time}")
+        student_id = task.student_id.student_id
 
-        if now >= reminder_time:
-            student_id = task.student_id.student_id
+        if not tick.in_foreground(student_id):
+            subject_name = task.subject_id.subject_title if task.subject_id else "No subject"
+            message = f"{task.task_name} is due soon! Subject: {subject_name}"
+            title = "Task Reminder"
 
-            if not is_user_in_foreground(student_id):
-                subject_name = task.subject_id.subject_title if task.subject_id else "No subject"
-                message = f"{task.task_name} is due soon! Subject: {subject_name}"
-                title = "Task Reminder"
+            print(f"[TASK PUSH] Sending push to {student_id}: {title} - {message}")
+            push.add(student_id, title, message, key=('Task', task.task_id))
 
-                print(f"[TASK PUSH] Sending push to {student_id}: {title} - {message}")
-                send_push_notification.delay(student_id, title, message)
+            # Mark as sent so it doesn't send again
+            tick.mark_sent('Task', task.task_id)
 
-                # Mark as sent so it doesn't send again
-                task.reminder_sent = True
-                task.save()
+def send_event_push_reminders(tick, push):
+    if not tick.ids('Event'):
+        return
 
-def send_event_push_reminders():
-    now = timezone.now()
-    today = now.date()
+    now = tick.now
 
-    upcoming_events = CustomEvents.objects.filter(
-        reminder_sent=False,
-        scheduled_date__gte=today
-    ).select_related('student_id')
+    upcoming_events = list(CustomEvents.objects.due_reminders(now).filter(
+        event_id__in=tick.ids('Event')
+    ).select_related('student_id'))
 
-    print(f"[EVENT PUSH] Found {upcoming_events.count()} upcoming events to evaluate at {now}")
+    print(f"[EVENT PUSH] Found {len(upcoming_events)} upcoming events to evaluate at {now}")
 
     for event in upcoming_events:
         print(f"[EVENT PUSH] Event ID={event.event_id}, Name={event.event_name}")
 
-        try:
-            user_pref = UserPref.objects.get(student_id=event.student_id)
-            reminder_offset = user_pref.reminder_offset_time
-        except UserPref.DoesNotExist:
-            reminder_offset = timedelta(minutes=30)
+        # Skip events the in-app pass already reminded about this tick
+        if tick.was_sent('Event', event.event_id):
+            continue
 
-        event_datetime = timezone.make_aware(
-            timezone.datetime.combine(event.scheduled_date, event.scheduled_start_time)
-        )
-        reminder_time = event_datetime - reminder_offset
-        print(f"[EVENT PUSH] Reminder time for '{event.event_name}': {reminder_time}")
+        print(f"[EVENT PUSH] Reminder time for '{event.event_name}': {event.remind_at}")
 
-        if now >= reminder_time and now < event_datetime:
-            student_id = event.student_id.student_id
+        student_id = event.student_id.student_id
 
-            if not is_user_in_foreground(student_id):
-                title = "Event Reminder"
-                body = f"{event.event_name} starts soon at {event.scheduled_start_time.strftime('%I:%M %p')}."
+        if not tick.in_foreground(student_id):
+            title = "Event Reminder"
+            body = f"{event.event_name} starts soon at {event.scheduled_start_time.strftime('%I:%M %p')}."
 
-                print(f"[EVENT PUSH] Sending push to {student_id}: {title} - {body}")
-                send_push_notification.delay(student_id, title, body)
+            print(f"[EVENT PUSH] Sending push to {student_id}: {title} - {body}")
+            push.add(student_id, title, body, key=('Event', event.event_id))
 
-                event.reminder_sent = True
-                event.save()
+            tick.mark_sent('Event', event.event_id)
 
-def send_class_push_reminders():
-    now = timezone.now()
-    today = now.date()
-    current_day = today.strftime("%A")
+def send_class_push_reminders(tick, push):
+    if not tick.ids('Class'):
+        return
 
-    class_schedules = CustomClassSchedule.objects.filter(
-        day_of_week=current_day,
-        last_reminder_date__lt=today
-    ).select_related('student_id', 'subject')
+    now = tick.now
 
-    print(f"[CLASS PUSH] Found {class_schedules.count()} upcoming classes to evaluate at {now}")
+    class_schedules = list(CustomClassSchedule.objects.due_reminders(now).filter(
+        classsched_id__in=tick.ids('Class')
+    ).select_related('student_id', 'subject'))
+
+    print(f"[CLASS PUSH] Found {len(class_schedules)} upcoming classes to evaluate at {now}")
 
     for class_schedule in class_schedules:
         print(f"[CLASS PUSH] Class ID={class_schedule.classsched_id}, Name={class_schedule.subject.subject_code}")
 
-        try:
-            user_pref = UserPref.objects.get(student_id=class_schedule.student_id)
-            reminder_offset = user_pref.reminder_offset_time
-        except UserPref.DoesNotExist:
-            reminder_offset = timedelta(minutes=30)
+        # Skip classes the in-app pass already reminded about this tick
+        if tick.was_sent('Class', class_schedule.classsched_id):
+            continue
 
-        class_datetime = timezone.make_aware(
-            timezone.datetime.combine(today, class_schedule.scheduled_start_time)
-        )
-        reminder_time = class_datetime - reminder_offset
-        print(f"[CLASS PUSH] Reminder time for '{class_schedule.subject.subject_code}': {reminder_time}")
+        print(f"[CLASS PUSH] Reminder time for '{class_schedule.subject.subject_code}': {class_schedule.remind_at}")
 
-        if now >= reminder_time and now < class_datetime:
-            student_id = class_schedule.student_id.student_id
+        student_id = class_schedule.student_id.student_id
 
-            if not is_user_in_foreground(student_id):
-                title = f"Class Reminder"
-                body = f"Your class in {class_schedule.subject.subject_code} starts at {class_schedule.scheduled_start_time.strftime('%I:%M %p')} in {class_schedule.room}."
+        if not tick.in_foreground(student_id):
+            title = f"Class Reminder"
+            body = f"Your class in {class_schedule.subject.subject_code} starts at {class_schedule.scheduled_start_time.strftime('%I:%M %p')} in {class_schedule.room}."
 
-                print(f"[CLASS PUSH] Sending push to {student_id}: {title} - {body}")
-                send_push_notification.delay(student_id, title, body)
+            print(f"[CLASS PUSH] Sending push to {student_id}: {title} - {body}")
+            push.add(student_id, title, body, key=('Class', class_schedule.classsched_id))
 
-                class_schedule.last_reminder_date = today
-                class_schedule.save()
+            tick.mark_sent('Class', class_schedule.classsched_id)
 
-def send_activity_push_reminders():
-    now = timezone.now()
-    today = now.date()
+def send_activity_push_reminders(tick, push):
+    if not tick.ids('Activity'):
+        return
 
-    upcoming_activities = CustomActivity.objects.filter(
-        reminder_sent=False,
-        status__in=['Pending', 'In Progress'],
-        scheduled_date__gte=today
-    ).select_related('student_id')
+    now = tick.now
 
-    print(f"[ACTIVITY PUSH] Found {upcoming_activities.count()} upcoming activities to evaluate at {now}")
+    upcoming_activities = list(CustomActivity.objects.due_reminders(now).filter(
+        activity_id__in=tick.ids('Activity')
+    ).select_related('student_id'))
+
+    print(f"[ACTIVITY PUSH] Found {len(upcoming_activities)} upcoming activities to evaluate at {now}")
 
     for activity in upcoming_activities:
         print(f"[ACTIVITY PUSH] Activity ID={activity.activity_id}, Name={activity.activity_name}")
 
-        try:
-            user_pref = UserPref.objects.get(student_id=activity.student_id)
-            reminder_offset = user_pref.reminder_offset_time
-        except UserPref.DoesNotExist:
-            reminder_offset = timedelta(minutes=30)
+        # Skip activities the in-app pass already reminded about this tick
+        if tick.was_sent('Activity', activity.activity_id):
+            continue
 
-        activity_datetime = timezone.make_aware(
-            timezone.datetime.combine(activity.scheduled_date, activity.scheduled_start_time)
-        )
-        reminder_time = activity_datetime - reminder_offset
-        print(f"[ACTIVITY PUSH] Reminder time for '{activity.activity_name}': {reminder_time}")
+        print(f"[ACTIVITY PUSH] Reminder time for '{activity.activity_name}': {activity.remind_at}")
 
-        if now >= reminder_time and now < activity_datetime:
-            student_id = activity.student_id.student_id
+        student_id = activity.student_id.student_id
 
-            if not is_user_in_foreground(student_id):
-                title = "Activity Reminder"
-                body = f"{activity.activity_name} starts at {activity.scheduled_start_time.strftime('%I:%M %p')}."
+        if not tick.in_foreground(student_id):
+            title = "Activity Reminder"
+            body = f"{activity.activity_name} starts at {activity.scheduled_start_time.strftime('%I:%M %p')}."
 
-                print(f"[ACTIVITY PUSH] Sending push to {student_id}: {title} - {body}")
-                send_push_notification.delay(student_id, title, body)
+            print(f"[ACTIVITY PUSH] Sending push to {student_id}: {title} - {body}")
+            push.add(student_id, title, body, key=('Activity', activity.activity_id))
 
-                activity.reminder_sent = True
-                activity.save()
+            tick.mark_sent('Activity', activity.activity_id)
 
-def send_goal_push_reminders():
-    now = timezone.now()
-    today = now.date()
+def send_goal_push_reminders(tick, push):
+    if not tick.ids('Goal'):
+        return
+
+    now = tick.now
+    today = tick.today
 
-    active_goals = Goals.objects.filter(
-        student_id__is_active=True,
-        last_reminder_date__lt=today
-    ).select_related('student_id')
+    active_goals = _due_goals(tick)
 
-    print(f"[GOAL PUSH] Found {active_goals.count()} upcoming goals to evaluate at {now}")
+    print(f"[GOAL PUSH] Found {len(active_goals)} upcoming goals to evaluate at {now}")
 
     for goal in active_goals:
         print(f"[GOAL PUSH] Goal ID={goal.goal_id}, Name={goal.goal_name}")
 
-        send_reminder = False
-        if goal.timeframe == 'Daily':
-            send_reminder = True
-        elif goal.timeframe == 'Weekly' and today.weekday() == 0:
-            send_reminder = True
-        elif goal.timeframe == 'Monthly' and today.day == 1:
-            send_reminder = True
-
-        if send_reminder:
-            today_goal_schedules = GoalSchedule.objects.filter(
-                goal_id=goal,
-                scheduled_date=today,
-                status='Pending'
-            )
-            if today_goal_schedules.exists():
+        # Skip goals the in-app pass already reminded about this tick
+        if tick.was_sent('Goal', goal.goal_id):
+            continue
+
+        if _goal_due_today(goal, today):
+            if goal.sessions_today:
                 student_id = goal.student_id.student_id
 
-                if not is_user_in_foreground(student_id):
+                if not tick.in_foreground(student_id):
                     title = "Goal Reminder"
                     body = f"You have a goal session today for \"{goal.goal_name}\"."
 
                     print(f"[GOAL PUSH] Sending push to {student_id}: {title} - {body}")
-                    send_push_notification.delay(student_id, title, body)
+                    push.add(student_id, title, body, key=('Goal', goal.goal_id))
 
-                    goal.last_reminder_date = today
-                    goal.save()
+                    tick.mark_sent('Goal', goal.goal_id)
 
-def send_wake_up_push_reminders():
-    now = timezone.now()
-    today = now.date()
+def send_wake_up_push_reminders(tick, push):
+    if not tick.ids('Wake'):
+        return
 
-    user_prefs = UserPref.objects.filter(
-        student_id__is_active=True
-    ).select_related('student_id')
+    now = tick.now
+    today = tick.today
 
-    print(f"[WAKE PUSH] Found {user_prefs.count()} upcoming wake to evaluate at {now}")
+    user_prefs = list(UserPref.objects.filter(
+        pref_id__in=tick.ids('Wake'),
+        student_id__is_active=True
+    ).select_related('student_id'))
 
-    sent_tokens = set()
+    print(f"[WAKE PUSH] Found {len(user_prefs)} upcoming wake to evaluate at {now}")
 
     for pref in user_prefs:
         print(f"[WAKE PUSH] Pref ID={pref.pref_id}, Time={pref.usual_wake_time}")
 
+        # Skip users the in-app pass already woke up this tick, or earlier today
+        if pref.last_wake_reminder_date == today or tick.was_sent('Wake', pref.pref_id):
+            continue
+
         wake_time = timezone.make_aware(
             timezone.datetime.combine(today, pref.usual_wake_time)
         )
@@ -719,131 +574,192 @@ def send_wake_up_push_reminders():
         if now <= wake_time and now >= (wake_time - timedelta(minutes=5)):
             student_id = pref.student_id.student_id
 
-            if not is_user_in_foreground(student_id):
-                token = getattr(pref.student_id, "fcm_token", None)
-                if token and token not in sent_tokens:
-                    sent_tokens.add(token)
-                    title = "Wake-Up Reminder"
-                    body = f"Good morning! Your scheduled wake-up time is {wake_time.strftime('%I:%M %p')}."
+            if not tick.in_foreground(student_id):
+                title = "Wake-Up Reminder"
+                body = f"Good morning! Your scheduled wake-up time is {wake_time.strftime('%I:%M %p')}."
+
+                print(f"[WAKE PUSH] Sending push to {student_id}: {title} - {body}")
+                push.add(student_id, title, body, key=('Wake', pref.pref_id))
 
-                    print(f"[WAKE PUSH] Sending push to {student_id}: {title} - {body}")
-                    send_push_notification.delay(student_id, title, body)
+                tick.mark_sent('Wake', pref.pref_id)
 
 @shared_task
 def send_all_reminders():
-    """Master function to check and send all types of reminders"""
+    """
+    Coordinator: pop the due reminders and fan them out to one
+    send_reminder_shard task per student shard, so the passes for different
+    students run in parallel on every worker process.
+    """
     print('Starting reminder checks...')
-    
-    try:
-        send_task_reminders()
-        print('Task reminders processed')
-    except Exception as e:
-        print(f'Error processing task reminders: {str(e)}')
-    
-    try:
-        send_event_reminders()
-        print('Event reminders processed')
-    except Exception as e:
-        print(f'Error processing event reminders: {str(e)}')
-    
-    try:
-        send_activity_reminders()
-        print('Activity reminders processed')
-    except Exception as e:
-        print(f'Error processing activity reminders: {str(e)}')
-    
-    try:
-        send_class_reminders()
-        print('Class reminders processed')
-    except Exception as e:
-        print(f'Error processing class reminders: {str(e)}')
-    
-    try:
-        send_sleep_reminders()
-        print('Sleep reminders processed')
-    except Exception as e:
-        print(f'Error processing sleep reminders: {str(e)}')
-    
-    try:
-        send_wake_up_reminders()
-        print('Wake-up reminders processed')
-    except Exception as e:
-        print(f'Error processing wake-up reminders: {str(e)}')
-    
-    try:
-        send_goal_reminders()
-        print('Goal reminders processed')
-    except Exception as e:
-        print(f'Error processing goal reminders: {str(e)}')
-
-    try:
-        send_sleep_push_reminders()
-        print('Sleep push reminders processed')
-    except Exception as e:
-        print(f'Error processing sleep PUSH reminders: {str(e)}')
 
-    try:
-        send_task_push_reminders()
-        print('Task push reminders processed')
-    except Exception as e:
-        print(f'Error processing task PUSH reminders: {str(e)}')
+    # Only reminders whose time has come are read from the schedule
+    now = timezone.now()
+    shards = partition_reminders(pop_due_reminders(now), settings.REMINDER_SHARDS)
+    print(f"[REMINDERS] {sum(len(entries) for entries in shards.values())} reminders due at {now} "
+          f"in {len(shards)} shards")
 
+    if shards:
+        try:
+            group(
+                send_reminder_shard.s(shard, [
+                    [category_type, reference_id, str(student_id)]
+                    for category_type, reference_id, student_id in entries
+                ], now.isoformat())
+                for shard, entries in shards.items()
+            ).apply_async()
+        except Exception:
+            # The popped rows are only in this process now; hand them back
+            # so the next tick sends them (a shard that did get published
+            # may send its reminders twice, never zero times)
+            restore_reminders([entry for entries in shards.values() for entry in entries], now)
+            raise
+    return len(shards)
+
+
+@shared_task(
+    bind=True, ignore_result=True, max_retries=REMINDER_SHARD_RETRIES, default_retry_delay=10,
+    # Acknowledged once it has run, so a worker that dies mid-shard leaves it
+    # on the broker for another worker
+    acks_late=True, reject_on_worker_lost=True,
+)
+def send_reminder_shard(self, shard, entries, now):
+    """Run every reminder pass for one shard's popped reminders"""
+    popped = [
+        (category_type, reference_id, UUID(student_id)) for category_type, reference_id, student_id in entries
+    ]
+    now = datetime.fromisoformat(now)
     try:
-        send_event_push_reminders()
-        print('Event push reminders processed')
+        tick = ReminderTick(popped, now=now)
+        print(f"[REMINDERS] Shard {shard}: {len(tick)} reminders due at {tick.now}")
+        send_tick_reminders(tick)
     except Exception as e:
-        print(f'Error processing event PUSH reminders: {str(e)}')
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e)
+        # Out of retries: back into the schedule, the next tick tries again.
+        # Whatever did go out is marked sent, so it is not sent twice.
+        print(f"[REMINDERS] Shard {shard} failed, restoring {len(popped)} reminders: {str(e)}")
+        restore_reminders(popped, now)
+        raise
+    return len(tick)
+
+
+def send_tick_reminders(tick):
+    """
+    Send the in-app and push reminders of a tick and record the ones that
+    were delivered. Students whose in-app message failed get the push
+    notification instead; a reminder neither could deliver is not marked
+    sent, and the tick raises so the shard retries it.
+    """
+    # In-app reminders and push notifications are queued by the passes and
+    # sent in bulk: one group message per student, FCM in batches
+    inapp = InAppDispatcher()
+    push = PushDispatcher()
+    # Steps that raised; the tick is reported failed once the rest has run
+    failed = []
+
+    inapp_passes = [
+        ('task', send_task_reminders),
+        ('event', send_event_reminders),
+        ('activity', send_activity_reminders),
+        ('class', send_class_reminders),
+        ('sleep', send_sleep_reminders),
+        ('wake-up', send_wake_up_reminders),
+        ('goal', send_goal_reminders),
+    ]
+    for name, send_pass in inapp_passes:
+        try:
+            send_pass(tick, inapp)
+            print(f'{name.capitalize()} reminders processed')
+        except Exception as e:
+            failed.append(e)
+            print(f'Error processing {name} reminders: {str(e)}')
 
     try:
-        send_class_push_reminders()
-        print('Class push reminders processed')
+        inapp.flush()
+        print('In-app reminders dispatched')
     except Exception as e:
-        print(f'Error processing class PUSH reminders: {str(e)}')
+        failed.append(e)
+        print(f'Error dispatching in-app reminders: {str(e)}')
+    # Not delivered in-app: fall back to push for those students
+    for student_id, keys in inapp.failed.items():
+        tick.mark_unreachable(student_id)
+        tick.mark_undelivered(keys)
+
+    push_passes = [
+        ('sleep', send_sleep_push_reminders),
+        ('task', send_task_push_reminders),
+        ('event', send_event_push_reminders),
+        ('class', send_class_push_reminders),
+        ('activity', send_activity_push_reminders),
+        ('goal', send_goal_push_reminders),
+        ('wake-up', send_wake_up_push_reminders),
+    ]
+    for name, send_pass in push_passes:
+        try:
+            send_pass(tick, push)
+            print(f'{name.capitalize()} push reminders processed')
+        except Exception as e:
+            failed.append(e)
+            print(f'Error processing {name} PUSH reminders: {str(e)}')
 
     try:
-        send_activity_push_reminders()
-        print('Activity PUSH reminders processed')
+        push.flush()
+        print('Push notifications dispatched')
     except Exception as e:
-        print(f'Error processing activity PUSH reminders: {str(e)}')
+        failed.append(e)
+        push.failed = {key for _, _, _, key in push.pending if key}
+        print(f'Error dispatching push notifications: {str(e)}')
+    tick.mark_undelivered(push.failed)
 
+    # Write every "reminder sent" marker of this tick in bulk
     try:
-        send_goal_push_reminders()
-        print('Goal PUSH reminders processed')
+        tick.save_sent()
     except Exception as e:
-        print(f'Error processing goal PUSH reminders: {str(e)}')
+        failed.append(e)
+        print(f'Error saving sent reminders: {str(e)}')
 
+    # Classes, goals, sleep and wake-up come back; queue their next occurrence
     try:
-        send_wake_up_push_reminders()
-        print('Wake-up PUSH reminders processed')
+        tick.reschedule_recurring()
     except Exception as e:
-        print(f'Error processing wake-up PUSH reminders: {str(e)}')
-    
+        failed.append(e)
+        print(f'Error rescheduling recurring reminders: {str(e)}')
+
+    undelivered = tick.undelivered_keys()
+    if undelivered:
+        failed.append(RuntimeError(f"{len(undelivered)} reminders could not be delivered"))
+    if failed:
+        raise RuntimeError(f"{len(failed)} reminder steps failed, first: {failed[0]}")
     print('All reminder checks completed')
-    return True
 
-  
+
 @shared_task
-def send_push_notification(user_id, title, message):
-    try:
-        token = FCMToken.objects.get(user_id=user_id).token
-
-        # Build the message payload
-        message = messaging.Message(
-            notification=messaging.Notification(
-                title=title,
-                body=message
-            ),
-            token=token
-        )
+def rebuild_reminders():
+    """Rebuild the reminder schedule from scratch (backfill / nightly repair)"""
+    count = rebuild_reminder_schedule()
+    print(f"[REMINDERS] Reminder schedule rebuilt with {count} entries")
+    return count
 
-        print(f"📦 Sending FCM payload to {user_id}: {message}")
-        response = messaging.send(message)
-        print(f'Push notification sent to user {user_id}: {response}')
-        return response
 
-    except FCMToken.DoesNotExist:
-        print(f"No FCM token found for user {user_id}")
-        return None
-    except Exception as e:
-        print(f"Error sending notification to user {user_id}: {str(e)}")
-        return None
+@shared_task
+def rebuild_time_rollups(student_id=None):
+    """Rebuild the daily time-log rollups from the raw logs (backfill / nightly repair)"""
+    count = rebuild_rollups(student_id)
+    print(f"[ROLLUPS] Daily time rollups rebuilt with {count} rows")
+    return count
+
+
+@shared_task
+def prune_sync_tombstones():
+    """Forget deleted rows older than the sync retention window"""
+    count = prune_tombstones()
+    print(f"[SYNC] Pruned {count} sync tombstones")
+    return count
+
+  
+@shared_task
+def send_push_notification(user_id, title, message):
+    """Send a single push notification (manual/test sends; reminders are batched)"""
+    push = PushDispatcher()
+    push.add(user_id, title, message)
+    return push.flush()
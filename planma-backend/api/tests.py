@@ -1,3 +1,1802 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import date, datetime, time, timedelta
+from importlib import import_module
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.db.migrations.loader import MigrationLoader
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from django.utils import timezone
+from firebase_admin import messaging
+
+from .models import (
+    ActivityTimeLog, AttendedClass, AttendedEvents, CustomActivity, CustomClassSchedule, CustomEvents, CustomSemester, CustomSubject,
+    CustomTask, CustomUser, DailyTimeRollup, FCMToken, GoalProgress, Goals, GoalSchedule, ScheduleEntry,
+    ReminderSchedule, ScheduleEntryException, SleepLog, SyncTombstone, TaskTimeLog, UserPref
+)
+from .dashboard import DASHBOARD_WIDGETS, build_dashboard
+from .inapp import InAppDispatcher
+from .presence import PRESENCE_TTL, foreground_status, get_async_redis, is_user_in_foreground, presence_key
+from .push import PushDispatcher
+from .reminders import (
+    ReminderTick, partition_reminders, pop_due_reminders, rebuild_reminder_schedule, reminder_shard
+)
+from .rollups import rebuild_rollups, refresh_rollups
+from .scheduling import WEEKDAYS, find_conflicts, overlaps_within, weekly_dates
+from .sync import SYNC_COLLECTIONS, encode_cursor, prune_tombstones
+from .versions import collection_versions
+from .tasks import (
+    send_activity_reminders, send_all_reminders, send_reminder_shard, send_task_reminders, send_tick_reminders
+)
+from planmaDB.celery import app as celery_app
+
+
+class FakeFCMClient:
+    """Stands in for firebase_admin.messaging; fails for tokens listed in `errors`"""
+
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.batches = []
+
+    def send_each(self, messages):
+        self.batches.append(messages)
+        return messaging.BatchResponse([
+            messaging.SendResponse(None, self.errors[message.token]) if message.token in self.errors
+            else messaging.SendResponse({'name': f'projects/planma/messages/{message.token}'}, None)
+            for message in messages
+        ])
+
+
+class PushDispatcherTests(TestCase):
+    def make_user(self, index, token=None):
+        user = CustomUser.objects.create_user(
+            firstname='Push', lastname=str(index), email=f'push{index}@planma.test',
+            username=f'push{index}', password='pass1234'
+        )
+        if token:
+            FCMToken.objects.create(user=user, token=token)
+        return user
+
+    def test_sends_in_chunks_with_one_token_query(self):
+        users = [self.make_user(i, token=f'token-{i}') for i in range(5)]
+        client = FakeFCMClient()
+        push = PushDispatcher(client=client, batch_size=2)
+        for user in users:
+            push.add(user.student_id, 'Task Reminder', 'Due soon')
+
+        with self.assertNumQueries(1):
+            sent = push.flush()
+
+        self.assertEqual(sent, 5)
+        self.assertEqual([len(batch) for batch in client.batches], [2, 2, 1])
+        self.assertEqual(len(push), 0)
+
+    def test_skips_users_without_token_and_duplicates(self):
+        user = self.make_user(1, token='token-1')
+        tokenless = self.make_user(2)
+        client = FakeFCMClient()
+        push = PushDispatcher(client=client)
+        push.add(user.student_id, 'Sleep Reminder', 'Bed time')
+        push.add(user.student_id, 'Sleep Reminder', 'Bed time')
+        push.add(tokenless.student_id, 'Sleep Reminder', 'Bed time')
+
+        self.assertEqual(push.flush(), 1)
+        self.assertEqual(len(client.batches[0]), 1)
+
+    def test_prunes_invalid_tokens(self):
+        valid = self.make_user(1, token='token-ok')
+        stale = self.make_user(2, token='token-stale')
+        flaky = self.make_user(3, token='token-flaky')
+        client = FakeFCMClient(errors={
+            'token-stale': messaging.UnregisteredError('Requested entity was not found.'),
+            'token-flaky': messaging.QuotaExceededError('Quota exceeded.'),
+        })
+        push = PushDispatcher(client=client)
+        for n, user in enumerate((valid, stale, flaky)):
+            push.add(user.student_id, 'Event Reminder', 'Starts soon', key=('Event', n))
+
+        self.assertEqual(push.flush(), 1)
+        # Only the error a retry could get past counts as undelivered
+        self.assertEqual(push.failed, {('Event', 2)})
+        self.assertEqual(
+            set(FCMToken.objects.values_list('token', flat=True)),
+            {'token-ok', 'token-flaky'}
+        )
+
+    def test_failed_batch_does_not_raise(self):
+        user = self.make_user(1, token='token-1')
+
+        class DownClient:
+            def send_each(self, messages):
+                raise ConnectionError('FCM unreachable')
+
+        push = PushDispatcher(client=DownClient())
+        push.add(user.student_id, 'Goal Reminder', 'Session today', key=('Goal', 1))
+        self.assertEqual(push.flush(), 0)
+        self.assertEqual(push.failed, {('Goal', 1)})
+        self.assertTrue(FCMToken.objects.filter(token='token-1').exists())
+
+
+
+class FakePresenceRedis:
+    """Synchronous Redis stand-in that counts round trips and honours key expiry"""
+
+    def __init__(self):
+        self.clock = 0
+        self.keys = {}
+        self.round_trips = 0
+
+    def set(self, key, value, ex=None):
+        self.round_trips += 1
+        self.keys[key] = (value, self.clock + ex if ex else None)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        values = []
+        for key in keys:
+            value, expires_at = self.keys.get(key, (None, None))
+            values.append(None if expires_at is not None and expires_at <= self.clock else value)
+        return values
+
+
+class PresenceTests(TestCase):
+    """foreground_status reads every user in one MGET"""
+
+    def setUp(self):
+        self.redis = FakePresenceRedis()
+        patcher = mock.patch('api.presence.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def present(self, user_id, foreground=True, ttl=PRESENCE_TTL):
+        self.redis.set(presence_key(user_id), json.dumps({'foreground': foreground}), ex=ttl)
+
+    def test_many_users_in_one_round_trip(self):
+        for n in range(50):
+            self.present(f'user-{n}', foreground=n % 2 == 0)
+        self.redis.round_trips = 0
+
+        # Duplicates are asked for once
+        status = foreground_status([f'user-{n}' for n in range(50)] + ['user-0'])
+        self.assertEqual(self.redis.round_trips, 1)
+        self.assertEqual(len(status), 50)
+        self.assertEqual([n for n in range(50) if status[f'user-{n}']], list(range(0, 50, 2)))
+
+        self.assertEqual(foreground_status([]), {})
+        self.assertEqual(self.redis.round_trips, 1)
+
+    def test_missing_expired_and_garbled_keys_are_background(self):
+        self.present('fresh')
+        self.present('stale', ttl=60)
+        self.redis.set(presence_key('garbled'), 'not json')
+        self.redis.set(presence_key('listless'), json.dumps(['foreground']))
+        self.redis.clock = 120
+
+        self.assertEqual(foreground_status(['fresh', 'stale', 'missing', 'garbled', 'listless']), {
+            'fresh': True, 'stale': False, 'missing': False, 'garbled': False, 'listless': False,
+        })
+        self.assertTrue(is_user_in_foreground('fresh'))
+
+    def test_async_client_pool_follows_the_event_loop(self):
+        async def pools():
+            return get_async_redis().connection_pool, get_async_redis().connection_pool
+
+        first, again = asyncio.run(pools())
+        self.assertIs(first, again)
+        # A later loop (another async_to_sync call, another test) gets its own pool
+        self.assertIsNot(asyncio.run(pools())[0], first)
+
+
+class FakeChannelLayer:
+    """Records group_send calls, each taking `latency` seconds; fails for groups listed in `down`"""
+
+    def __init__(self, down=(), latency=0):
+        self.down = set(down)
+        self.latency = latency
+        self.sent = []
+        self.in_flight = self.peak = 0
+
+    async def group_send(self, group, message):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if group in self.down:
+                raise ConnectionError('Redis unreachable')
+            self.sent.append((group, message))
+        finally:
+            self.in_flight -= 1
+
+
+class InAppDispatcherTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            firstname='InApp', lastname='Test', email='inapp@planma.test', username='inapp', password='pass1234'
+        )
+        self.now = timezone.make_aware(datetime.combine(timezone.localdate(), time(10)))
+        semester = CustomSemester.objects.create(
+            acad_year_start=2025, acad_year_end=2026, year_level='1st Year', semester='1st Semester',
+            sem_start_date=self.now.date(), sem_end_date=self.now.date() + timedelta(weeks=18), student_id=self.user
+        )
+        subject = CustomSubject.objects.create(
+            subject_code='CS1', subject_title='Subject', student_id=self.user, semester_id=semester
+        )
+        self.task = CustomTask.objects.create(
+            task_name='Essay', scheduled_date=self.now.date(), scheduled_start_time=time(10),
+            scheduled_end_time=time(11), deadline=self.now + timedelta(minutes=15), status='Pending',
+            subject_id=subject, student_id=self.user
+        )
+        self.activity = CustomActivity.objects.create(
+            activity_name='Run', scheduled_date=self.now.date(), scheduled_start_time=time(10, 20),
+            scheduled_end_time=time(11), status='Pending', student_id=self.user
+        )
+
+    def test_one_group_message_per_student_per_tick(self):
+        tick = ReminderTick([
+            ('Task', self.task.task_id, self.user.student_id),
+            ('Activity', self.activity.activity_id, self.user.student_id),
+        ], now=self.now)
+        tick.foreground = {self.user.student_id: True}
+        layer = FakeChannelLayer()
+        inapp = InAppDispatcher(channel_layer=layer)
+
+        send_task_reminders(tick, inapp)
+        send_activity_reminders(tick, inapp)
+        self.assertEqual(len(inapp), 2)
+        self.assertEqual(inapp.flush(), 1)
+
+        (group, message), = layer.sent
+        self.assertEqual(group, f'user_{self.user.student_id}')
+        self.assertEqual(message['type'], 'reminder_batch')
+        self.assertEqual([reminder['reminder_type'] for reminder in message['reminders']], ['task', 'activity'])
+        self.assertEqual(message['reminders'][0]['reminder']['id'], self.task.task_id)
+        self.assertTrue(tick.was_sent('Task', self.task.task_id))
+
+    def test_failed_send_does_not_raise(self):
+        other = CustomUser.objects.create_user(
+            firstname='Other', lastname='Test', email='other@planma.test', username='other', password='pass1234'
+        )
+        layer = FakeChannelLayer(down={f'user_{self.user.student_id}'})
+        inapp = InAppDispatcher(channel_layer=layer)
+        inapp.add(self.user.student_id, 'wake', 'Good morning!', key=('Wake', 1))
+        inapp.add(other.student_id, 'wake', 'Good morning!', key=('Wake', 2))
+
+        self.assertEqual(inapp.flush(), 1)
+        self.assertEqual(len(inapp), 0)
+        self.assertEqual(layer.sent[0][0], f'user_{other.student_id}')
+        # Reported back so the tick can fall back to push
+        self.assertEqual(inapp.failed, {str(self.user.student_id): [('Wake', 1)]})
+
+    def test_flush_sends_concurrently(self):
+        # 1000 students at 5 ms per group_send: ~5 s one at a time
+        layer = FakeChannelLayer(latency=0.005)
+        inapp = InAppDispatcher(channel_layer=layer, concurrency=100)
+        for n in range(1000):
+            inapp.add(f'student-{n}', 'wake', 'Good morning!')
+
+        started = timezone.now()
+        self.assertEqual(inapp.flush(), 1000)
+        elapsed = (timezone.now() - started).total_seconds()
+        self.assertEqual(layer.peak, 100)
+        self.assertLess(elapsed, 1)
+
+
+class ReminderScheduleTests(TestCase):
+    """Signals keep one ReminderSchedule row per planner row; ticks pop and re-queue them"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            firstname='Remind', lastname='Test', email='remind@planma.test', username='remind', password='pass1234'
+        )
+        self.pref = UserPref.objects.create(student_id=self.user, reminder_offset_time=timedelta(minutes=30))
+        semester = CustomSemester.objects.create(
+            acad_year_start=2029, acad_year_end=2030, year_level='1st Year', semester='2nd Semester',
+            sem_start_date=date(2029, 12, 1), sem_end_date=date(2030, 5, 1), student_id=self.user
+        )
+        self.semester = semester
+        self.subject = CustomSubject.objects.create(
+            subject_code='CS1', subject_title='Subject', student_id=self.user, semester_id=semester
+        )
+        # A Monday morning, well inside the semester
+        self.now = timezone.make_aware(datetime(2030, 1, 7, 8, 45))
+
+    def entry(self, category_type, reference_id):
+        return ReminderSchedule.objects.filter(category_type=category_type, reference_id=reference_id).first()
+
+    def make_due(self, *entries, remind_at=None):
+        """Make only these (category_type, reference_id) entries due at self.now"""
+        ReminderSchedule.objects.update(remind_at=self.now + timedelta(days=1))
+        for category_type, reference_id in entries:
+            ReminderSchedule.objects.filter(category_type=category_type, reference_id=reference_id).update(
+                remind_at=remind_at or self.now - timedelta(minutes=1)
+            )
+
+    def tick(self, now):
+        tick = ReminderTick(pop_due_reminders(now), now=now)
+        with mock.patch('api.reminders.foreground_status', return_value={}):
+            send_tick_reminders(tick)
+        return tick
+
+    def test_task_save_and_delete_maintain_the_entry(self):
+        day = timezone.localdate() + timedelta(days=2)
+        deadline = timezone.make_aware(datetime.combine(day, time(17)))
+        task = CustomTask.objects.create(
+            task_name='Essay', scheduled_date=day, scheduled_start_time=time(9), scheduled_end_time=time(10),
+            deadline=deadline, status='Pending', subject_id=self.subject, student_id=self.user
+        )
+        self.assertEqual(self.entry('Task', task.task_id).remind_at, deadline - timedelta(minutes=30))
+
+        # Moving the deadline moves the entry
+        task.deadline = deadline + timedelta(hours=1)
+        task.save()
+        self.assertEqual(self.entry('Task', task.task_id).remind_at, deadline + timedelta(minutes=30))
+        self.assertEqual(ReminderSchedule.objects.filter(category_type='Task').count(), 1)
+
+        # Finished tasks have nothing left to remind about
+        task.status = 'Completed'
+        task.save()
+        self.assertIsNone(self.entry('Task', task.task_id))
+
+        task.status = 'Pending'
+        task.save()
+        self.assertIsNotNone(self.entry('Task', task.task_id))
+        task.delete()
+        self.assertIsNone(self.entry('Task', task.task_id))
+
+    def test_pop_removes_only_due_entries(self):
+        events = [
+            CustomEvents.objects.create(
+                event_name=f'Event {n}', location='Hall', scheduled_date=timezone.localdate() + timedelta(days=3),
+                scheduled_start_time=time(13), scheduled_end_time=time(14), event_type='Academic',
+                student_id=self.user
+            ) for n in range(2)
+        ]
+        self.make_due(('Event', events[0].event_id))
+        self.assertEqual(ReminderSchedule.objects.filter(category_type='Event').count(), 2)
+
+        self.assertEqual(pop_due_reminders(self.now), [('Event', events[0].event_id, self.user.student_id)])
+        self.assertIsNone(self.entry('Event', events[0].event_id))
+        self.assertIsNotNone(self.entry('Event', events[1].event_id))
+        self.assertEqual(pop_due_reminders(self.now), [])
+
+    def test_tick_requeues_recurring_reminders(self):
+        class_schedule = CustomClassSchedule.objects.create(
+            subject=self.subject, day_of_week='Monday', scheduled_start_time=time(9), scheduled_end_time=time(10),
+            room='R1', student_id=self.user
+        )
+        self.make_due(('Class', class_schedule.classsched_id), ('Sleep', self.pref.pref_id),
+                      ('Wake', self.pref.pref_id))
+
+        self.assertEqual(len(self.tick(self.now)), 3)
+
+        # Reminded by push at 08:45; next Monday's class is queued next
+        class_schedule.refresh_from_db()
+        self.assertEqual(class_schedule.last_reminder_date, self.now.date())
+        self.assertEqual(self.entry('Class', class_schedule.classsched_id).remind_at,
+                         timezone.make_aware(datetime(2030, 1, 14, 8, 30)))
+        # Not due yet: tonight's sleep reminder and tomorrow's wake-up
+        self.assertEqual(self.entry('Sleep', self.pref.pref_id).remind_at,
+                         timezone.make_aware(datetime(2030, 1, 7, 22, 30)))
+        self.assertEqual(self.entry('Wake', self.pref.pref_id).remind_at,
+                         timezone.make_aware(datetime(2030, 1, 8, 6, 55)))
+
+    def test_sent_markers_touch_updated_at_and_versions(self):
+        class_schedule = CustomClassSchedule.objects.create(
+            subject=self.subject, day_of_week='Monday', scheduled_start_time=time(9), scheduled_end_time=time(10),
+            room='R1', student_id=self.user
+        )
+        self.make_due(('Class', class_schedule.classsched_id))
+        before = collection_versions(self.user.student_id, ['class-schedules'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tick(self.now)
+
+        # The sync feed and the ETags see the reminder-sent writes
+        updated_at = class_schedule.updated_at
+        class_schedule.refresh_from_db()
+        self.assertEqual(class_schedule.last_reminder_date, self.now.date())
+        self.assertGreater(class_schedule.updated_at, updated_at)
+        after = collection_versions(self.user.student_id, ['class-schedules'])
+        self.assertNotEqual(after['class-schedules'], before['class-schedules'])
+
+    def test_wake_up_is_not_resent_by_a_retry(self):
+        FCMToken.objects.create(user=self.user, token='token-wake')
+        wake_window = timezone.make_aware(datetime(2030, 1, 7, 6, 57))
+        self.make_due(('Wake', self.pref.pref_id), remind_at=wake_window - timedelta(minutes=2))
+        entries = pop_due_reminders(wake_window)
+        client = FakeFCMClient()
+
+        with mock.patch('api.push.messaging.send_each', side_effect=client.send_each):
+            with mock.patch('api.reminders.foreground_status', return_value={}):
+                send_tick_reminders(ReminderTick(entries, now=wake_window))
+                # What a retried shard does with the same popped entries
+                send_tick_reminders(ReminderTick(entries, now=wake_window))
+
+        self.assertEqual(len(client.batches), 1)
+        self.pref.refresh_from_db()
+        self.assertEqual(self.pref.last_wake_reminder_date, date(2030, 1, 7))
+        self.assertEqual(self.entry('Wake', self.pref.pref_id).remind_at,
+                         timezone.make_aware(datetime(2030, 1, 8, 6, 55)))
+
+    def test_goal_without_sessions_waits_for_the_next_day(self):
+        goal = Goals.objects.create(
+            goal_name='Read', target_hours=1, timeframe='Daily', goal_type='Personal',
+            student_id=self.user, semester_id=self.semester
+        )
+        self.make_due(('Goal', goal.goal_id), remind_at=timezone.make_aware(datetime(2030, 1, 7)))
+
+        self.assertEqual(len(self.tick(self.now)), 1)
+        self.assertEqual(self.entry('Goal', goal.goal_id).remind_at, timezone.make_aware(datetime(2030, 1, 8)))
+        # Nothing is popped again for the rest of the day
+        self.assertEqual(len(self.tick(self.now + timedelta(minutes=1))), 0)
+
+    def test_migration_backfills_existing_rows(self):
+        backfill_reminders = import_module('api.migrations.0050_reminderschedule').backfill_reminders
+        day = timezone.localdate() + timedelta(days=2)
+        task = CustomTask.objects.create(
+            task_name='Essay', scheduled_date=day, scheduled_start_time=time(9), scheduled_end_time=time(10),
+            deadline=timezone.make_aware(datetime.combine(day, time(17))), status='Pending',
+            subject_id=self.subject, student_id=self.user
+        )
+        expected = set(ReminderSchedule.objects.values_list('category_type', 'reference_id', 'remind_at'))
+        ReminderSchedule.objects.all().delete()
+
+        # Historical models, as `migrate` runs it
+        backfill_reminders(MigrationLoader(connection).project_state(('api', '0050_reminderschedule')).apps, None)
+        self.assertEqual(set(ReminderSchedule.objects.values_list('category_type', 'reference_id', 'remind_at')),
+                         expected)
+        self.assertIsNotNone(self.entry('Task', task.task_id))
+
+    def test_rebuild_upserts_and_drops_only_stale_entries(self):
+        day = timezone.localdate() + timedelta(days=2)
+        deadline = timezone.make_aware(datetime.combine(day, time(17)))
+        task = CustomTask.objects.create(
+            task_name='Essay', scheduled_date=day, scheduled_start_time=time(9), scheduled_end_time=time(10),
+            deadline=deadline, status='Pending', subject_id=self.subject, student_id=self.user
+        )
+        entry_id = self.entry('Task', task.task_id).reminder_id
+        ReminderSchedule.objects.filter(reminder_id=entry_id).update(remind_at=deadline)
+        # A row deleted without its signal, and an entry left behind by a finished task
+        ReminderSchedule.objects.create(category_type='Task', reference_id=task.task_id + 100,
+                                        student_id=self.user, remind_at=deadline)
+        done = CustomTask.objects.create(
+            task_name='Done', scheduled_date=day, scheduled_start_time=time(11), scheduled_end_time=time(12),
+            deadline=deadline, status='Pending', subject_id=self.subject, student_id=self.user
+        )
+        CustomTask.objects.filter(pk=done.pk).update(status='Completed')
+
+        rebuild_reminder_schedule()
+
+        # The live entry is updated in place, not deleted and recreated
+        entry = self.entry('Task', task.task_id)
+        self.assertEqual(entry.reminder_id, entry_id)
+        self.assertEqual(entry.remind_at, deadline - timedelta(minutes=30))
+        self.assertIsNone(self.entry('Task', task.task_id + 100))
+        self.assertIsNone(self.entry('Task', done.task_id))
+        self.assertIsNotNone(self.entry('Sleep', self.pref.pref_id))
+
+    def test_goal_session_added_today_makes_the_goal_due(self):
+        goal = Goals.objects.create(
+            goal_name='Read', target_hours=1, timeframe='Daily', goal_type='Personal',
+            student_id=self.user, semester_id=self.semester
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            GoalSchedule.objects.create(
+                goal_id=goal, scheduled_date=timezone.localdate(), scheduled_start_time=time(19),
+                scheduled_end_time=time(20)
+            )
+        self.assertLessEqual(self.entry('Goal', goal.goal_id).remind_at, timezone.now())
+
+
+class ReminderShardTests(TestCase):
+    """send_all_reminders fans the due reminders out to per-shard tasks"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        starts = timezone.localtime(self.now + timedelta(minutes=10)).replace(microsecond=0)
+        self.users = [
+            CustomUser.objects.create_user(
+                firstname='Shard', lastname=str(n), email=f'shard{n}@planma.test', username=f'shard{n}',
+                password='pass1234'
+            ) for n in range(6)
+        ]
+        self.events = [
+            CustomEvents.objects.create(
+                event_name=f'Event {n}', location='Hall', scheduled_date=starts.date(),
+                scheduled_start_time=starts.time(), scheduled_end_time=starts.time(), event_type='Academic',
+                student_id=user
+            ) for n, user in enumerate(self.users)
+        ]
+        # Due now, whatever the signals scheduled them for
+        ReminderSchedule.objects.update(remind_at=self.now - timedelta(minutes=1))
+
+    def test_partition_keeps_each_student_in_one_shard(self):
+        entries = [('Event', n, user.student_id) for n, user in enumerate(self.users * 3)]
+        shards = partition_reminders(entries, 4)
+        self.assertEqual(sum(len(shard) for shard in shards.values()), len(entries))
+        for user in self.users:
+            self.assertEqual(len({shard for shard, shard_entries in shards.items()
+                                  for entry in shard_entries if entry[2] == user.student_id}), 1)
+            # Every process agrees on the shard
+            self.assertEqual(reminder_shard(user.student_id, 4), reminder_shard(str(user.student_id), 4))
+
+    @override_settings(REMINDER_SHARDS=3)
+    def test_coordinator_runs_one_task_per_shard(self):
+        expected = len({reminder_shard(user.student_id, 3) for user in self.users})
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+        with mock.patch('api.reminders.foreground_status', return_value={}), \
+                mock.patch.object(send_reminder_shard, 'run', wraps=send_reminder_shard.run) as shard_task:
+            self.assertEqual(send_all_reminders(), expected)
+
+        self.assertEqual(shard_task.call_count, expected)
+        self.assertEqual(sum(len(call.args[1]) for call in shard_task.call_args_list), 6)
+        self.assertFalse(ReminderSchedule.objects.exists())
+        # Backgrounded students get the push path, which marks the events as reminded
+        self.assertEqual(CustomEvents.objects.filter(reminder_sent=True).count(), 6)
+
+
+    def eager(self):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+
+    def due_entries(self):
+        return set(ReminderSchedule.objects.filter(remind_at__lte=timezone.now()).values_list(
+            'category_type', 'reference_id'
+        ))
+
+    def test_failed_publish_puts_the_reminders_back(self):
+        due = self.due_entries()
+        with mock.patch('api.tasks.group') as shard_group:
+            shard_group.return_value.apply_async.side_effect = ConnectionError('broker down')
+            with self.assertRaises(ConnectionError):
+                send_all_reminders()
+        self.assertEqual(self.due_entries(), due)
+
+    def test_failing_shard_retries_then_puts_the_reminders_back(self):
+        self.eager()
+        entries = [['Event', event.event_id, str(event.student_id_id)] for event in self.events]
+        pop_due_reminders(self.now)
+        with mock.patch('api.tasks.send_tick_reminders', side_effect=RuntimeError('channel layer down')) as send:
+            result = send_reminder_shard.apply(args=(0, entries, self.now.isoformat()), throw=False)
+
+        self.assertIsInstance(result.result, RuntimeError)
+        self.assertEqual(send.call_count, send_reminder_shard.max_retries + 1)
+        self.assertEqual(self.due_entries(), {('Event', event.event_id) for event in self.events})
+        self.assertTrue(send_reminder_shard.acks_late)
+
+    def test_shard_that_recovers_on_retry_keeps_nothing_back(self):
+        self.eager()
+        entries = [['Event', event.event_id, str(event.student_id_id)] for event in self.events]
+        pop_due_reminders(self.now)
+        with mock.patch('api.reminders.foreground_status', return_value={}), \
+                mock.patch('api.tasks.send_event_push_reminders',
+                           side_effect=[RuntimeError('FCM down'), None]) as push_pass:
+            result = send_reminder_shard.apply(args=(0, entries, self.now.isoformat()), throw=False)
+
+        self.assertTrue(result.successful())
+        self.assertEqual(push_pass.call_count, 2)
+        self.assertFalse(ReminderSchedule.objects.exists())
+
+
+    def deliver(self, layer, fcm):
+        """Run one shard eagerly with every student in the foreground"""
+        self.eager()
+        for n, user in enumerate(self.users):
+            FCMToken.objects.create(user=user, token=f'token-{n}')
+        entries = [['Event', event.event_id, str(event.student_id_id)] for event in self.events]
+        pop_due_reminders(self.now)
+        with mock.patch('api.reminders.foreground_status',
+                        return_value={user.student_id: True for user in self.users}), \
+                mock.patch('api.inapp.get_channel_layer', return_value=layer), \
+                mock.patch('api.push.messaging.send_each', side_effect=fcm.send_each) as send_each:
+            result = send_reminder_shard.apply(args=(0, entries, self.now.isoformat()), throw=False)
+        return result, send_each
+
+    def test_failed_inapp_send_falls_back_to_push(self):
+        layer = FakeChannelLayer(down={f'user_{user.student_id}' for user in self.users[:2]})
+        result, send_each = self.deliver(layer, FakeFCMClient())
+
+        self.assertTrue(result.successful())
+        self.assertEqual(len(layer.sent), 4)
+        # The two students the channel layer failed for got a push instead
+        self.assertEqual(sorted(message.token for message in send_each.call_args.args[0]), ['token-0', 'token-1'])
+        self.assertEqual(CustomEvents.objects.filter(reminder_sent=True).count(), 6)
+
+    def test_undelivered_reminders_are_not_marked_sent(self):
+        class DownClient:
+            def send_each(self, messages):
+                raise ConnectionError('FCM unreachable')
+
+        layer = FakeChannelLayer(down={f'user_{user.student_id}' for user in self.users})
+        result, send_each = self.deliver(layer, DownClient())
+
+        self.assertIsInstance(result.result, RuntimeError)
+        self.assertEqual(send_each.call_count, send_reminder_shard.max_retries + 1)
+        self.assertFalse(CustomEvents.objects.filter(reminder_sent=True).exists())
+        self.assertEqual(self.due_entries(), {('Event', event.event_id) for event in self.events})
+
+
+class QueryPlanTests(TestCase):
+    """The hot per-student and reminder queries must stay on their indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        start = date(2025, 1, 6)
+        for index in range(4):
+            user = CustomUser.objects.create_user(
+                firstname='Plan', lastname=str(index), email=f'plan{index}@planma.test',
+                username=f'plan{index}', password='pass1234'
+            )
+            semester = CustomSemester.objects.create(
+                acad_year_start=2024, acad_year_end=2025, year_level='1st Year', semester='2nd Semester',
+                sem_start_date=start, sem_end_date=start + timedelta(weeks=18), student_id=user
+            )
+            subject = CustomSubject.objects.create(
+                subject_code=f'CS{index}', subject_title='Algorithms', student_id=user, semester_id=semester
+            )
+            goal = Goals.objects.create(
+                goal_name='Study', target_hours=10, timeframe='Weekly', goal_type='Academic',
+                student_id=user, semester_id=semester
+            )
+            days = [start + timedelta(days=day) for day in range(60)]
+            CustomTask.objects.bulk_create([
+                CustomTask(
+                    task_name=f'Task {day}', scheduled_date=day, scheduled_start_time=time(9),
+                    scheduled_end_time=time(10), deadline=timezone.make_aware(datetime.combine(day, time(17))),
+                    status='Completed' if day.day % 3 else 'Pending', reminder_sent=day.day % 2 == 0,
+                    subject_id=subject, student_id=user
+                ) for day in days
+            ])
+            CustomEvents.objects.bulk_create([
+                CustomEvents(
+                    event_name=f'Event {day}', location='Gym', scheduled_date=day, scheduled_start_time=time(13),
+                    scheduled_end_time=time(14), event_type='Academic', reminder_sent=day.day % 2 == 0,
+                    student_id=user
+                ) for day in days
+            ])
+            CustomActivity.objects.bulk_create([
+                CustomActivity(
+                    activity_name=f'Activity {day}', scheduled_date=day, scheduled_start_time=time(15),
+                    scheduled_end_time=time(16), status='Completed' if day.day % 3 else 'Pending',
+                    reminder_sent=day.day % 2 == 0, student_id=user
+                ) for day in days
+            ])
+            GoalSchedule.objects.bulk_create([
+                GoalSchedule(
+                    goal_id=goal, scheduled_date=day, scheduled_start_time=time(19),
+                    scheduled_end_time=time(20), status='Completed' if day.day % 3 else 'Pending'
+                ) for day in days
+            ])
+            ScheduleEntry.objects.bulk_create([
+                ScheduleEntry(
+                    category_type='Task', reference_id=task.task_id, task_id=task, student_id=user,
+                    scheduled_date=task.scheduled_date, scheduled_start_time=task.scheduled_start_time,
+                    scheduled_end_time=task.scheduled_end_time
+                ) for task in CustomTask.objects.filter(student_id=user)
+            ])
+        cls.user = user
+        cls.now = timezone.make_aware(datetime.combine(start + timedelta(days=30), time(8)))
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, queryset, index_name):
+        if connection.vendor == 'postgresql':
+            # A seeded test table is small enough to scan; ask for the plan used at scale
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_reminder_scans_use_partial_indexes(self):
+        self.assertUsesIndex(CustomTask.objects.due_reminders(self.now), 'task_reminder_due_idx')
+        self.assertUsesIndex(CustomEvents.objects.due_reminders(self.now), 'event_reminder_due_idx')
+        self.assertUsesIndex(CustomActivity.objects.due_reminders(self.now), 'activity_reminder_due_idx')
+
+    def test_per_student_status_lookups(self):
+        self.assertUsesIndex(
+            CustomTask.objects.filter(student_id=self.user, status='Pending'), 'task_student_status_idx'
+        )
+        self.assertUsesIndex(
+            CustomActivity.objects.filter(student_id=self.user, status='Pending'), 'activity_student_status_idx'
+        )
+        self.assertUsesIndex(
+            GoalSchedule.objects.filter(goal_id__student_id=self.user, status='Pending'), 'goalsched_goal_status_idx'
+        )
+
+    def test_per_student_date_ranges(self):
+        date_range = [date(2025, 2, 1), date(2025, 2, 7)]
+        self.assertUsesIndex(
+            CustomTask.objects.filter(student_id=self.user, scheduled_date__range=date_range), 'task_student_date_idx'
+        )
+        self.assertUsesIndex(
+            CustomEvents.objects.filter(student_id=self.user, scheduled_date__gte=date_range[0]), 'event_student_date_idx'
+        )
+        self.assertUsesIndex(
+            CustomActivity.objects.filter(student_id=self.user, scheduled_date__range=date_range),
+            'activity_student_date_idx'
+        )
+
+    def test_schedule_entry_lookup_by_item(self):
+        task = CustomTask.objects.filter(student_id=self.user).first()
+        self.assertUsesIndex(
+            ScheduleEntry.objects.filter(category_type='Task', reference_id=task.task_id), 'entry_category_ref_idx'
+        )
+
+
+class ScheduleEntryLinkTests(TestCase):
+    """Entries are joined to their items and go away with them"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            firstname='Link', lastname='Test', email='link@planma.test', username='link', password='pass1234'
+        )
+        semester = CustomSemester.objects.create(
+            acad_year_start=2024, acad_year_end=2025, year_level='1st Year', semester='2nd Semester',
+            sem_start_date=date(2025, 1, 6), sem_end_date=date(2025, 5, 9), student_id=self.user
+        )
+        subject = CustomSubject.objects.create(
+            subject_code='CS101', subject_title='Programming', student_id=self.user, semester_id=semester
+        )
+        self.tasks = [
+            CustomTask.objects.create(
+                task_name=f'Task {index}', scheduled_date=date(2025, 2, index), scheduled_start_time=time(9),
+                scheduled_end_time=time(10), deadline=timezone.make_aware(datetime(2025, 2, index, 17)),
+                subject_id=subject, student_id=self.user
+            ) for index in range(1, 4)
+        ]
+        self.event = CustomEvents.objects.create(
+            event_name='Fair', location='Gym', scheduled_date=date(2025, 2, 4), scheduled_start_time=time(13),
+            scheduled_end_time=time(14), event_type='Academic', student_id=self.user
+        )
+        for category_type, item in [('Task', task) for task in self.tasks] + [('Event', self.event)]:
+            ScheduleEntry.objects.create(
+                category_type=category_type, reference_id=item.pk, student_id=self.user,
+                scheduled_date=item.scheduled_date, scheduled_start_time=item.scheduled_start_time,
+                scheduled_end_time=item.scheduled_end_time
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_save_sets_typed_link(self):
+        entry = ScheduleEntry.objects.get(category_type='Event')
+        self.assertEqual(entry.event_id_id, self.event.event_id)
+        self.assertIsNone(entry.task_id_id)
+
+    def test_bulk_filter_reads_items_in_one_query(self):
+        filters = [{'category_type': 'Task', 'reference_id': task.task_id} for task in self.tasks]
+        filters.append({'category_type': 'Event', 'reference_id': self.event.event_id})
+
+        # Entries joined with their items; one more for the exceptions prefetch
+        with self.assertNumQueries(2):
+            response = self.client.post('/api/schedule/bulk_filter/', {'filters': filters}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [item['related_info']['name'] for item in response.data],
+            ['Task 1', 'Task 2', 'Task 3', 'Fair']
+        )
+        self.assertEqual(response.data[0]['related_info']['status'], 'Pending')
+        self.assertTrue(all(len(item['entries']) == 1 for item in response.data))
+
+    def test_deleting_items_cascades_to_entries(self):
+        self.event.delete()
+        CustomTask.objects.filter(pk__in=[task.pk for task in self.tasks[:2]]).delete()
+        self.assertEqual(
+            list(ScheduleEntry.objects.values_list('category_type', 'reference_id')),
+            [('Task', self.tasks[2].task_id)]
+        )
+
+
+
+class ScheduleRecurrenceTests(TestCase):
+    """Weekly entries: expansion, skipped dates and the per-week migration"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            firstname='Weekly', lastname='Test', email='weekly@planma.test', username='weekly', password='pass1234'
+        )
+        semester = CustomSemester.objects.create(
+            acad_year_start=2024, acad_year_end=2025, year_level='1st Year', semester='2nd Semester',
+            sem_start_date=date(2025, 1, 6), sem_end_date=date(2025, 2, 3), student_id=self.user
+        )
+        subject = CustomSubject.objects.create(
+            subject_code='CS101', subject_title='Programming', student_id=self.user, semester_id=semester
+        )
+        self.class_schedule = CustomClassSchedule.objects.create(
+            subject=subject, day_of_week='Monday', scheduled_start_time=time(9), scheduled_end_time=time(10),
+            room='R1', student_id=self.user
+        )
+        # Mondays Jan 6 - Feb 3, 2025, without Jan 20
+        self.entry = ScheduleEntry.objects.create(
+            category_type='Class', reference_id=self.class_schedule.classsched_id, student_id=self.user,
+            scheduled_date=date(2025, 1, 6), scheduled_start_time=time(9), scheduled_end_time=time(10),
+            recurrence='Weekly', recurrence_end=date(2025, 2, 3)
+        )
+        ScheduleEntryException.objects.create(entry=self.entry, exception_date=date(2025, 1, 20))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_weekly_dates(self):
+        self.assertEqual(weekly_dates(date(2025, 1, 6), date(2025, 1, 31), WEEKDAYS['Wednesday']),
+                         [date(2025, 1, 8), date(2025, 1, 15), date(2025, 1, 22), date(2025, 1, 29)])
+        self.assertEqual(weekly_dates(date(2025, 1, 6), date(2025, 1, 31), WEEKDAYS['Monday'])[-1], date(2025, 1, 27))
+        self.assertEqual(weekly_dates(date(2025, 1, 7), date(2025, 1, 12), WEEKDAYS['Monday']), [])
+
+    def test_occurrences_leave_out_skipped_dates(self):
+        self.assertEqual(self.entry.occurrences(),
+                         [date(2025, 1, 6), date(2025, 1, 13), date(2025, 1, 27), date(2025, 2, 3)])
+        # A window starting mid-week jumps to the next Monday; Jan 20 is skipped
+        self.assertEqual(self.entry.occurrences(date(2025, 1, 14), date(2025, 1, 28)), [date(2025, 1, 27)])
+        self.assertEqual(self.entry.occurrences(date(2025, 2, 4), date(2025, 2, 28)), [])
+
+    def test_on_date_matches_the_weekday_only(self):
+        entries = ScheduleEntry.objects.filter(student_id=self.user)
+        self.assertEqual(list(entries.on_date(date(2025, 1, 13))), [self.entry])
+        self.assertFalse(entries.on_date(date(2025, 1, 14)).exists())
+        self.assertFalse(entries.on_date(date(2025, 1, 20)).exists())
+        self.assertFalse(entries.on_date(date(2025, 2, 10)).exists())
+        self.assertEqual(list(entries.between(date(2025, 1, 28), date(2025, 2, 9))), [self.entry])
+        self.assertFalse(entries.between(date(2025, 2, 4), date(2025, 2, 9)).exists())
+
+    def test_occurrences_are_marked_and_deleted_one_by_one(self):
+        url = f'/api/schedule/{self.entry.entry_id}/'
+        response = self.client.get('/api/schedule/', {'start': '2025-01-06', 'end': '2025-01-19'})
+        series = str(self.entry.entry_id)
+        self.assertEqual([(row['entry_id'], row['occurrence_date'], row['is_recurring']) for row in response.data],
+                         [(series, '2025-01-06', True), (series, '2025-01-13', True)])
+
+        # Deleting one date skips it; the series stays
+        self.assertEqual(self.client.delete(f'{url}?date=2025-01-13').status_code, 200)
+        self.assertEqual(self.entry.occurrences(date(2025, 1, 6), date(2025, 1, 19)), [date(2025, 1, 6)])
+        self.assertEqual(self.client.patch(f'{url}?date=2025-01-27', {'room': 'R2'}, format='json').status_code, 400)
+
+        response = self.client.post(f'{url}skip_date/', {'date': '2025-01-27'}, format='json')
+        self.assertEqual(response.data, {'skipped': '2025-01-27'})
+        self.assertEqual(self.client.post(f'{url}skip_date/', {'date': '2025-01-28'}, format='json').status_code, 400)
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.occurrences(), [date(2025, 1, 6), date(2025, 2, 3)])
+
+        # Without a date nothing is deleted unless the series is asked for
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertTrue(ScheduleEntry.objects.filter(pk=self.entry.pk).exists())
+        self.assertEqual(self.client.delete(f'{url}?series=1').status_code, 204)
+        self.assertFalse(ScheduleEntry.objects.exists())
+
+    def test_migration_collapses_and_expands_per_week_rows(self):
+        migration = import_module('api.migrations.0051_scheduleentry_recurrence_and_more')
+        ScheduleEntry.objects.all().delete()
+        weeks = [date(2025, 1, 6), date(2025, 1, 13), date(2025, 1, 27), date(2025, 2, 3)]
+        for day in weeks:
+            ScheduleEntry.objects.create(
+                category_type='Class', reference_id=self.class_schedule.classsched_id, student_id=self.user,
+                scheduled_date=day, scheduled_start_time=time(9), scheduled_end_time=time(10)
+            )
+
+        migration.collapse_weekly_class_entries(django_apps, None)
+        entry = ScheduleEntry.objects.get()
+        self.assertEqual((entry.scheduled_date, entry.recurrence, entry.recurrence_end),
+                         (date(2025, 1, 6), 'Weekly', date(2025, 2, 3)))
+        self.assertEqual(list(entry.exceptions.values_list('exception_date', flat=True)), [date(2025, 1, 20)])
+        self.assertEqual(entry.occurrences(), weeks)
+
+        migration.expand_weekly_class_entries(django_apps, None)
+        self.assertEqual(sorted(ScheduleEntry.objects.values_list('scheduled_date', flat=True)), weeks)
+
+
+
+class ScheduleConflictTests(TestCase):
+    """find_conflicts / overlaps_within: the overlap checks every create and batch uses"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            firstname='Clash', lastname='Test', email='clash@planma.test', username='clash', password='pass1234'
+        )
+        self.semester = CustomSemester.objects.create(
+            acad_year_start=2024, acad_year_end=2025, year_level='1st Year', semester='2nd Semester',
+            sem_start_date=date(2025, 1, 6), sem_end_date=date(2025, 2, 3), student_id=self.user
+        )
+        subject = CustomSubject.objects.create(
+            subject_code='CS101', subject_title='Programming', student_id=self.user, semester_id=self.semester
+        )
+        class_schedule = CustomClassSchedule.objects.create(
+            subject=subject, day_of_week='Monday', scheduled_start_time=time(9), scheduled_end_time=time(10),
+            room='R1', student_id=self.user
+        )
+        # Mondays 9-10 from Jan 6 to Feb 3, 2025, except Jan 20
+        self.weekly = ScheduleEntry.objects.create(
+            category_type='Class', reference_id=class_schedule.classsched_id, student_id=self.user,
+            scheduled_date=date(2025, 1, 6), scheduled_start_time=time(9), scheduled_end_time=time(10),
+            recurrence='Weekly', recurrence_end=date(2025, 2, 3)
+        )
+        ScheduleEntryException.objects.create(entry=self.weekly, exception_date=date(2025, 1, 20))
+        event = CustomEvents.objects.create(
+            event_name='Fair', location='Gym', scheduled_date=date(2025, 1, 14), scheduled_start_time=time(13),
+            scheduled_end_time=time(14), event_type='Academic', student_id=self.user
+        )
+        self.once = ScheduleEntry.objects.create(
+            category_type='Event', reference_id=event.event_id, student_id=self.user,
+            scheduled_date=date(2025, 1, 14), scheduled_start_time=time(13), scheduled_end_time=time(14)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_find_conflicts(self):
+        slots = [
+            (date(2025, 1, 13), time(9, 30), time(10, 30)),  # a weekly occurrence
+            (date(2025, 1, 20), time(9), time(10)),  # the skipped Monday
+            (date(2025, 1, 13), time(10), time(11)),  # starts as the class ends
+            (date(2025, 1, 13), time(8), time(9)),  # ends as the class starts
+            (date(2025, 1, 14), time(13, 30), time(13, 45)),  # inside the one-off event
+            (date(2025, 1, 14), time(9), time(10)),  # a Tuesday
+            ('2025-01-27', '09:00', '09:30'),  # request data
+        ]
+        with self.assertNumQueries(2):
+            conflicts = find_conflicts(self.user.student_id, slots)
+        self.assertEqual(conflicts, {0: [self.weekly], 4: [self.once], 6: [self.weekly]})
+
+        class_key = ('Class', self.weekly.reference_id)
+        self.assertEqual(set(find_conflicts(self.user.student_id, slots, exclude=class_key)), {4})
+        self.assertEqual(set(find_conflicts(self.user.student_id, slots, ignore={class_key})), {4})
+        self.assertEqual(find_conflicts(self.user.student_id, []), {})
+        with self.assertRaises(ValidationError):
+            find_conflicts(self.user.student_id, [('2025-01-13', 'nine', '10:00')])
+
+    def test_overlaps_within(self):
+        day, other_day = date(2025, 1, 15), date(2025, 1, 16)
+        self.assertEqual(overlaps_within([
+            (day, time(9), time(10)),
+            (day, time(10), time(11)),  # touches 0
+            (day, time(10, 30), time(12)),  # overlaps 1
+            (other_day, time(9), time(10)),  # same times, another day
+            (day, time(8), time(9, 30)),  # overlaps 0
+        ]), {0, 1, 2, 4})
+        # A long slot clashes with everything inside it, even slots that only touch each other
+        self.assertEqual(overlaps_within([
+            (day, time(8), time(12)), (day, time(9), time(10)), (day, time(10), time(11)),
+        ]), {0, 1, 2})
+        self.assertEqual(overlaps_within([]), set())
+
+    def test_batch_goal_schedule_lists_clashing_indexes(self):
+        goal = Goals.objects.create(
+            goal_name='Read', target_hours=5, timeframe='Weekly', goal_type='Personal',
+            student_id=self.user, semester_id=self.semester
+        )
+
+        def session(day, start, end):
+            return {'goal_id': goal.goal_id, 'scheduled_date': day, 'scheduled_start_time': start,
+                    'scheduled_end_time': end}
+
+        response = self.client.post('/api/goal-schedules/add_schedule/', [
+            session('2025-01-13', '09:30', '10:30'),  # the Monday class
+            session('2025-01-15', '18:00', '19:00'),
+            session('2025-01-15', '18:30', '19:30'),  # the session before it
+            session('2025-01-16', '07:00', '08:00'),
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error_type'], 'overlap')
+        self.assertEqual(response.data['conflicts'], [0, 1, 2])
+        self.assertFalse(GoalSchedule.objects.exists())
+
+        response = self.client.post('/api/goal-schedules/add_schedule/', [
+            session('2025-01-13', '10:00', '11:00'), session('2025-01-13', '11:00', '12:00'),
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(GoalSchedule.objects.count(), 2)
+
+
+class ReportDataMixin:
+    """A week of task, event, activity, goal and sleep logs (Feb 3-9, 2025) plus one earlier log"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            firstname='Report', lastname='Test', email='report@planma.test', username='report', password='pass1234'
+        )
+        semester = CustomSemester.objects.create(
+            acad_year_start=2024, acad_year_end=2025, year_level='1st Year', semester='2nd Semester',
+            sem_start_date=date(2025, 1, 6), sem_end_date=date(2025, 5, 9), student_id=self.user
+        )
+        subjects = [
+            CustomSubject.objects.create(
+                subject_code=code, subject_title=code, student_id=self.user, semester_id=semester
+            ) for code in ('CS101', 'MATH1')
+        ]
+        tasks = [
+            CustomTask.objects.create(
+                task_name=f'Task {index}', scheduled_date=date(2025, 2, 3), scheduled_start_time=time(9),
+                scheduled_end_time=time(10), deadline=timezone.make_aware(datetime(2025, 2, 3, 17)),
+                status='Completed' if index == 0 else 'Pending', subject_id=subjects[index], student_id=self.user
+            ) for index in range(2)
+        ]
+        # This week (Feb 3-9) and the week before
+        for task, day, minutes in [
+            (tasks[0], date(2025, 2, 3), 30), (tasks[0], date(2025, 2, 3), 45),
+            (tasks[1], date(2025, 2, 5), 60), (tasks[1], date(2025, 1, 29), 20),
+        ]:
+            TaskTimeLog.objects.create(
+                task_id=task, start_time=time(9), end_time=time(10), duration=timedelta(minutes=minutes),
+                date_logged=day
+            )
+        event = CustomEvents.objects.create(
+            event_name='Fair', location='Gym', scheduled_date=date(2025, 2, 4), scheduled_start_time=time(13),
+            scheduled_end_time=time(14), event_type='Academic', student_id=self.user
+        )
+        AttendedEvents.objects.create(event_id=event, date=date(2025, 2, 4), has_attended=True)
+        activity = CustomActivity.objects.create(
+            activity_name='Run', scheduled_date=date(2025, 2, 6), scheduled_start_time=time(6),
+            scheduled_end_time=time(7), status='Completed', student_id=self.user
+        )
+        ActivityTimeLog.objects.create(
+            activity_id=activity, start_time=time(6), end_time=time(7), duration=timedelta(hours=1),
+            date_logged=date(2025, 2, 6)
+        )
+        goal = Goals.objects.create(
+            goal_name='Study', target_hours=1, timeframe='Daily', goal_type='Academic',
+            student_id=self.user, semester_id=semester
+        )
+        session = GoalSchedule.objects.create(
+            goal_id=goal, scheduled_date=date(2025, 2, 4), scheduled_start_time=time(19), scheduled_end_time=time(21)
+        )
+        for day, minutes in [(date(2025, 2, 4), 90), (date(2025, 2, 5), 30)]:
+            GoalProgress.objects.create(
+                goal_id=goal, goalschedule_id=session, session_date=day, session_start_time=time(19),
+                session_end_time=time(21), session_duration=timedelta(minutes=minutes)
+            )
+        for day in (date(2025, 2, 3), date(2025, 2, 4)):
+            SleepLog.objects.create(
+                student_id=self.user, start_time=time(23), end_time=time(7), duration=timedelta(hours=8),
+                date_logged=day
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class ReportsTests(ReportDataMixin, TestCase):
+    """The reports endpoint aggregates logs in the database"""
+
+    def test_weekly_report(self):
+        response = self.client.get('/api/reports/', {'start': '2025-02-03', 'end': '2025-02-09'})
+        self.assertEqual(response.status_code, 200)
+        report = response.data
+
+        self.assertEqual(report['tasks']['total_minutes'], 135.0)
+        self.assertEqual(report['tasks']['previous'], {'total_minutes': 20.0})
+        self.assertEqual(
+            report['tasks']['time_spent'],
+            [{'period': date(2025, 2, 3), 'minutes': 75.0}, {'period': date(2025, 2, 5), 'minutes': 60.0}]
+        )
+        self.assertEqual(
+            report['tasks']['by_subject'],
+            [{'name': 'CS101', 'minutes': 75.0}, {'name': 'MATH1', 'minutes': 60.0}]
+        )
+        self.assertEqual(report['tasks']['finished_by_subject'], [{'name': 'CS101', 'count': 1}])
+        self.assertEqual(report['events']['attended'], 1)
+        self.assertEqual(report['activities']['done'], [{'period': date(2025, 2, 6), 'count': 1}])
+        self.assertEqual(report['goals']['completion'], [{'name': 'Study', 'completed': 1, 'failed': 1}])
+        self.assertEqual(report['sleep']['average_hours'], 8.0)
+
+    def test_query_count_does_not_grow_with_logs(self):
+        params = {'start': '2025-02-03', 'end': '2025-02-09', 'categories': 'tasks'}
+        with self.assertNumQueries(6):
+            self.client.get('/api/reports/', params)
+
+        task = CustomTask.objects.first()
+        TaskTimeLog.objects.bulk_create([
+            TaskTimeLog(task_id=task, start_time=time(9), end_time=time(10), duration=timedelta(minutes=5),
+                        date_logged=date(2025, 2, 7))
+            for _ in range(50)
+        ])
+        # bulk_create skips the rollup signals; the backfill task picks the rows up
+        rebuild_rollups(self.user.student_id)
+        with self.assertNumQueries(6):
+            response = self.client.get('/api/reports/', params)
+        self.assertEqual(response.data['tasks']['total_minutes'], 385.0)
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get('/api/reports/', {'start': '2025-02-03'}).status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/reports/', {'start': '2025-02-03', 'end': '2025-02-09', 'group_by': 'hour'}).status_code,
+            400
+        )
+
+
+class DailyTimeRollupTests(ReportDataMixin, TestCase):
+    """Rollups follow log writes and match a rebuild from the raw logs"""
+
+    def rollup_rows(self):
+        return sorted(
+            DailyTimeRollup.objects.values_list(
+                'category', 'date', 'task_id', 'activity_id', 'goal_id', 'total_duration', 'log_count'
+            ),
+            key=str
+        )
+
+    def test_logs_are_rolled_up_per_day_and_item(self):
+        task_rows = DailyTimeRollup.objects.filter(category='Task', date=date(2025, 2, 3))
+        self.assertEqual(
+            list(task_rows.values_list('total_duration', 'log_count')), [(timedelta(minutes=75), 2)]
+        )
+
+    def test_edit_and_delete_update_rollups(self):
+        log = TaskTimeLog.objects.get(date_logged=date(2025, 2, 5))
+        log.date_logged = date(2025, 2, 6)
+        log.duration = timedelta(minutes=10)
+        log.save()
+        self.assertFalse(DailyTimeRollup.objects.filter(category='Task', date=date(2025, 2, 5)).exists())
+        self.assertEqual(
+            DailyTimeRollup.objects.get(category='Task', date=date(2025, 2, 6)).total_duration,
+            timedelta(minutes=10)
+        )
+
+        SleepLog.objects.filter(date_logged=date(2025, 2, 3)).get().delete()
+        self.assertFalse(DailyTimeRollup.objects.filter(category='Sleep', date=date(2025, 2, 3)).exists())
+
+    def test_one_row_per_item_and_day(self):
+        row = DailyTimeRollup.objects.get(category='Task', date=date(2025, 2, 3))
+        refresh_rollups([('Task', row.date, row.task_id_id)] * 2)
+        self.assertEqual(DailyTimeRollup.objects.filter(category='Task', date=row.date).count(), 1)
+
+        row.pk = None
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            row.save()
+
+    def test_rebuild_matches_incremental_rollups(self):
+        incremental = self.rollup_rows()
+        self.assertEqual(rebuild_rollups(), len(incremental))
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_log_time_action_updates_report(self):
+        task = CustomTask.objects.get(task_name='Task 1')
+        response = self.client.post('/api/task-logs/log_time/', {
+            'task_id': task.task_id, 'start_time': '08:00', 'end_time': '08:30',
+            'duration': '00:30:00', 'date_logged': '2025-02-07'
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        report = self.client.get('/api/reports/', {'start': '2025-02-03', 'end': '2025-02-09', 'categories': 'tasks'})
+        self.assertEqual(report.data['tasks']['total_minutes'], 165.0)
+
+
+class ExpandTests(ReportDataMixin, TestCase):
+    """?expand= picks nested relations; list queries stay constant-count"""
+
+    def test_default_keeps_nested_shape(self):
+        response = self.client.get('/api/task-logs/')
+        self.assertEqual(response.data[0]['task_id']['subject_id']['semester_id']['semester'], '2nd Semester')
+
+    def test_ids_unless_expanded(self):
+        log = self.client.get('/api/task-logs/', {'expand': ''}).data[0]
+        self.assertIsInstance(log['task_id'], int)
+
+        log = self.client.get('/api/task-logs/', {'expand': 'task_id.subject_id'}).data[0]
+        self.assertEqual(log['task_id']['subject_id']['subject_code'], 'CS101')
+        self.assertIsInstance(log['task_id']['subject_id']['semester_id'], int)
+
+        progress = self.client.get('/api/goal-progress/', {'expand': 'goalschedule_id'}).data[0]
+        self.assertIsInstance(progress['goal_id'], int)
+        self.assertIsInstance(progress['goalschedule_id']['goal_id'], int)
+
+    def test_log_lists_do_not_query_per_row(self):
+        endpoints = ['/api/task-logs/', '/api/activity-logs/', '/api/goal-progress/', '/api/attended-events/']
+        counts = {}
+        for expand in (None, {'expand': ''}, {'expand': 'task_id,activity_id,goal_id,event_id'}):
+            for endpoint in endpoints:
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(endpoint, expand)
+                counts[endpoint, str(expand)] = len(queries)
+
+        task = CustomTask.objects.first()
+        for day in range(10, 20):
+            TaskTimeLog.objects.create(
+                task_id=task, start_time=time(9), end_time=time(10), duration=timedelta(minutes=5),
+                date_logged=date(2025, 2, day)
+            )
+        GoalProgress.objects.bulk_create([
+            GoalProgress(
+                goal_id=Goals.objects.get(), goalschedule_id=GoalSchedule.objects.get(), session_date=date(2025, 3, day),
+                session_start_time=time(19), session_end_time=time(20), session_duration=timedelta(hours=1)
+            ) for day in range(1, 11)
+        ])
+        for expand in (None, {'expand': ''}, {'expand': 'task_id,activity_id,goal_id,event_id'}):
+            for endpoint in endpoints:
+                with self.assertNumQueries(counts[endpoint, str(expand)]):
+                    self.client.get(endpoint, expand)
+
+
+class PlannerDataMixin:
+    """A student with `seed(n)` rows in every planner and log table"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            firstname='Count', lastname='Test', email='count@planma.test', username='count', password='pass1234'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.seeded = 0
+
+    def seed(self, rows):
+        """Add `rows` more rows to every table the endpoints list"""
+        for _ in range(rows):
+            self.seeded += 1
+            n = self.seeded
+            day = date.today() + timedelta(days=n)
+            semester = CustomSemester.objects.create(
+                acad_year_start=2024 + n, acad_year_end=2025 + n, year_level='1st Year', semester='1st Semester',
+                sem_start_date=day, sem_end_date=day + timedelta(weeks=18), student_id=self.user
+            )
+            subject = CustomSubject.objects.create(
+                subject_code=f'CS{n}', subject_title='Subject', student_id=self.user, semester_id=semester
+            )
+            task = CustomTask.objects.create(
+                task_name=f'Task {n}', scheduled_date=day, scheduled_start_time=time(9), scheduled_end_time=time(10),
+                deadline=timezone.make_aware(datetime.combine(day, time(17))), status='Pending',
+                subject_id=subject, student_id=self.user
+            )
+            TaskTimeLog.objects.create(
+                task_id=task, start_time=time(9), end_time=time(10), duration=timedelta(hours=1), date_logged=day
+            )
+            activity = CustomActivity.objects.create(
+                activity_name=f'Activity {n}', scheduled_date=day, scheduled_start_time=time(15),
+                scheduled_end_time=time(16), status='Pending', student_id=self.user
+            )
+            ActivityTimeLog.objects.create(
+                activity_id=activity, start_time=time(15), end_time=time(16), duration=timedelta(hours=1),
+                date_logged=day
+            )
+            event = CustomEvents.objects.create(
+                event_name=f'Event {n}', location='Hall', scheduled_date=day, scheduled_start_time=time(13),
+                scheduled_end_time=time(14), event_type='Academic', student_id=self.user
+            )
+            AttendedEvents.objects.create(event_id=event, date=day, has_attended=True)
+            class_schedule = CustomClassSchedule.objects.create(
+                subject=subject, day_of_week='Monday', scheduled_start_time=time(7), scheduled_end_time=time(8),
+                room=f'R{n}', student_id=self.user
+            )
+            AttendedClass.objects.create(classsched_id=class_schedule, attendance_date=day, status='Attended')
+            goal = Goals.objects.create(
+                goal_name=f'Goal {n}', target_hours=2, timeframe='Weekly', goal_type='Academic',
+                student_id=self.user, semester_id=semester
+            )
+            session = GoalSchedule.objects.create(
+                goal_id=goal, scheduled_date=day, scheduled_start_time=time(19), scheduled_end_time=time(20)
+            )
+            GoalProgress.objects.create(
+                goal_id=goal, goalschedule_id=session, session_date=day, session_start_time=time(19),
+                session_end_time=time(20), session_duration=timedelta(hours=1)
+            )
+            SleepLog.objects.create(
+                student_id=self.user, start_time=time(23), end_time=time(7), duration=timedelta(hours=8),
+                date_logged=day
+            )
+            ScheduleEntry.objects.create(
+                category_type='Task', reference_id=task.task_id, student_id=self.user, scheduled_date=day,
+                scheduled_start_time=time(9), scheduled_end_time=time(10)
+            )
+
+
+class QueryCountTests(PlannerDataMixin, TestCase):
+    """
+    Every list/retrieve endpoint must cost the same number of queries no
+    matter how many rows it returns. A serializer walking a relation the
+    viewset does not select_related shows up here as a growing count.
+    """
+    LIST_ENDPOINTS = [
+        'tasks', 'tasks/pending_tasks', 'task-logs',
+        'activities', 'activities/pending_activities', 'activity-logs',
+        'events', 'events/upcoming_events', 'attended-events',
+        'class-schedules', 'attended-classes', 'subjects', 'semesters',
+        'goals', 'goal-schedules', 'goal-schedules/pending_goal_schedules', 'goal-progress',
+        'sleep-logs', 'schedule',
+    ]
+    DETAIL_ENDPOINTS = [
+        'tasks', 'task-logs', 'activities', 'activity-logs', 'events', 'attended-events',
+        'class-schedules', 'attended-classes', 'semesters',
+        'goals', 'goal-schedules', 'goal-progress', 'sleep-logs',
+        # /subjects/<x>/ is routed to the lookup by subject code
+        'subjects',
+    ]
+    VARIANTS = [None, {'expand': ''}]
+
+    def query_count(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries), response.data
+
+    def test_list_endpoints_do_not_query_per_row(self):
+        self.seed(1)
+        baseline = {}
+        for endpoint in self.LIST_ENDPOINTS:
+            for params in self.VARIANTS:
+                baseline[endpoint, str(params)] = self.query_count(f'/api/{endpoint}/', params)[0]
+
+        self.seed(5)
+        for endpoint in self.LIST_ENDPOINTS:
+            for params in self.VARIANTS:
+                with self.subTest(endpoint=endpoint, params=params):
+                    count, data = self.query_count(f'/api/{endpoint}/', params)
+                    self.assertGreater(len(data), 1)
+                    self.assertEqual(count, baseline[endpoint, str(params)])
+
+    def test_retrieve_endpoints_use_one_query(self):
+        self.seed(2)
+        for endpoint in self.DETAIL_ENDPOINTS:
+            row = self.client.get(f'/api/{endpoint}/').data[0]
+            pk = row['subject_code'] if endpoint == 'subjects' else next(iter(row.values()))
+            for params in self.VARIANTS:
+                with self.subTest(endpoint=endpoint, params=params):
+                    self.assertEqual(self.query_count(f'/api/{endpoint}/{pk}/', params)[0], 1)
+
+
+class PaginationTests(PlannerDataMixin, TestCase):
+    """Opt-in cursor pages and ?fields= on the list endpoints"""
+
+    def setUp(self):
+        super().setUp()
+        self.seed(5)
+
+    def test_plain_list_without_page_params(self):
+        response = self.client.get('/api/tasks/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 5)
+
+    def test_cursor_pages_walk_in_date_order(self):
+        for endpoint, date_field in [('tasks', 'scheduled_date'), ('task-logs', 'date_logged'), ('schedule', 'scheduled_date')]:
+            seen, url, params = [], f'/api/{endpoint}/', {'page_size': 2}
+            while url:
+                page = self.client.get(url, params).data
+                self.assertLessEqual(len(page['results']), 2)
+                seen += [row[date_field] for row in page['results']]
+                url, params = page['next'], None
+            self.assertEqual(len(seen), 5, endpoint)
+            self.assertEqual(seen, sorted(seen), endpoint)
+
+    def test_rows_sharing_a_date_are_not_skipped_or_repeated(self):
+        subject = CustomSubject.objects.first()
+        day = date.today() + timedelta(days=2)
+        for hour in range(11, 16):
+            CustomTask.objects.create(
+                task_name=f'Same day {hour}', scheduled_date=day, scheduled_start_time=time(hour),
+                scheduled_end_time=time(hour, 30), deadline=timezone.make_aware(datetime.combine(day, time(23))),
+                status='Pending', subject_id=subject, student_id=self.user
+            )
+        expected = list(CustomTask.objects.order_by('scheduled_date', 'pk').values_list('task_id', flat=True))
+
+        pages, url, params = [], '/api/tasks/', {'page_size': 2}
+        while url:
+            page = self.client.get(url, params).data
+            pages.append(page)
+            url, params = page['next'], None
+        self.assertEqual([row['task_id'] for page in pages for row in page['results']], expected)
+
+        # Walking back from the last page gives the same rows
+        seen, url = [], pages[-1]['previous']
+        while url:
+            page = self.client.get(url).data
+            seen = [row['task_id'] for row in page['results']] + seen
+            url = page['previous']
+        self.assertEqual(seen, expected[:-len(pages[-1]['results'])])
+        self.assertEqual(self.client.get('/api/tasks/', {'cursor': 'cD15ZXN0ZXJkYXk='}).status_code, 404)
+
+    def test_schedule_pages_cap_expanded_occurrences(self):
+        start = ScheduleEntry.objects.order_by('scheduled_date').first().scheduled_date
+        ScheduleEntry.objects.create(
+            category_type='Class', reference_id=CustomClassSchedule.objects.first().classsched_id,
+            student_id=self.user, scheduled_date=start, scheduled_start_time=time(7),
+            scheduled_end_time=time(8), recurrence='Weekly', recurrence_end=start + timedelta(weeks=3)
+        )
+        expected = self.client.get('/api/schedule/').data
+
+        rows, url, params = [], '/api/schedule/', {'page_size': 3}
+        while url:
+            page = self.client.get(url, params).data
+            # The weekly series (4 occurrences) gets a page of its own
+            self.assertTrue(len(page['results']) <= 3 or len({row['entry_id'] for row in page['results']}) == 1)
+            rows += page['results']
+            url, params = page['next'], None
+        self.assertEqual(sorted((row['entry_id'], row['scheduled_date']) for row in rows),
+                         sorted((row['entry_id'], row['scheduled_date']) for row in expected))
+
+    def test_sparse_fields(self):
+        rows = self.client.get('/api/task-logs/', {'fields': 'task_log_id,duration'}).data
+        self.assertEqual(set(rows[0]), {'task_log_id', 'duration'})
+
+        page = self.client.get('/api/tasks/', {'fields': 'task_id,subject_id', 'expand': '', 'page_size': 3}).data
+        self.assertEqual(set(page['results'][0]), {'task_id', 'subject_id'})
+        self.assertIsInstance(page['results'][0]['subject_id'], int)
+
+
+class SyncTests(PlannerDataMixin, TestCase):
+    """/api/sync/ change feed"""
+
+    def setUp(self):
+        super().setUp()
+        self.seed(3)
+        UserPref.objects.create(student_id=self.user, reminder_offset_time=timedelta(minutes=15))
+
+    def age_rows(self):
+        # Pretend everything was last written an hour ago
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for source in SYNC_COLLECTIONS.values():
+            source['model'].objects.update(updated_at=hour_ago)
+        return encode_cursor(hour_ago + timedelta(minutes=1))
+
+    def test_full_snapshot_without_cursor(self):
+        with self.assertNumQueries(len(SYNC_COLLECTIONS) + 1):
+            data = self.client.get('/api/sync/').data
+        self.assertTrue(data['full'])
+        self.assertEqual(set(data['changes']), set(SYNC_COLLECTIONS))
+        self.assertEqual(len(data['changes']['tasks']), 3)
+        # Relations are sent as ids
+        self.assertIsInstance(data['changes']['tasks'][0]['subject_id'], int)
+
+    def test_idle_student_gets_nothing(self):
+        data = self.client.get('/api/sync/', {'since': self.age_rows()}).data
+        self.assertFalse(data['full'])
+        self.assertEqual(data['changes'], {})
+        self.assertEqual(data['deleted'], {})
+
+    def test_changes_and_deletes_since_cursor(self):
+        cursor = self.age_rows()
+        task = CustomTask.objects.first()
+        task.status = 'Completed'
+        task.save()
+        activity = CustomActivity.objects.first()
+        activity_id, log_id = activity.activity_id, activity.actlog.get().activity_log_id
+        activity.delete()
+        entry = ScheduleEntry.objects.first()
+        entry.recurrence, entry.recurrence_end = 'Weekly', entry.scheduled_date + timedelta(weeks=4)
+        ScheduleEntry.objects.filter(pk=entry.pk).update(
+            recurrence=entry.recurrence, recurrence_end=entry.recurrence_end
+        )
+        ScheduleEntryException.objects.create(entry=entry, exception_date=entry.scheduled_date + timedelta(weeks=1))
+
+        data = self.client.get('/api/sync/', {'since': cursor}).data
+        self.assertEqual(set(data['changes']), {'tasks', 'schedule'})
+        self.assertEqual([row['status'] for row in data['changes']['tasks']], ['Completed'])
+        self.assertEqual(len(data['changes']['schedule'][0]['exceptions']), 1)
+        self.assertEqual(data['deleted'], {
+            'activities': [activity_id], 'activity-logs': [log_id],
+        })
+
+    def test_bad_and_expired_cursors(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'yesterday'}).status_code, 400)
+        expired = encode_cursor(timezone.now() - timedelta(days=60))
+        self.assertTrue(self.client.get('/api/sync/', {'since': expired}).data['full'])
+
+    def test_prune_tombstones(self):
+        CustomEvents.objects.first().delete()
+        SyncTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=31))
+        CustomEvents.objects.first().delete()
+        self.assertEqual(prune_tombstones(), 2)
+        self.assertEqual(SyncTombstone.objects.count(), 2)
+
+
+class BatchWriteTests(PlannerDataMixin, TestCase):
+    """/api/batch/ mixed writes"""
+
+    def setUp(self):
+        super().setUp()
+        self.seed(1)
+        self.subject = CustomSubject.objects.get()
+        self.goal = Goals.objects.get()
+        self.day = date.today() + timedelta(days=10)
+
+    def task(self, hour, **data):
+        return {
+            'task_name': f'Task at {hour}', 'scheduled_date': self.day.isoformat(),
+            'scheduled_start_time': f'{hour:02d}:00', 'scheduled_end_time': f'{hour:02d}:30',
+            'deadline': f'{self.day.isoformat()}T23:00', 'subject_id': self.subject.subject_id, **data,
+        }
+
+    def batch(self, operations, **options):
+        return self.client.post('/api/batch/', {'operations': operations, **options}, format='json')
+
+    def test_mixed_operations(self):
+        task = CustomTask.objects.get()
+        event = CustomEvents.objects.get()
+        response = self.batch([
+            {'op': 'create', 'type': 'task', 'ref': 'tmp-1', 'data': self.task(8)},
+            {'op': 'create', 'type': 'activity', 'data': {
+                'activity_name': 'Run', 'scheduled_date': self.day.isoformat(),
+                'scheduled_start_time': '09:00', 'scheduled_end_time': '10:00',
+            }},
+            {'op': 'create', 'type': 'goal_schedule', 'data': {
+                'goal_id': self.goal.goal_id, 'scheduled_date': self.day.isoformat(),
+                'scheduled_start_time': '10:00', 'scheduled_end_time': '11:00',
+            }},
+            {'op': 'update', 'type': 'task', 'id': task.task_id, 'data': {'scheduled_start_time': '11:00',
+                                                                          'scheduled_end_time': '12:00'}},
+            {'op': 'delete', 'type': 'event', 'id': event.event_id},
+        ])
+        self.assertEqual(response.status_code, 200, response.data)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results],
+                         ['created', 'created', 'created', 'updated', 'deleted'])
+        self.assertEqual(results[0]['ref'], 'tmp-1')
+        self.assertEqual(results[0]['data']['subject_id'], self.subject.subject_id)
+
+        created = CustomTask.objects.get(pk=results[0]['id'])
+        entry = ScheduleEntry.objects.get(category_type='Task', reference_id=created.task_id)
+        self.assertEqual(entry.task_id_id, created.task_id)
+        self.assertTrue(ScheduleEntry.objects.filter(goalschedule_id=results[2]['id']).exists())
+        self.assertTrue(ReminderSchedule.objects.filter(category_type='Task', reference_id=created.task_id).exists())
+        moved = ScheduleEntry.objects.get(category_type='Task', reference_id=task.task_id)
+        self.assertEqual(moved.scheduled_start_time, time(11))
+        self.assertFalse(CustomEvents.objects.exists())
+
+    def test_atomic_batch_writes_nothing_on_error(self):
+        existing = CustomTask.objects.get()
+        response = self.batch([
+            {'op': 'create', 'type': 'task', 'data': self.task(8)},
+            {'op': 'create', 'type': 'task', 'data': self.task(
+                9, scheduled_date=existing.scheduled_date.isoformat(), scheduled_end_time='09:30'
+            )},
+            {'op': 'update', 'type': 'task', 'id': 999999, 'data': {}},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['not_applied', 'error', 'error'])
+        self.assertEqual(response.data['results'][1]['error_type'], 'overlap')
+        self.assertEqual(CustomTask.objects.count(), 1)
+
+    def test_non_atomic_batch_writes_valid_operations(self):
+        response = self.batch([
+            {'op': 'create', 'type': 'task', 'data': self.task(8)},
+            {'op': 'create', 'type': 'task', 'data': self.task(8, task_name='Same slot')},
+            {'op': 'create', 'type': 'task', 'data': self.task(14, subject_id=123456)},
+        ], atomic=False)
+        self.assertEqual(response.status_code, 200)
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['created', 'error', 'error'])
+        self.assertEqual(CustomTask.objects.count(), 2)
+
+    def test_moving_a_session_to_another_goal(self):
+        session = GoalSchedule.objects.get()
+        entry = ScheduleEntry.objects.create(
+            category_type='Goal', reference_id=session.goalschedule_id, student_id=self.user,
+            scheduled_date=session.scheduled_date, scheduled_start_time=session.scheduled_start_time,
+            scheduled_end_time=session.scheduled_end_time
+        )
+        other = Goals.objects.create(
+            goal_name='Other goal', target_hours=1, timeframe='Daily', goal_type='Personal',
+            student_id=self.user, semester_id=self.goal.semester_id
+        )
+        # The reminder the session had queued for the goal it leaves
+        stale = timezone.now() - timedelta(days=1)
+        ReminderSchedule.objects.filter(category_type='Goal', reference_id=self.goal.goal_id).update(remind_at=stale)
+
+        response = self.batch([{'op': 'update', 'type': 'goal_schedule', 'id': session.goalschedule_id,
+                                'data': {'goal_id': other.goal_id}}])
+        self.assertEqual(response.status_code, 200, response.data)
+
+        entry = ScheduleEntry.objects.select_related('goalschedule_id__goal_id').get(pk=entry.pk)
+        self.assertEqual(entry.goalschedule_id_id, session.goalschedule_id)
+        self.assertEqual(entry.student_id_id, self.user.student_id)
+        self.assertEqual(entry.related_info()['name'], 'Other goal')
+        self.assertNotEqual(ReminderSchedule.objects.get(category_type='Goal', reference_id=self.goal.goal_id)
+                            .remind_at, stale)
+        self.assertTrue(ReminderSchedule.objects.filter(category_type='Goal', reference_id=other.goal_id).exists())
+
+    def test_slot_freed_in_the_same_batch(self):
+        existing = CustomTask.objects.get()
+        slot = {
+            'scheduled_date': existing.scheduled_date.isoformat(),
+            'scheduled_start_time': '09:00', 'scheduled_end_time': '10:00',
+        }
+        response = self.batch([
+            {'op': 'delete', 'type': 'task', 'id': existing.task_id},
+            {'op': 'create', 'type': 'task', 'data': self.task(9, **slot)},
+        ])
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_query_count_does_not_grow_with_batch(self):
+        def count(hours):
+            operations = [{'op': 'create', 'type': 'task', 'data': self.task(hour)} for hour in hours]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.batch(operations).status_code, 200)
+            return len(queries)
+
+        self.assertEqual(count(range(0, 3)), count(range(3, 15)))
+
+
+class ConditionalGetTests(PlannerDataMixin, TestCase):
+    """ETag / If-None-Match on the list, detail and dashboard endpoints"""
+
+    def setUp(self):
+        super().setUp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed(2)
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_collection_answers_304_without_queries(self):
+        task = CustomTask.objects.first()
+        for url in ['/api/tasks/', f'/api/tasks/{task.task_id}/', '/api/schedule/', '/api/dashboard/']:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200, url)
+            self.assertIn('Last-Modified', first)
+            with self.assertNumQueries(0):
+                again = self.revalidate(url, first['ETag'])
+            self.assertEqual(again.status_code, 304, url)
+            self.assertEqual(again['ETag'], first['ETag'])
+
+    def test_write_changes_only_dependent_etags(self):
+        tasks = self.client.get('/api/tasks/')['ETag']
+        sleep = self.client.get('/api/sleep-logs/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            subject = CustomSubject.objects.first()
+            subject.subject_title = 'Renamed'
+            subject.save()
+
+        # Tasks embed their subject, sleep logs do not
+        self.assertEqual(self.revalidate('/api/tasks/', tasks).status_code, 200)
+        self.assertEqual(self.revalidate('/api/sleep-logs/', sleep).status_code, 304)
+
+    def test_query_string_is_part_of_the_etag(self):
+        etag = self.client.get('/api/tasks/')['ETag']
+        self.assertEqual(self.revalidate('/api/tasks/', etag, expand='').status_code, 200)
+
+    def test_batch_writes_bump_versions(self):
+        etag = self.client.get('/api/schedule/')['ETag']
+        day = date.today() + timedelta(days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/batch/', [{'op': 'create', 'type': 'activity', 'data': {
+                'activity_name': 'Swim', 'scheduled_date': day.isoformat(),
+                'scheduled_start_time': '06:00', 'scheduled_end_time': '07:00',
+            }}], format='json')
+        self.assertEqual(self.revalidate('/api/schedule/', etag).status_code, 200)
+
+
+class DashboardCacheTests(PlannerDataMixin, TestCase):
+    """Per-student dashboard cache and its signal-driven invalidation"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed(2)
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get('/api/dashboard/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            again = self.client.get('/api/dashboard/')
+        self.assertEqual(again['X-Cache'], 'HIT')
+        self.assertEqual(again.data, first.data)
+
+    def test_save_and_delete_invalidate(self):
+        self.assertEqual(self.client.get('/api/dashboard/').data['pending_tasks_count'], 2)
+        task = CustomTask.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            task.status = 'Completed'
+            task.save()
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['pending_tasks_count'], 1)
+
+        self.client.get('/api/dashboard/')
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomActivity.objects.first().delete()
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['pending_activities_count'], 1)
+
+    def test_other_students_writes_keep_the_cache(self):
+        self.client.get('/api/dashboard/')
+        other = CustomUser.objects.create_user(
+            firstname='Other', lastname='Test', email='other@planma.test', username='other', password='pass1234'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomActivity.objects.create(
+                activity_name='Elsewhere', scheduled_date=date.today(), scheduled_start_time=time(6),
+                scheduled_end_time=time(7), status='Pending', student_id=other
+            )
+        self.assertEqual(self.client.get('/api/dashboard/')['X-Cache'], 'HIT')
+
+    def test_batch_writes_invalidate(self):
+        self.client.get('/api/dashboard/')
+        day = date.today() + timedelta(days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/batch/', [{'op': 'create', 'type': 'activity', 'data': {
+                'activity_name': 'Swim', 'scheduled_date': day.isoformat(),
+                'scheduled_start_time': '06:00', 'scheduled_end_time': '07:00',
+            }}], format='json')
+        response = self.client.get('/api/dashboard/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['pending_activities_count'], 3)
+
+    def test_stats_are_staff_only(self):
+        self.client.get('/api/dashboard/')
+        self.client.get('/api/dashboard/')
+        self.assertEqual(self.client.get('/api/dashboard/cache-stats/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/dashboard/cache-stats/')
+        self.assertEqual(response.data, {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+
+class DashboardAggregationTests(PlannerDataMixin, TestCase):
+    """/api/dashboard/ counts and widgets in one statement"""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seed(2)
+        self.today = timezone.localdate()
+        self.task = CustomTask.objects.first()
+        self.goal = Goals.objects.first()
+        ScheduleEntry.objects.create(
+            category_type='Task', reference_id=self.task.task_id, student_id=self.user, scheduled_date=self.today,
+            scheduled_start_time=time(11), scheduled_end_time=time(12)
+        )
+        ScheduleEntry.objects.create(
+            category_type='Goal', reference_id=GoalSchedule.objects.get(goal_id=self.goal).goalschedule_id,
+            student_id=self.user, scheduled_date=self.today, scheduled_start_time=time(8),
+            scheduled_end_time=time(9)
+        )
+        TaskTimeLog.objects.create(
+            task_id=self.task, start_time=time(9), end_time=time(10, 30), duration=timedelta(minutes=90),
+            date_logged=self.today
+        )
+        GoalProgress.objects.create(
+            goal_id=self.goal, goalschedule_id=GoalSchedule.objects.get(goal_id=self.goal), session_date=self.today,
+            session_start_time=time(19), session_end_time=time(20), session_duration=timedelta(hours=1)
+        )
+
+    def test_counts_and_widgets_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = build_dashboard(self.user.student_id, list(DASHBOARD_WIDGETS))
+        self.assertEqual(data['pending_tasks_count'], 2)
+        self.assertEqual(data['goals_count'], 2)
+        self.assertEqual(data['class_schedule_count'], 1)
+        self.assertEqual([(entry['category_type'], entry['name'], entry['scheduled_start_time'])
+                          for entry in data['today_schedule']],
+                         [('Goal', 'Goal 1', '08:00:00'), ('Task', 'Task 1', '11:00:00')])
+        self.assertEqual(data['hours_this_week'], 2.5)
+        self.assertEqual(data['goal_progress'][0]['logged_hours'], 1.0)
+        self.assertEqual(data['goal_progress'][0]['percent'], 50.0)
+        self.assertEqual(data['goal_progress'][1]['logged_hours'], 0.0)
+
+    def test_selected_semester_prefers_started_one(self):
+        started = CustomSemester.objects.create(
+            acad_year_start=2020, acad_year_end=2021, year_level='1st Year', semester='2nd Semester',
+            sem_start_date=self.today - timedelta(days=30), sem_end_date=self.today + timedelta(days=60),
+            student_id=self.user
+        )
+        self.assertEqual(build_dashboard(self.user.student_id)['selected_semester_id'], started.semester_id)
+
+    def test_student_without_rows(self):
+        other = CustomUser.objects.create_user(
+            firstname='Empty', lastname='Test', email='empty@planma.test', username='empty', password='pass1234'
+        )
+        data = build_dashboard(other.student_id, list(DASHBOARD_WIDGETS))
+        self.assertIsNone(data['selected_semester_id'])
+        self.assertEqual((data['today_schedule'], data['hours_this_week'], data['goal_progress']), ([], 0.0, []))
+
+    def test_widgets_endpoint(self):
+        response = self.client.get('/api/dashboard/', {'widgets': 'hours_this_week'})
+        self.assertEqual(response.data['hours_this_week'], 2.5)
+        self.assertNotIn('today_schedule', response.data)
+        self.assertEqual(self.client.get('/api/dashboard/', {'widgets': 'weather'}).status_code, 400)
+
+        # Logging time changes the widget, so it must not be served from cache
+        with self.captureOnCommitCallbacks(execute=True):
+            TaskTimeLog.objects.create(
+                task_id=self.task, start_time=time(13), end_time=time(13, 30), duration=timedelta(minutes=30),
+                date_logged=self.today
+            )
+        response = self.client.get('/api/dashboard/', {'widgets': 'hours_this_week'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['hours_this_week'], 3.0)
 
-# Create your tests here.
@@ -39,4 +39,8 @@ urlpatterns = [
     path('auth/', include('djoser.urls.jwt')),
     path('', include(router.urls)),
     path('dashboard/', DashboardAPIView.as_view(), name='dashboard'),
+    path('dashboard/cache-stats/', DashboardCacheStatsAPIView.as_view(), name='dashboard-cache-stats'),
+    path('reports/', ReportsAPIView.as_view(), name='reports'),
+    path('sync/', SyncAPIView.as_view(), name='sync'),
+    path('batch/', BatchAPIView.as_view(), name='batch'),
 ]
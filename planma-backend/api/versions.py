@@ -0,0 +1,82 @@
+import hashlib
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Per-student version of each sync collection ('tasks', 'subjects', ...; see
+# sync.SYNC_COLLECTIONS), kept in the shared cache. A version is the clock in
+# nanoseconds at the last write, so a key that was evicted comes back with a
+# new value rather than one a client may still hold in an ETag.
+
+
+def _version_key(student_id, collection):
+    return f'version:{student_id}:{collection}'
+
+
+def collection_versions(student_id, collections):
+    """{collection: version} for a student, in one cache round trip"""
+    keys = {collection: _version_key(student_id, collection) for collection in collections}
+    versions = cache.get_many(keys.values())
+    missing = {key: time.time_ns() for key in keys.values() if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return {collection: versions[key] for collection, key in keys.items()}
+
+
+def bump_versions(student_id, *collections):
+    """Mark a student's collections as changed once the current transaction commits"""
+    def bump():
+        version = time.time_ns()
+        cache.set_many({_version_key(student_id, collection): version for collection in collections}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+class NotModified(Exception):
+    pass
+
+
+class VersionedResponseMixin:
+    """
+    Conditional GET for views whose response only depends on the student's
+    rows in `versioned_collections` (plus today's date). The ETag is derived
+    from those versions and the request URL, so an If-None-Match that still
+    matches is answered with 304 before any queryset or serializer runs.
+    """
+    versioned_collections = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.collection_etag = None
+        if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+            return
+
+        versions = collection_versions(request.user.student_id, self.versioned_collections)
+        fingerprint = '|'.join([
+            str(request.user.student_id), request.get_full_path(), timezone.localdate().isoformat(),
+            *(f'{collection}={versions[collection]}' for collection in sorted(versions)),
+        ])
+        self.collection_etag = f'"{hashlib.md5(fingerprint.encode()).hexdigest()}"'
+        self.collection_modified = max(versions.values(), default=0) // 1_000_000_000
+
+        # Only the ETag decides: Last-Modified has one-second resolution
+        if get_conditional_response(request, etag=self.collection_etag) is not None:
+            raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return get_conditional_response(self.request, etag=self.collection_etag)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'collection_etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.collection_etag
+            response['Last-Modified'] = http_date(self.collection_modified)
+            # Per-student data: clients may keep it but must revalidate
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -16,8 +16,21 @@ from django.utils.timezone import make_aware, now
 from django.http import JsonResponse
 from datetime import datetime, timedelta, date
 from api.tasks import send_push_notification
-from django.core.cache import cache
 from django.db.models import Prefetch
+from collections import defaultdict
+from .scheduling import (
+    WEEKDAYS, weekly_dates, find_conflicts, overlaps_within, has_overlap, first_overlap,
+    create_weekly_entry, expand_entries, sync_class_entry
+)
+from .reports import REPORT_CATEGORIES, GROUPINGS, build_report, previous_range
+from .pagination import PlannerCursorPagination
+from .sync import sync_changes, decode_cursor
+from .batch import MAX_BATCH_OPERATIONS, WriteBatch
+from .versions import VersionedResponseMixin
+from .dashboard import (
+    DASHBOARD_WIDGETS, build_dashboard, cache_dashboard, dashboard_cache_stats, dashboard_collections,
+    get_cached_dashboard,
+)
 
 
 # views.py
@@ -32,7 +45,24 @@ from django.utils import timezone
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 
-CACHE_TIMEOUT_SECONDS = 15
+def select_expanded(queryset, request, *related):
+    """
+    select_related the relations the serializer is about to walk: all of
+    them by default, only those named in ?expand= (see ExpandableFieldsMixin).
+    """
+    paths = expanded_paths(request)
+    if paths is not None:
+        kept = []
+        for relation in related:
+            parts = relation.split('__')
+            depth = 0
+            while depth < len(parts) and '.'.join(parts[:depth + 1]) in paths:
+                depth += 1
+            if depth:
+                kept.append('__'.join(parts[:depth]))
+        related = kept
+    # select_related() without arguments would follow every foreign key
+    return queryset.select_related(*related) if related else queryset
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
@@ -54,9 +84,11 @@ class CustomTokenObtainPairView(TokenObtainPairView):
 
         return response
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = CustomActivitySerializer
+    pagination_class = PlannerCursorPagination
+    versioned_collections = ('activities',)
 
     def get_queryset(self):
         queryset = CustomActivity.objects.filter(student_id=self.request.user)
@@ -128,14 +160,9 @@ class ActivityViewSet(viewsets.ModelViewSet):
                 )
             
             # Check for overlapping schedules
-            overlapping_schedules = ScheduleEntry.objects.filter(
-                student_id=student,
-                scheduled_date=scheduled_date
-            ).filter(
-                Q(scheduled_start_time__lt=end_time, scheduled_end_time__gt=start_time)
-            )
+            overlapping = has_overlap(student, scheduled_date, start_time, end_time)
 
-            if overlapping_schedules.exists():
+            if overlapping:
                 return Response({'error_type': 'overlap', 'message': 'This time slot is already occupied. Please choose another time.'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Create Activity
@@ -233,16 +260,9 @@ class ActivityViewSet(viewsets.ModelViewSet):
                 )
             
             # Check for overlapping schedules
-            overlapping_schedules = ScheduleEntry.objects.filter(
-                student_id=instance.student_id,
-                scheduled_date=scheduled_date
-            ).filter(
-                Q(scheduled_start_time__lt=end_time, scheduled_end_time__gt=start_time)
-            ).exclude(
-                Q(category_type='Activity') & Q(reference_id=instance.activity_id)  # Exclude the current activity entry
-            )
+            overlapping = has_overlap(instance.student_id, scheduled_date, start_time, end_time, exclude=('Activity', instance.activity_id))
 
-            if overlapping_schedules.exists():
+            if overlapping:
                 return Response({'error_type': 'overlap', 'message': 'This time slot is already occupied. Please choose another time.'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Reset reminder_sent if event is moved to a future datetime
@@ -284,13 +304,19 @@ class ActivityViewSet(viewsets.ModelViewSet):
             )
         
 # Activity Time Log
-class ActivityTimeLogViewSet(viewsets.ModelViewSet):
+class ActivityTimeLogViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = ActivityLogSerializer
+    pagination_class = PlannerCursorPagination
+    cursor_ordering = ('date_logged', 'pk')
+    versioned_collections = ('activity-logs', 'activities')
 
     def get_queryset(self):
         # Filter logged activities based on the logged-in user
-        queryset = ActivityTimeLog.objects.filter(activity_id__student_id=self.request.user)
+        queryset = select_expanded(
+            ActivityTimeLog.objects.filter(activity_id__student_id=self.request.user),
+            self.request, 'activity_id'
+        )
 
         # Apply date_logged filtering if provided in query params
         start_date = self.request.query_params.get('start_date')
@@ -367,9 +393,11 @@ class ActivityTimeLogViewSet(viewsets.ModelViewSet):
             return Response({'error': f'An error occurred: {str(e)}'},
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class EventViewSet(viewsets.ModelViewSet):
+class EventViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = CustomEventSerializer
+    pagination_class = PlannerCursorPagination
+    versioned_collections = ('events',)
 
     def get_queryset(self):
         # Filter events based on the logged-in user
@@ -435,14 +463,9 @@ class EventViewSet(viewsets.ModelViewSet):
                 )
             
             # Check for overlapping schedules
-            overlapping_schedules = ScheduleEntry.objects.filter(
-                student_id=student,
-                scheduled_date=scheduled_date
-            ).filter(
-                Q(scheduled_start_time__lt=end_time, scheduled_end_time__gt=start_time)
-            )
+            overlapping = has_overlap(student, scheduled_date, start_time, end_time)
 
-            if overlapping_schedules.exists():
+            if overlapping:
                 return Response({'error_type': 'overlap', 'message': 'This time slot is already occupied. Please choose another time.'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Create Events
@@ -543,16 +566,9 @@ class EventViewSet(viewsets.ModelViewSet):
                 )
             
             # Check for overlapping schedules
-            overlapping_schedules = ScheduleEntry.objects.filter(
-                student_id=instance.student_id,
-                scheduled_date=scheduled_date
-            ).filter(
-                Q(scheduled_start_time__lt=end_time, scheduled_end_time__gt=start_time)
-            ).exclude(
-                Q(category_type='Event') & Q(reference_id=instance.event_id)  # Exclude the current event entry
-            )
+            overlapping = has_overlap(instance.student_id, scheduled_date, start_time, end_time, exclude=('Event', instance.event_id))
 
-            if overlapping_schedules.exists():
+            if overlapping:
                 return Response({'error_type': 'overlap', 'message': 'This time slot is already occupied. Please choose another time.'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Reset reminder_sent if event is moved to a future datetime
@@ -595,13 +611,19 @@ class EventViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class AttendedEventViewSet(viewsets.ModelViewSet):
+class AttendedEventViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = AttendedEventSerializer
+    pagination_class = PlannerCursorPagination
+    cursor_ordering = ('date', 'pk')
+    versioned_collections = ('attended-events', 'events')
 
     def get_queryset(self):
         # Filter attended events based on the logged-in user
-        queryset = AttendedEvents.objects.filter(event_id__student_id=self.request.user)
+        queryset = select_expanded(
+            AttendedEvents.objects.filter(event_id__student_id=self.request.user),
+            self.request, 'event_id'
+        )
 
         # Apply date filtering if provided in query params
         start_date = self.request.query_params.get('start_date')
@@ -690,9 +712,10 @@ class AttendedEventViewSet(viewsets.ModelViewSet):
             )
 
 #User Preferences
-class UserPreferenceView(viewsets.ModelViewSet):
+class UserPreferenceView(VersionedResponseMixin, viewsets.ModelViewSet):
     serializer_class = UserPrefSerializer  
     permission_classes = [permissions.IsAuthenticated]
+    versioned_collections = ('userprefs',)
 
     def get_queryset(self):
         return UserPref.objects.filter(student_id=self.request.user)
@@ -799,13 +822,17 @@ class CustomUserViewSet(UserViewSet):
 
     
 # Class Schedule & Subject
-class ClassScheduleViewSet(viewsets.ModelViewSet):
+class ClassScheduleViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = CustomClassScheduleSerializer
+    versioned_collections = ('class-schedules', 'subjects', 'semesters')
 
     def get_queryset(self):   
         # Fetch schedules tied to the current user's student_id
-        queryset = CustomClassSchedule.objects.filter(student_id=self.request.user.student_id)
+        queryset = select_expanded(
+            CustomClassSchedule.objects.filter(student_id=self.request.user.student_id),
+            self.request, 'subject__semester_id'
+        )
     
         # Optionally filter by semester_id if provided
         semester_id = self.request.query_params.get('semester_id')
@@ -834,21 +861,10 @@ class ClassScheduleViewSet(viewsets.ModelViewSet):
         if not all([subject_code, subject_title, semester_id, day_of_week, start_time, end_time, room]):
             return Response({'error': 'All fields are required except student_id.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Day of week mapping (Python: Monday=0, Django __week_day: Sunday=1)
-        weekday_map = {
-            'Monday': 0,
-            'Tuesday': 1,
-            'Wednesday': 2,
-            'Thursday': 3,
-            'Friday': 4,
-            'Saturday': 5,
-            'Sunday': 6
-        }
-
-        if day_of_week not in weekday_map:
+        if day_of_week not in WEEKDAYS:
             return Response({'error': 'Invalid day_of_week provided.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        day_of_week_int = weekday_map[day_of_week]
+        day_of_week_int = WEEKDAYS[day_of_week]
 
         try:
             # Fetch semester to get the start and end dates
@@ -856,9 +872,6 @@ class ClassScheduleViewSet(viewsets.ModelViewSet):
             start_date = semester.sem_start_date
             end_date = semester.sem_end_date
 
-            # Fetch the CustomUser instance
-            student = CustomUser.objects.get(student_id=student_id)
-
             # Fetch or create subject uniquely for this user
             subject, created = CustomSubject.objects.get_or_create(
                 subject_code=subject_code,
@@ -882,57 +895,32 @@ class ClassScheduleViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Check for overlaps on that weekday across all weeks
-            # First, get all dates in semester matching day_of_week
-            current_date = start_date
-            conflict_found = False
-            conflicting_date = None
-
-            while current_date <= end_date:
-                if current_date.weekday() == day_of_week_int:
-                    overlapping = ScheduleEntry.objects.filter(
-                        student_id=student,
-                        scheduled_date=current_date,
-                        scheduled_start_time__lt=end_time,
-                        scheduled_end_time__gt=start_time
-                    )
-                    if overlapping.exists():
-                        conflict_found = True
-                        conflicting_date = current_date
-                        break
-                current_date += timedelta(days=1)
-
-            if conflict_found:
+            # Every date in the semester falling on day_of_week, checked for
+            # overlaps with a single query over all of them
+            class_dates = weekly_dates(start_date, end_date, day_of_week_int)
+            conflicting_date = first_overlap(student_id, class_dates, start_time, end_time)
+
+            if conflicting_date:
                 return Response({
                     'error_type': 'overlap',
                     'message': f'Conflict on {conflicting_date.strftime("%Y-%m-%d")}. Please choose a different time or day.'
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Create the Class Schedule
-            class_schedule = CustomClassSchedule.objects.create(
-                subject=subject,
-                day_of_week=day_of_week,
-                scheduled_start_time=start_time,
-                scheduled_end_time=end_time,
-                room=room,
-                student_id_id=student_id,
-            )
+            with transaction.atomic():
+                # Create the Class Schedule
+                class_schedule = CustomClassSchedule.objects.create(
+                    subject=subject,
+                    day_of_week=day_of_week,
+                    scheduled_start_time=start_time,
+                    scheduled_end_time=end_time,
+                    room=room,
+                    student_id_id=student_id,
+                )
+
+                # One weekly ScheduleEntry covers every week of the semester
+                create_weekly_entry('Class', class_schedule.classsched_id, student_id, class_dates, start_time, end_time)
 
-            # Dynamically Create ScheduleEntry for Each Week of the Semester
-            current_date = start_date
-            while current_date <= end_date:
-                if current_date.weekday() == day_of_week_int:
-                    ScheduleEntry.objects.create(
-                        category_type='Class',
-                        reference_id=class_schedule.classsched_id,
-                        student_id=student,
-                        scheduled_date=current_date,
-                        scheduled_start_time=start_time,
-                        scheduled_end_time=end_time
-                    )
-                current_date += timedelta(days=1)
-
-            print(f"ScheduleEntries created successfully for class schedule!")
+            print(f"ScheduleEntry created successfully for class schedule!")
 
             # Serialize and return the created data
             serializer = self.get_serializer(class_schedule)
@@ -1000,7 +988,12 @@ class ClassScheduleViewSet(viewsets.ModelViewSet):
             instance.scheduled_start_time = data["scheduled_start_time"]
             instance.scheduled_end_time = data["scheduled_end_time"]
             instance.room = data["room"]
-            instance.save()
+
+            with transaction.atomic():
+                instance.save()
+
+                # Move the class's weekly ScheduleEntry along with it
+                sync_class_entry(instance)
 
             serializer = self.get_serializer(instance)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -1020,13 +1013,7 @@ class ClassScheduleViewSet(viewsets.ModelViewSet):
         subject = instance.subject
 
         with transaction.atomic():
-            # Delete related ScheduleEntry records manually
-            ScheduleEntry.objects.filter(
-                category_type='Class',
-                reference_id=instance.classsched_id,
-                student_id=instance.student_id
-            ).delete()
-            
+            # Its ScheduleEntry rows cascade with it
             self.perform_destroy(instance)
 
             # Check if the subject is still referenced in any other records *belonging to the same user*
@@ -1039,13 +1026,17 @@ class ClassScheduleViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 # Subject
-class SubjectViewSet(viewsets.ModelViewSet):
+class SubjectViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = CustomSubjectSerializer
+    versioned_collections = ('subjects', 'semesters')
 
     def get_queryset(self):
         # Filter subjects based on the logged-in user
-        queryset = CustomSubject.objects.filter(student_id=self.request.user.student_id)
+        queryset = select_expanded(
+            CustomSubject.objects.filter(student_id=self.request.user.student_id),
+            self.request, 'semester_id'
+        )
 
         # Apply semester_id filtering if provided in query params
         semester_id = self.request.query_params.get('semester_id')
@@ -1069,7 +1060,7 @@ class SubjectViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='(?P<subject_code>[^/.]+)')
     def get_subject_by_code(self, request, subject_code):
         try:
-            subject = CustomSubject.objects.get(
+            subject = CustomSubject.objects.select_related('semester_id').get(
                 subject_code=subject_code, 
                 student_id=request.user.student_id
             )
@@ -1079,9 +1070,10 @@ class SubjectViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Subject not found'}, status=status.HTTP_404_NOT_FOUND)
 
 # Semester
-class SemesterViewSet(viewsets.ModelViewSet):
+class SemesterViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = CustomSemesterSerializer
+    versioned_collections = ('semesters',)
 
     def get_queryset(self):
         # Retrieve semesters linked to the logged-in user
@@ -1215,13 +1207,19 @@ class SemesterViewSet(viewsets.ModelViewSet):
 
 
 # Class Attendance
-class AttendedClassViewSet(viewsets.ModelViewSet):
+class AttendedClassViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = AttendedClassSerializer
+    pagination_class = PlannerCursorPagination
+    cursor_ordering = ('attendance_date', 'pk')
+    versioned_collections = ('attended-classes', 'class-schedules', 'subjects', 'semesters')
 
     def get_queryset(self):
         # Filter attended classes based on the logged-in user
-        queryset = AttendedClass.objects.filter(classsched_id__student_id=self.request.user)
+        queryset = select_expanded(
+            AttendedClass.objects.filter(classsched_id__student_id=self.request.user),
+            self.request, 'classsched_id__subject__semester_id'
+        )
 
         # Apply date filtering if provided in query params
         start_date = self.request.query_params.get('start_date')
@@ -1296,13 +1294,18 @@ class AttendedClassViewSet(viewsets.ModelViewSet):
             )
         
 # Task
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = CustomTaskSerializer
+    pagination_class = PlannerCursorPagination
+    versioned_collections = ('tasks', 'subjects', 'semesters')
 
     def get_queryset(self):
         # Filter tasks based on the logged-in user
-        queryset = CustomTask.objects.filter(student_id=self.request.user)
+        queryset = select_expanded(
+            CustomTask.objects.filter(student_id=self.request.user),
+            self.request, 'subject_id__semester_id'
+        )
 
         # filters from query params
         start_date = self.request.query_params.get('start_date')
@@ -1316,20 +1319,20 @@ class TaskViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending_tasks(self, request):
         #Get tasks that are still pending
-        tasks = CustomTask.objects.filter(
+        tasks = select_expanded(CustomTask.objects.filter(
             student_id=request.user.student_id,
             status='Pending'
-        )
+        ), request, 'subject_id__semester_id')
         serializer = self.get_serializer(tasks, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def completed_tasks(self, request):
         #Get tasks that have been completed
-        tasks = CustomTask.objects.filter(
+        tasks = select_expanded(CustomTask.objects.filter(
             student_id=request.user.student_id,
             status='Completed'
-        )
+        ), request, 'subject_id__semester_id')
         serializer = self.get_serializer(tasks, many=True)
         return Response(serializer.data)
 
@@ -1385,14 +1388,9 @@ class TaskViewSet(viewsets.ModelViewSet):
                 )
             
             # Check for overlapping schedules
-            overlapping_schedules = ScheduleEntry.objects.filter(
-                student_id=student,
-                scheduled_date=scheduled_date
-            ).filter(
-                Q(scheduled_start_time__lt=end_time, scheduled_end_time__gt=start_time)
-            )
+            overlapping = has_overlap(student, scheduled_date, start_time, end_time)
 
-            if overlapping_schedules.exists():
+            if overlapping:
                 return Response({'error_type': 'overlap', 'message': 'This time slot is already occupied. Please choose another time.'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Create Task
@@ -1503,16 +1501,9 @@ class TaskViewSet(viewsets.ModelViewSet):
                 )
             
             # Check for overlapping schedules
-            overlapping_schedules = ScheduleEntry.objects.filter(
-                student_id=instance.student_id,
-                scheduled_date=scheduled_date
-            ).filter(
-                Q(scheduled_start_time__lt=end_time, scheduled_end_time__gt=start_time)
-            ).exclude(
-                Q(category_type='Task') & Q(reference_id=instance.task_id)  # Exclude the current task entry
-            )
+            overlapping = has_overlap(instance.student_id, scheduled_date, start_time, end_time, exclude=('Task', instance.task_id))
 
-            if overlapping_schedules.exists():
+            if overlapping:
                 return Response({'error_type': 'overlap', 'message': 'This time slot is already occupied. Please choose another time.'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Reset reminder_sent if event is moved to a future datetime
@@ -1556,13 +1547,19 @@ class TaskViewSet(viewsets.ModelViewSet):
             )
         
 # Task Time Log
-class TaskTimeLogViewSet(viewsets.ModelViewSet):
+class TaskTimeLogViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = TaskLogSerializer
+    pagination_class = PlannerCursorPagination
+    cursor_ordering = ('date_logged', 'pk')
+    versioned_collections = ('task-logs', 'tasks', 'subjects', 'semesters')
 
     def get_queryset(self):
         # Filter logged tasks based on the logged-in user
-        queryset = TaskTimeLog.objects.filter(task_id__student_id=self.request.user)
+        queryset = select_expanded(
+            TaskTimeLog.objects.filter(task_id__student_id=self.request.user),
+            self.request, 'task_id__subject_id__semester_id'
+        )
     
         # Apply date_logged filtering if provided in query params
         start_date = self.request.query_params.get('start_date')
@@ -1639,12 +1636,16 @@ class TaskTimeLogViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # Goals
-class GoalViewSet(viewsets.ModelViewSet):
+class GoalViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = GoalsSerializer
+    versioned_collections = ('goals', 'semesters')
 
     def get_queryset(self):
-        return Goals.objects.filter(student_id=self.request.user)
+        return select_expanded(
+            Goals.objects.filter(student_id=self.request.user),
+            self.request, 'semester_id'
+        )
 
     @action(detail=False, methods=['post'])
     def add_goal(self, request):
@@ -1796,13 +1797,18 @@ class GoalViewSet(viewsets.ModelViewSet):
             )
         
 # Goal Schedule
-class GoalScheduleViewSet(viewsets.ModelViewSet):
+class GoalScheduleViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = GoalScheduleSerializer
+    pagination_class = PlannerCursorPagination
+    versioned_collections = ('goal-schedules', 'goals', 'semesters')
 
     def get_queryset(self):
         # Filter goal schedule based on the logged-in user
-        queryset = GoalSchedule.objects.filter(goal_id__student_id=self.request.user)
+        queryset = select_expanded(
+            GoalSchedule.objects.filter(goal_id__student_id=self.request.user),
+            self.request, 'goal_id__semester_id'
+        )
 
         # Apply goal_id filtering if provided in query params
         goal_id = self.request.query_params.get('goal_id')
@@ -1814,20 +1820,20 @@ class GoalScheduleViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def pending_goal_schedules(self, request):
         # Get goal schedules that are still pending
-        schedules = GoalSchedule.objects.filter(
+        schedules = select_expanded(GoalSchedule.objects.filter(
             goal_id__student_id=request.user.student_id,
             status='Pending'
-        )
+        ), request, 'goal_id__semester_id')
         serializer = self.get_serializer(schedules, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def completed_goal_schedules(self, request):
         # Get goal schedules that have been completed
-        schedules = GoalSchedule.objects.filter(
+        schedules = select_expanded(GoalSchedule.objects.filter(
             goal_id__student_id=request.user.student_id,
             status='Completed'
-        )
+        ), request, 'goal_id__semester_id')
         serializer = self.get_serializer(schedules, many=True)
         return Response(serializer.data)
 
@@ -1837,12 +1843,40 @@ class GoalScheduleViewSet(viewsets.ModelViewSet):
 
         # ✅ Support both single and batch payloads
         if isinstance(data, list):
+            slots = [
+                (entry.get('scheduled_date'), entry.get('scheduled_start_time'), entry.get('scheduled_end_time'))
+                for entry in data
+            ]
+            if not all(all(slot) for slot in slots):
+                return Response(
+                    {'error': 'All fields are required except student_id.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            # Validate the whole batch (against the schedule and against itself) in one query
+            try:
+                clashing = set(find_conflicts(request.user.student_id, slots)) | overlaps_within(slots)
+            except ValidationError as ve:
+                return Response({'error': str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if clashing:
+                return Response(
+                    {
+                        'error_type': 'overlap',
+                        'message': 'This time slot is already occupied. Please choose another time.',
+                        'conflicts': sorted(clashing)
+                    },
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             created_schedules = []
-            for entry in data:
-                result = self._create_goal_schedule(entry, request)
-                if isinstance(result, Response):
-                    return result  # Stop if an error occurs
-                created_schedules.append(result)
+            with transaction.atomic():
+                for entry in data:
+                    result = self._create_goal_schedule(entry, request, check_overlap=False)
+                    if isinstance(result, Response):
+                        transaction.set_rollback(True)
+                        return result  # Stop if an error occurs
+                    created_schedules.append(result)
 
             serializer = self.get_serializer(created_schedules, many=True)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -1855,7 +1889,7 @@ class GoalScheduleViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     # 🧩 helper function to handle creation logic for single entries
-    def _create_goal_schedule(self, data, request):
+    def _create_goal_schedule(self, data, request, check_overlap=True):
         goal_id = data.get('goal_id')
         scheduled_date = data.get('scheduled_date')
         scheduled_start_time = data.get('scheduled_start_time')
@@ -1886,16 +1920,10 @@ class GoalScheduleViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Prevent overlaps
-            overlapping_schedules = ScheduleEntry.objects.filter(
-                student_id=student,
-                scheduled_date=scheduled_date
-            ).filter(
-                Q(scheduled_start_time__lt=scheduled_end_time,
-                  scheduled_end_time__gt=scheduled_start_time)
-            )
+            # Prevent overlaps (batches are checked up front in add_schedule)
+            overlapping = check_overlap and has_overlap(student, scheduled_date, scheduled_start_time, scheduled_end_time)
 
-            if overlapping_schedules.exists():
+            if overlapping:
                 return Response(
                     {
                         'error_type': 'overlap',
@@ -1974,16 +2002,9 @@ class GoalScheduleViewSet(viewsets.ModelViewSet):
                 )
 
             # Check for overlapping schedules
-            overlapping_schedules = ScheduleEntry.objects.filter(
-                student_id=student,
-                scheduled_date=scheduled_date
-            ).filter(
-                Q(scheduled_start_time__lt=scheduled_end_time, scheduled_end_time__gt=scheduled_start_time)
-            ).exclude(
-                Q(category_type='Goal') & Q(reference_id=instance.goalschedule_id)  # Exclude the current goal schedule entry
-            )
+            overlapping = has_overlap(student, scheduled_date, scheduled_start_time, scheduled_end_time, exclude=('Goal', instance.goalschedule_id))
 
-            if overlapping_schedules.exists():
+            if overlapping:
                 return Response({'error_type': 'overlap', 'message': 'This time slot is already occupied. Please choose another time.'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Update the task instance
@@ -2018,13 +2039,19 @@ class GoalScheduleViewSet(viewsets.ModelViewSet):
             )
 
 # Goal Progress
-class GoalProgressViewSet(viewsets.ModelViewSet):
+class GoalProgressViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = GoalProgressSerializer
+    pagination_class = PlannerCursorPagination
+    cursor_ordering = ('session_date', 'pk')
+    versioned_collections = ('goal-progress', 'goal-schedules', 'goals', 'semesters')
 
     def get_queryset(self):
         # Filter logged goal sessions based on the logged-in user
-        queryset = GoalProgress.objects.filter(goal_id__student_id=self.request.user)
+        queryset = select_expanded(
+            GoalProgress.objects.filter(goal_id__student_id=self.request.user),
+            self.request, 'goal_id__semester_id', 'goalschedule_id__goal_id__semester_id'
+        )
 
         # Apply goal_id and date_logged filtering if provided in query params
         goal_id = self.request.query_params.get('goal_id')
@@ -2118,9 +2145,12 @@ class GoalProgressViewSet(viewsets.ModelViewSet):
                             status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 #Sleep
-class SleepLogViewSet(viewsets.ModelViewSet):
+class SleepLogViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = SleepLogSerializer
+    pagination_class = PlannerCursorPagination
+    cursor_ordering = ('date_logged', 'pk')
+    versioned_collections = ('sleep-logs',)
 
     def get_queryset(self):
         # Filter logged sleep sessions based on the logged-in user
@@ -2189,13 +2219,93 @@ class SleepLogViewSet(viewsets.ModelViewSet):
 
 
 # Schedule Entry
-class ScheduleEntryViewSet(viewsets.ModelViewSet):
+class ScheduleEntryViewSet(VersionedResponseMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
     serializer_class = ScheduleEntrySerializer
+    pagination_class = PlannerCursorPagination
+    versioned_collections = (
+        'schedule', 'tasks', 'events', 'activities', 'goal-schedules', 'goals', 'class-schedules', 'subjects'
+    )
 
     def get_queryset(self):
         return ScheduleEntry.objects.filter(student_id=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        # Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD window; weekly entries are
+        # expanded into their occurrences only for the dates being read
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+
+        try:
+            start = date.fromisoformat(start) if start else None
+            end = date.fromisoformat(end) if end else None
+        except ValueError:
+            return Response({"error": "start and end must be YYYY-MM-DD dates"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        entries = self.get_queryset()
+        if start and end:
+            entries = entries.between(start, end)
+        entries = entries.prefetch_related('exceptions')
+
+        # Pages (when asked for) are cut on stored entries, each expanded in
+        # place; a page stops before its occurrences would pass page_size
+        self.window = (start, end)
+        page = self.paginate_queryset(entries)
+        if page is not None:
+            serializer = self.get_serializer(expand_entries(page, start, end), many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(expand_entries(entries, start, end), many=True)
+        return Response(serializer.data)
+
+    def cursor_weight(self, entry):
+        # Results a stored entry expands into on a page
+        return len(entry.occurrences(*self.window))
+
+    def update(self, request, *args, **kwargs):
+        # Occurrences share their series' entry_id: an edit of "this date"
+        # would rewrite every week, so only the whole series can be updated
+        if request.query_params.get('date') and self.get_object().recurrence == 'Weekly':
+            return Response({"error": "Occurrences of a weekly entry cannot be updated one by one; "
+                                      "update the series or skip the date."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return super().update(request, *args, **kwargs)
+
+    def destroy(self, request, *args, **kwargs):
+        # ?date= on a weekly entry deletes that one occurrence; the whole
+        # series only goes with an explicit ?series=1, never by default
+        entry = self.get_object()
+        if entry.recurrence == 'Weekly':
+            if request.query_params.get('date'):
+                return self.skip_occurrence(entry, request.query_params.get('date'))
+            if request.query_params.get('series') not in ('1', 'true'):
+                return Response({"error": "Deleting a weekly entry needs ?date=YYYY-MM-DD for one occurrence "
+                                          "or ?series=1 for the whole series."},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return super().destroy(request, *args, **kwargs)
+
+    @action(detail=True, methods=['post'])
+    def skip_date(self, request, pk=None):
+        """Skip a single occurrence of a weekly entry (e.g. a holiday)"""
+        return self.skip_occurrence(self.get_object(), request.data.get('date'))
+
+    def skip_occurrence(self, entry, skip):
+        if entry.recurrence != 'Weekly':
+            return Response({"error": "Only weekly entries can skip dates."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            skip = date.fromisoformat(skip)
+        except (TypeError, ValueError):
+            return Response({"error": "date must be a YYYY-MM-DD date"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if skip not in entry.occurrences(skip, skip):
+            return Response({"error": "The entry does not occur on that date."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        ScheduleEntryException.objects.get_or_create(entry=entry, exception_date=skip)
+        return Response({"skipped": skip.isoformat()}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['delete'])
     def delete_filtered(self, request):
         category_type = request.query_params.get('category_type')
@@ -2213,6 +2323,12 @@ class ScheduleEntryViewSet(viewsets.ModelViewSet):
 
         return Response({"deleted": deleted_count}, status=status.HTTP_200_OK)
     
+    def with_related(self, entries):
+        # Join every kind of linked item so related_info() never queries per entry
+        return entries.select_related(
+            'task_id', 'event_id', 'activity_id', 'goalschedule_id__goal_id', 'classsched_id__subject'
+        ).prefetch_related('exceptions')
+
     @action(detail=False, methods=['get'])
     def filter(self, request):
         category_type = request.query_params.get('category_type')
@@ -2224,60 +2340,12 @@ class ScheduleEntryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        entries = ScheduleEntry.objects.filter(
+        entries = expand_entries(self.with_related(ScheduleEntry.objects.filter(
             student_id=request.user,
             category_type=category_type,
             reference_id=reference_id
-        )
-
-        # --- Fetch related object details ---
-        try:
-            if category_type == "Event":
-                from .models import CustomEvents
-                event = CustomEvents.objects.filter(event_id=reference_id).values("event_name").first()
-                if event:
-                    related_info = {"name": event["event_name"], "status": None}
-
-            elif category_type == "Task":
-                from .models import CustomTask
-                task = CustomTask.objects.filter(task_id=reference_id).values("task_name", "status").first()
-                if task:
-                    related_info = {"name": task["task_name"], "status": task["status"]}
-
-            elif category_type == "Activity":
-                from .models import CustomActivity
-                activity = CustomActivity.objects.filter(activity_id=reference_id).values("activity_name", "status").first()
-                if activity:
-                    related_info = {"name": activity["activity_name"], "status": activity["status"]}
-
-            elif category_type == "Goal":
-                from .models import GoalSchedule
-                goal_sched = (
-                    GoalSchedule.objects.filter(goalschedule_id=reference_id)
-                    .select_related("goal_id")
-                    .first()
-                )
-                if goal_sched:
-                    related_info = {
-                        "name": goal_sched.goal_id.goal_name,
-                        "status": goal_sched.status,
-                    }
-
-            elif category_type == "Class":
-                from .models import CustomClassSchedule
-                class_sched = (
-                    CustomClassSchedule.objects.filter(classsched_id=reference_id)
-                    .select_related("subject")
-                    .first()
-                )
-                if class_sched:
-                    related_info = {
-                        "name": class_sched.subject.subject_code,
-                        "status": None,
-                    }
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        )))
+        related_info = entries[0].related_info() if entries else {"name": "Unknown", "status": None}
 
         serializer = self.get_serializer(entries, many=True)
         return Response(
@@ -2292,7 +2360,7 @@ class ScheduleEntryViewSet(viewsets.ModelViewSet):
     def bulk_filter(self, request):
         """
         Accepts a list of {category_type, reference_id} objects in the request body.
-        Returns related_info + entries for each pair.
+        Returns related_info + entries for each pair, read with one joined query.
         """
         data = request.data.get('filters', [])
         if not isinstance(data, list) or not data:
@@ -2301,69 +2369,26 @@ class ScheduleEntryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        results = []
-
-        for item in data:
-            category_type = item.get('category_type')
-            reference_id = item.get('reference_id')
-            if not category_type or not reference_id:
-                continue
-
-            entries = ScheduleEntry.objects.filter(
-                student_id=request.user,
-                category_type=category_type,
-                reference_id=reference_id
-            )
-
-            related_info = {"name": "Unknown", "status": None}
-
-            try:
-                if category_type == "Event":
-                    from .models import CustomEvents
-                    event = CustomEvents.objects.filter(event_id=reference_id).values("event_name").first()
-                    if event:
-                        related_info = {"name": event["event_name"], "status": None}
-
-                elif category_type == "Task":
-                    from .models import CustomTask
-                    task = CustomTask.objects.filter(task_id=reference_id).values("task_name", "status").first()
-                    if task:
-                        related_info = {"name": task["task_name"], "status": task["status"]}
-
-                elif category_type == "Activity":
-                    from .models import CustomActivity
-                    activity = CustomActivity.objects.filter(activity_id=reference_id).values("activity_name", "status").first()
-                    if activity:
-                        related_info = {"name": activity["activity_name"], "status": activity["status"]}
-
-                elif category_type == "Goal":
-                    from .models import GoalSchedule
-                    goal_sched = (
-                        GoalSchedule.objects.filter(goalschedule_id=reference_id)
-                        .select_related("goal_id")
-                        .first()
-                    )
-                    if goal_sched:
-                        related_info = {
-                            "name": goal_sched.goal_id.goal_name,
-                            "status": goal_sched.status,
-                        }
-
-                elif category_type == "Class":
-                    from .models import CustomClassSchedule
-                    class_sched = (
-                        CustomClassSchedule.objects.filter(classsched_id=reference_id)
-                        .select_related("subject")
-                        .first()
-                    )
-                    if class_sched:
-                        related_info = {
-                            "name": class_sched.subject.subject_code,
-                            "status": None,
-                        }
+        pairs = [
+            (item.get('category_type'), item.get('reference_id')) for item in data
+            if item.get('category_type') and item.get('reference_id')
+        ]
+        if not pairs:
+            return Response([], status=status.HTTP_200_OK)
+
+        match = Q()
+        for category_type, reference_id in pairs:
+            match |= Q(category_type=category_type, reference_id=reference_id)
+        entries_by_pair = defaultdict(list)
+        for entry in expand_entries(self.with_related(
+            ScheduleEntry.objects.filter(match, student_id=request.user)
+        )):
+            entries_by_pair[(entry.category_type, str(entry.reference_id))].append(entry)
 
-            except Exception as e:
-                related_info = {"name": "Error: " + str(e), "status": None}
+        results = []
+        for category_type, reference_id in pairs:
+            entries = entries_by_pair[(category_type, str(reference_id))]
+            related_info = entries[0].related_info() if entries else {"name": "Unknown", "status": None}
 
             serializer = self.get_serializer(entries, many=True)
             results.append({
@@ -2424,62 +2449,150 @@ class YourUserViewSet(viewsets.ModelViewSet):
         )
         return Response({"status": "Push triggered"}, status=200)
     
-class DashboardAPIView(APIView):
+class DashboardAPIView(VersionedResponseMixin, APIView):
+    """
+    GET /api/dashboard/: the student's counts, plus the widgets listed in
+    ?widgets= (see dashboard.DASHBOARD_WIDGETS), built in a single query
+    """
     permission_classes = [permissions.IsAuthenticated]
 
-    def get_most_recent_semester_id(self, user):
-        # choose most recent sem that already started; fallback to latest
-        sems = CustomSemester.objects.filter(student_id=user.student_id).order_by('-sem_start_date')
-        today = date.today()
-        recent = sems.filter(sem_start_date__lte=today).first()
-        if recent:
-            return recent.semester_id
-        fallback = sems.first()
-        return fallback.semester_id if fallback else None
+    def requested_widgets(self):
+        widgets = self.request.query_params.get('widgets', '')
+        return sorted({widget.strip() for widget in widgets.split(',') if widget.strip()})
+
+    @property
+    def versioned_collections(self):
+        return dashboard_collections(
+            widget for widget in self.requested_widgets() if widget in DASHBOARD_WIDGETS
+        )
 
     def get(self, request, format=None):
         user = request.user
         if user.is_anonymous:
             return Response({'detail': 'Authentication required.'}, status=status.HTTP_401_UNAUTHORIZED)
 
+        widgets = self.requested_widgets()
+        unknown = [widget for widget in widgets if widget not in DASHBOARD_WIDGETS]
+        if unknown:
+            return Response({'detail': f"Unknown widgets: {', '.join(unknown)}",
+                             'widgets': list(DASHBOARD_WIDGETS)}, status=status.HTTP_400_BAD_REQUEST)
+
+        variant = ','.join(widgets)
+        cached, generation = get_cached_dashboard(user.student_id, variant)
+        if cached is not None:
+            return Response(cached, status=status.HTTP_200_OK, headers={'X-Cache': 'HIT'})
+
         try:
-            # Most recent semester
-            selected_semester_id = self.get_most_recent_semester_id(user)
-
-            # Counts
-            class_schedule_count = CustomClassSchedule.objects.filter(
-                student_id=user.student_id,
-                subject__semester_id=selected_semester_id if selected_semester_id else None
-            ).count()
-
-            pending_tasks_count = CustomTask.objects.filter(
-                student_id=user.student_id,
-                status='Pending'
-            ).count()
-
-            upcoming_events_count = CustomEvents.objects.filter(
-                student_id=user.student_id,
-                scheduled_date__gte=now().date()
-            ).count()
-
-            pending_activities_count = CustomActivity.objects.filter(
-                student_id=user.student_id,
-                status='Pending'
-            ).count()
-
-            goals_count = Goals.objects.filter(student_id=user.student_id).count()
-
-            data = {
-                'selected_semester_id': selected_semester_id,
-                'class_schedule_count': class_schedule_count,
-                'pending_tasks_count': pending_tasks_count,
-                'upcoming_events_count': upcoming_events_count,
-                'pending_activities_count': pending_activities_count,
-                'goals_count': goals_count,
-            }
-
-            return Response(data, status=status.HTTP_200_OK)
+            data = build_dashboard(user.student_id, widgets)
+            cache_dashboard(user.student_id, generation, data, variant)
+            return Response(data, status=status.HTTP_200_OK, headers={'X-Cache': 'MISS'})
 
         except Exception as e:
             return Response({'detail': 'Error assembling dashboard', 'error': str(e)},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class DashboardCacheStatsAPIView(APIView):
+    """GET /api/dashboard/cache-stats/: dashboard cache hits, misses and hit rate (staff only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, format=None):
+        return Response(dashboard_cache_stats(), status=status.HTTP_200_OK)
+
+
+class ReportsAPIView(APIView):
+    """
+    GET /api/reports/?start=YYYY-MM-DD&end=YYYY-MM-DD
+    Optional: group_by=day|month, categories=tasks,events,...,
+    previous_start/previous_end (defaults to the same-length period before start)
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        params = request.query_params
+        try:
+            start = date.fromisoformat(params['start'])
+            end = date.fromisoformat(params['end'])
+            if params.get('previous_start') and params.get('previous_end'):
+                previous_start = date.fromisoformat(params['previous_start'])
+                previous_end = date.fromisoformat(params['previous_end'])
+            else:
+                previous_start, previous_end = previous_range(start, end)
+        except (KeyError, ValueError):
+            return Response({'error': 'start and end must be YYYY-MM-DD dates'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({'error': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+
+        group_by = params.get('group_by', 'day')
+        categories = params.get('categories')
+        categories = categories.split(',') if categories else REPORT_CATEGORIES
+        if group_by not in GROUPINGS or not set(categories) <= set(REPORT_CATEGORIES):
+            return Response({'error': f"group_by must be one of {', '.join(GROUPINGS)} and categories "
+                                      f"one of {', '.join(REPORT_CATEGORIES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        report = build_report(
+            request.user.student_id, start, end, previous_start, previous_end, group_by, categories
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class SyncAPIView(APIView):
+    """
+    GET /api/sync/?since=<cursor>
+    Rows created or updated and ids deleted since the cursor returned by the
+    previous sync. Without ?since= (or with an expired cursor) every row is
+    sent and "full" is true. Nested relations are sent as ids unless listed
+    in ?expand=.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        since = request.query_params.get('since')
+        try:
+            since = decode_cursor(since) if since else None
+        except ValueError:
+            return Response({'error': 'since must be a cursor returned by /api/sync/'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        context = {'request': request, 'expand': expanded_paths(request) or set()}
+        return Response(sync_changes(request.user.student_id, since, context), status=status.HTTP_200_OK)
+
+
+class BatchAPIView(APIView):
+    """
+    POST /api/batch/
+    {"operations": [{"op": "create" | "update" | "delete",
+                     "type": "task" | "activity" | "event" | "goal_schedule",
+                     "id": <row id, for update/delete>, "ref": <client id, echoed back>,
+                     "data": {<fields>}}, ...],
+     "atomic": true}
+    Updates only need the fields that change. With atomic (the default)
+    nothing is written unless every operation is valid; with "atomic": false
+    the valid ones are written and the rest reported. Each operation gets a
+    result in "results", in request order.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, format=None):
+        data = request.data
+        operations = data if isinstance(data, list) else data.get('operations')
+        if not isinstance(operations, list) or not operations:
+            return Response({'error': 'operations must be a non-empty list.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return Response({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        atomic = True if isinstance(data, list) else data.get('atomic', True) is not False
+
+        context = {'request': request, 'expand': set()}
+        try:
+            applied, results = WriteBatch(request.user, operations).run(atomic=atomic, context=context)
+        except IntegrityError:
+            return Response({'error': 'A database integrity error occurred.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        print(f"[BATCH] {len(operations)} operations for {request.user.student_id}, applied={applied}")
+        return Response(
+            {'applied': applied, 'results': results},
+            status=status.HTTP_200_OK if applied else status.HTTP_400_BAD_REQUEST
+        )
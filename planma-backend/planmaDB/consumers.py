@@ -1,31 +1,39 @@
+import asyncio
 import json 
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.utils import timezone
-from django.utils.timezone import now
-import asyncio
-from datetime import timedelta
-from channels.db import database_sync_to_async
-import redis
-from django.conf import settings
+from api.inapp import reminder_group
+from api.presence import set_foreground_status
+
+# Reminders reaching a socket within this many seconds go out together
+FRAME_WINDOW = 0.2
 
-def get_redis_connection():
+class ReminderConsumer(AsyncWebsocketConsumer):
     """
-    Lazily initializes Redis connection only when needed.
-    This prevents startup errors if settings aren't fully loaded yet.
+    Push-only: reminders arrive from the Celery scheduler through group_send,
+    and the connection does no work of its own while idle. Presence lives in
+    Redis with a TTL (presence.PRESENCE_TTL) that the client's frames keep
+    alive; a client that goes quiet is treated as backgrounded and gets FCM.
+
+    Reminders are held for FRAME_WINDOW and then written together. Clients
+    that connect with ?batch=1 get them as one 'reminders' frame; others get
+    the original one 'reminder' frame each.
     """
-    return redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
 
-class ReminderConsumer(AsyncWebsocketConsumer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._reminder_task = None  # Store task reference
         self.student_id = None
         self.room_group_name = None
+        self.foreground = False
+        self.batch_frames = False
+        self.pending_reminders = []
+        self._flush_task = None
 
     async def connect(self):
-        # print(self.scope['url_route']['kwargs']['student_id'])
         self.student_id = self.scope['url_route']['kwargs']['student_id']
-        self.room_group_name = f"user_{self.student_id}"
+        self.room_group_name = reminder_group(self.student_id)
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        self.batch_frames = query.get('batch', ['0'])[0] == '1'
 
         # On connect, assume foreground
         await self.set_foreground_status(True)
@@ -37,101 +45,61 @@ class ReminderConsumer(AsyncWebsocketConsumer):
         )
 
         await self.accept()
-        # Start the periodic reminder task and store it
-        self._reminder_task = asyncio.create_task(self.periodic_reminder_check())
-    
+
     async def disconnect(self, close_code):
+        if self._flush_task:
+            self._flush_task.cancel()
         await self.set_foreground_status(False)
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
 
-        if self._reminder_task:
-            self._reminder_task.cancel()
-            try:
-                await self._reminder_task
-            except asyncio.CancelledError:
-                print(f"[WS] Cancelled periodic task for {self.student_id}")
-
     # Receive message from WebSocket (from client)
     async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message_type = text_data_json.get('type')
+        try:
+            text_data_json = json.loads(text_data)
+            message_type = text_data_json.get('type')
+        except (ValueError, AttributeError):
+            return
 
-        # Refresh TTL and update foreground/background state
+        # Foreground/background switch from the app lifecycle
         if message_type == 'status_update':
             foreground = text_data_json.get('foreground', False)
             await self.set_foreground_status(foreground)
             print(f"[WS] Foreground status updated for {self.student_id}: {foreground}")
-        elif message_type == 'check_reminders':
-            await self.check_reminders()
+        # Heartbeat: refresh the presence TTL. Older apps send check_reminders
+        # once per connection instead; due reminders are pushed by the scheduler.
+        elif message_type in ('heartbeat', 'check_reminders') and self.foreground:
+            await self.set_foreground_status(True)
 
     async def set_foreground_status(self, foreground: bool):
-        r = get_redis_connection()
-        key = f"user_online:{self.student_id}"
-        if foreground:
-            r.set(key, json.dumps({
-                    "last_seen": now().isoformat(),
-                    "foreground": True
-            }), ex=300)
-        else:
-            r.delete(key)
-
-    # Send reminder to WebSocket
+        # Shared async Redis pool, so the heartbeat never blocks the event loop
+        self.foreground = foreground
+        await set_foreground_status(self.student_id, foreground)
+
+    # One reminder from the channel layer
     async def reminder_notification(self, event):
-        print(f"[WS] Sending reminder via WebSocket to {self.student_id}: {event}")
-
-        reminder_type = event['reminder_type']
-        reminder = event['reminder']
-
-        # Send message to WebSocket
-        await self.send(
-            text_data=json.dumps({
-                'type': 'reminder',
-                'reminder_type': reminder_type,
-                'reminder': reminder
-            })
-        )
-    
-    # Periodic check for reminders
-    async def periodic_reminder_check(self):
-        while True:
-            try:
-                start = timezone.now()
-                await self.set_foreground_status(True)
-                print(f"[WS] TTL/foreground refreshed for {self.student_id}")
-                await self.check_reminders()
-
-                # Calculate time taken and adjust sleep to keep interval consistent
-                elapsed = (timezone.now() - start).total_seconds()
-                await asyncio.sleep(max(60 - elapsed, 0))
-            except asyncio.CancelledError:
-                print(f"[WS] Stopping reminder loop for {self.student_id}")
-                break
-
-    async def check_reminders(self):
-        # Check all reminder types
-        await self.check_sleep_reminders()
-    
-    @database_sync_to_async
-    def check_sleep_reminders(self):
-        from api.utilities import get_sleep_reminders
-        return [
-                {
-                    'sleep_time': "7:10PM",
-                    'message': "Time to prepare for sleep soon!"
-                }
-            ]
-        # return get_sleep_reminders(self.student_id)
-
-
-    # Receive message from room group
-    """ async def reminder_message(self, event):
-        message = event['message']
-
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'type': 'reminder',
-            'message': "Wake UP!"
-        })) """
\ No newline at end of file
+        self.queue_reminders([{'reminder_type': event['reminder_type'], 'reminder': event['reminder']}])
+
+    # A tick's reminders for this student (api.inapp.InAppDispatcher)
+    async def reminder_batch(self, event):
+        self.queue_reminders(event['reminders'])
+
+    def queue_reminders(self, reminders):
+        # The flush timer only exists while reminders are waiting
+        self.pending_reminders.extend(reminders)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self.flush_reminders())
+
+    async def flush_reminders(self):
+        await asyncio.sleep(FRAME_WINDOW)
+        reminders, self.pending_reminders = self.pending_reminders, []
+        self._flush_task = None
+        print(f"[WS] Sending {len(reminders)} reminders via WebSocket to {self.student_id}")
+
+        if self.batch_frames:
+            await self.send(text_data=json.dumps({'type': 'reminders', 'reminders': reminders}))
+            return
+        for reminder in reminders:
+            await self.send(text_data=json.dumps({'type': 'reminder', **reminder}))
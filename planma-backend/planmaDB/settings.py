@@ -124,6 +124,26 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache (per-student collection versions). Redis when REDIS_URL is
+# set, so every worker sees the same versions; a per-process memory cache
+# for local runs and tests.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+            "KEY_PREFIX": "planma",
+            # Upstash rediss:// with SSL
+            "OPTIONS": {"ssl_cert_reqs": ssl.CERT_NONE} if REDIS_URL.startswith("rediss://") else {},
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
 
 DJOSER = {
     "SERIALIZERS": {
@@ -271,23 +291,44 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Manila'
-CELERY_WORKER_POOL = 'solo'
-CELERY_WORKER_CONCURRENCY = 4
+# prefork, so the reminder shards run side by side (solo ignores the
+# concurrency; Windows development machines can set CELERY_WORKER_POOL=solo)
+CELERY_WORKER_POOL = os.getenv("CELERY_WORKER_POOL", "prefork")
+CELERY_WORKER_CONCURRENCY = int(os.getenv("CELERY_WORKER_CONCURRENCY", "4"))
+
+# Students are hash-partitioned into this many shards per reminder tick
+REMINDER_SHARDS = int(os.getenv("REMINDER_SHARDS", "8"))
 
 CELERY_BEAT_SCHEDULE = {
     'check-reminders-every-minute': {
         'task': 'api.tasks.send_all_reminders',
         'schedule': crontab(minute='*'),
-    }
+    },
+    # Repairs the reminder schedule for rows written outside the ORM signals
+    'rebuild-reminder-schedule-nightly': {
+        'task': 'api.tasks.rebuild_reminders',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    # Same for the daily time-log rollups the reports read
+    'rebuild-time-rollups-nightly': {
+        'task': 'api.tasks.rebuild_time_rollups',
+        'schedule': crontab(hour=3, minute=30),
+    },
+    'prune-sync-tombstones-nightly': {
+        'task': 'api.tasks.prune_sync_tombstones',
+        'schedule': crontab(hour=3, minute=45),
+    },
 }
 
-# For Upstash rediss:// with SSL
-CELERY_BROKER_TRANSPORT_OPTIONS = {
-    'ssl_cert_reqs': ssl.CERT_NONE
-}
-CELERY_REDIS_BACKEND_USE_SSL = {
-    'ssl_cert_reqs': ssl.CERT_NONE
-}
+# For Upstash rediss:// with SSL (the result backend refuses SSL options on a
+# plain redis:// URL, e.g. a local Redis)
+if REDIS_URL.startswith("rediss://"):
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        'ssl_cert_reqs': ssl.CERT_NONE
+    }
+    CELERY_REDIS_BACKEND_USE_SSL = {
+        'ssl_cert_reqs': ssl.CERT_NONE
+    }
 
 
 # Logging
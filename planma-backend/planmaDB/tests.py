@@ -1,31 +1,184 @@
-# myapp/tests.py
-from django.test import TestCase
-from channels.testing import WebsocketCommunicator
-from myproject.asgi import application
 import asyncio
+import gc
+import time
+from unittest import mock
+
+from channels.layers import InMemoryChannelLayer, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+
+from planmaDB.asgi import application
+
+IN_MEMORY_LAYER = {'default': {'BACKEND': 'planmaDB.tests.UnsweptChannelLayer'}}
+
+
+class UnsweptChannelLayer(InMemoryChannelLayer):
+    """
+    In-memory layer without the expiry sweep, which walks every channel and
+    group on each call. channels_redis has no such cost, so left in, the
+    sweep would be what a load test measures.
+    """
+
+    def _clean_expired(self):
+        pass
+
+
+class FakeRedis:
+    """Presence store with a network round trip of `latency` seconds per command"""
+
+    def __init__(self, latency=0.001, blocking=False):
+        self.latency = latency
+        self.blocking = blocking
+        self.keys = {}
+
+    async def _round_trip(self):
+        if self.blocking:
+            # What the old per-call synchronous client did to the event loop
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+
+    async def set(self, key, value, ex=None):
+        await self._round_trip()
+        self.keys[key] = value
+
+    async def delete(self, key):
+        await self._round_trip()
+        self.keys.pop(key, None)
+
+
+def connect(student_id, query=''):
+    return WebsocketCommunicator(application, f'/ws/reminders/{student_id}/{query}')
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class ReminderConsumerTests(SimpleTestCase):
+    """The reminder socket only reacts to client frames and group_send"""
+
+    async def test_presence_follows_client_frames(self):
+        with mock.patch('planmaDB.consumers.set_foreground_status', new=mock.AsyncMock()) as presence:
+            communicator = connect('student-1')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            presence.assert_awaited_once_with('student-1', True)
+
+            # No timer of its own: nothing happens until the client speaks
+            self.assertTrue(await communicator.receive_nothing(timeout=0.2))
+            self.assertEqual(presence.await_count, 1)
+
+            await communicator.send_json_to({'type': 'heartbeat'})
+            await communicator.send_json_to({'type': 'status_update', 'foreground': False})
+            # Backgrounded: a heartbeat must not mark the app foreground again
+            await communicator.send_json_to({'type': 'heartbeat'})
+            await communicator.receive_nothing(timeout=0.1)
+            self.assertEqual([call.args for call in presence.await_args_list],
+                             [('student-1', True), ('student-1', True), ('student-1', False)])
+
+            await communicator.disconnect()
+            self.assertEqual(presence.await_args_list[-1].args, ('student-1', False))
+
+    async def test_reminders_arrive_through_group_send(self):
+        with mock.patch('planmaDB.consumers.set_foreground_status', new=mock.AsyncMock()):
+            communicator = connect('student-1')
+            await communicator.connect()
+            await get_channel_layer().group_send('user_student-1', {
+                'type': 'reminder_notification', 'reminder_type': 'task', 'reminder': {'task_id': 1},
+            })
+            self.assertEqual(await communicator.receive_json_from(), {
+                'type': 'reminder', 'reminder_type': 'task', 'reminder': {'task_id': 1},
+            })
+            await communicator.disconnect()
+
+    async def send_tick(self, student_id):
+        layer = get_channel_layer()
+        await layer.group_send(f'user_{student_id}', {
+            'type': 'reminder_batch', 'reminders': [
+                {'reminder_type': 'task', 'reminder': {'id': 1}},
+                {'reminder_type': 'class', 'reminder': {'id': 2}},
+            ],
+        })
+        await layer.group_send(f'user_{student_id}', {
+            'type': 'reminder_notification', 'reminder_type': 'wake', 'reminder': 'Good morning!',
+        })
+
+    async def test_reminders_within_the_window_share_a_frame(self):
+        with mock.patch('planmaDB.consumers.set_foreground_status', new=mock.AsyncMock()):
+            communicator = connect('student-1', '?batch=1')
+            await communicator.connect()
+            await self.send_tick('student-1')
+            frame = await communicator.receive_json_from()
+            self.assertEqual(frame['type'], 'reminders')
+            self.assertEqual([reminder['reminder_type'] for reminder in frame['reminders']], ['task', 'class', 'wake'])
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+
+    async def test_clients_without_batch_get_one_frame_per_reminder(self):
+        with mock.patch('planmaDB.consumers.set_foreground_status', new=mock.AsyncMock()):
+            communicator = connect('student-1')
+            await communicator.connect()
+            await self.send_tick('student-1')
+            frames = [await communicator.receive_json_from() for _ in range(3)]
+            self.assertEqual([frame['type'] for frame in frames], ['reminder'] * 3)
+            self.assertEqual(frames[2], {'type': 'reminder', 'reminder_type': 'wake', 'reminder': 'Good morning!'})
+            await communicator.disconnect()
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class ReminderConsumerLoadTests(SimpleTestCase):
+    """
+    Event-loop latency while thousands of in-process sockets connect, send a
+    heartbeat and disconnect. Presence writes go to a fake Redis with a 1 ms
+    round trip; a probe coroutine records how late the loop wakes it up.
+    The garbage collector is paused while measuring: its full collections
+    walk every live object, test clients included, and would otherwise
+    dominate the numbers.
+    """
+    SOCKETS = 2000
+    # Sockets arriving together, like a reconnect wave after a deploy
+    WAVE = 100
+    LATENCY = 0.001
+
+    async def _probe(self, stop, lags):
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            started = loop.time()
+            await asyncio.sleep(0.005)
+            lags.append(loop.time() - started - 0.005)
+
+    async def _run_in_waves(self, communicators, step):
+        for start in range(0, len(communicators), self.WAVE):
+            await asyncio.gather(*(step(communicator) for communicator in communicators[start:start + self.WAVE]))
+
+    async def measure(self, sockets, redis):
+        """(p99, max) event-loop lag in seconds over the whole run"""
+        stop, lags = asyncio.Event(), []
+        gc.disable()
+        try:
+            with mock.patch('api.presence.get_async_redis', return_value=redis):
+                probe = asyncio.create_task(self._probe(stop, lags))
+                communicators = [connect(f'load-{n}') for n in range(sockets)]
+                await self._run_in_waves(communicators, lambda communicator: communicator.connect())
+                self.assertEqual(len(redis.keys), sockets)
+                await self._run_in_waves(communicators, lambda communicator: communicator.send_json_to({
+                    'type': 'heartbeat',
+                }))
+                await self._run_in_waves(communicators, lambda communicator: communicator.disconnect())
+                stop.set()
+                await probe
+        finally:
+            gc.enable()
+        lags.sort()
+        return lags[int(len(lags) * 0.99)], lags[-1]
+
+    async def test_event_loop_latency_stays_flat(self):
+        small_p99, _ = await self.measure(self.WAVE, FakeRedis(self.LATENCY))
+        p99, worst = await self.measure(self.SOCKETS, FakeRedis(self.LATENCY))
+        print(f"[LOAD] {self.SOCKETS} sockets: p99 lag {p99 * 1000:.1f} ms, max {worst * 1000:.1f} ms "
+              f"({self.WAVE} sockets: p99 {small_p99 * 1000:.1f} ms)")
+        # Twenty times the sockets, about the same lag: it depends on the wave, not the total
+        self.assertLess(p99, max(3 * small_p99, 0.05))
 
-class WebSocketTests(TestCase):
-    async def test_websocket_send_receive(self):
-        # Create a WebSocket communicator
-        communicator = WebsocketCommunicator(application, "/ws/reminders/")
-        
-        # Test connection
-        connected, subprotocol = await communicator.connect()
-        self.assertTrue(connected, "WebSocket connection failed")
-
-        # Test sending a message
-        test_message = {"message": "Test reminder"}
-        await communicator.send_json_to(test_message)
-        
-        # Since we're just testing send/receive, we won't wait for the scheduled reminder
-        # Instead, let's verify the connection works by sending a manual message back
-        await communicator.send_json_to({"message": "Echo test"})
-        response = await communicator.receive_json_from(timeout=2)
-        self.assertEqual(response["message"], "Echo test", "Message echo failed")
-
-        # Cleanup
-        await communicator.disconnect()
-
-    def test_sync_wrapper(self):
-        # Synchronous wrapper for running the async test
-        asyncio.run(self.test_websocket_send_receive())
\ No newline at end of file
+    async def test_blocking_redis_would_stall_the_loop(self):
+        # The same wave against a client that blocks for each round trip
+        _, worst = await self.measure(self.WAVE, FakeRedis(self.LATENCY, blocking=True))
+        self.assertGreater(worst, self.WAVE * self.LATENCY / 2)
@@ -9,6 +9,10 @@ import 'package:flutter_dotenv/flutter_dotenv.dart';
 class WebSocketProvider extends ChangeNotifier {
   WebSocketChannel? _channel;
   StreamSubscription? _subscription;
+  Timer? _heartbeatTimer;
+
+  // Keeps the server-side presence key (5 minute TTL) alive while connected
+  static const Duration _heartbeatInterval = Duration(minutes: 2);
   final StreamController<Map<String, dynamic>> _reminderController =
       StreamController<Map<String, dynamic>>.broadcast();
 
@@ -232,7 +236,8 @@ class WebSocketProvider extends ChangeNotifier {
       // Build the WebSocket URL with student ID
       final wsBase =
           dotenv.env['WS_URL'] ?? 'wss://planma-app-production.up.railway.app';
-      final wsUrl = Uri.parse('$wsBase/ws/reminders/$studentId/');
+      // batch=1: reminders due together arrive as one 'reminders' frame
+      final wsUrl = Uri.parse('$wsBase/ws/reminders/$studentId/?batch=1');
       print('WebSocket URL: $wsUrl');
 
       _channel = WebSocketChannel.connect(wsUrl);
@@ -267,6 +272,7 @@ class WebSocketProvider extends ChangeNotifier {
 
       // Request initial reminders after connection
       checkReminders();
+      _startHeartbeat();
     } catch (e) {
       print('WebSocket connection error: $e');
       _isConnected = false;
@@ -291,6 +297,16 @@ class WebSocketProvider extends ChangeNotifier {
         // Forward the reminder to listeners
         _reminderController.add(data);
         notifyListeners();
+      } else if (data['type'] == 'reminders') {
+        // Several reminders in one frame: forward each like a single one
+        for (final reminder in data['reminders'] as List) {
+          print('Processing reminder: ${reminder['reminder_type']}');
+          _reminderController.add({
+            'type': 'reminder',
+            ...Map<String, dynamic>.from(reminder as Map),
+          });
+        }
+        notifyListeners();
       }
     } catch (e) {
       print('Error processing WebSocket message: $e');
@@ -307,6 +323,13 @@ class WebSocketProvider extends ChangeNotifier {
     }
   }
 
+  void _startHeartbeat() {
+    _heartbeatTimer?.cancel();
+    _heartbeatTimer = Timer.periodic(_heartbeatInterval, (_) {
+      sendMessage({'type': 'heartbeat'});
+    });
+  }
+
   // Send a custom message to the WebSocket server
   void sendMessage(Map<String, dynamic> data) {
     if (_isConnected && _channel != null && _isAuthenticated) {
@@ -332,6 +355,8 @@ class WebSocketProvider extends ChangeNotifier {
   Future<void> disconnect() async {
     print('Disconnecting WebSocket');
     _isConnected = false;
+    _heartbeatTimer?.cancel();
+    _heartbeatTimer = null;
     await _subscription?.cancel();
     await _channel?.sink.close();
     _channel = null;